@@ -1,9 +1,16 @@
+import time
+BOOT_STARTED = time.perf_counter()  # para medir el tiempo hasta la primera respuesta
+
 from dotenv import load_dotenv
 import os
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, DiskcacheManager
+import diskcache
 from layout import serve_layout
 from callback_final import register_callbacks
+from instrumentation import instrument_callbacks
+import metrics
+import warmup
 from dash import Dash
 import dash_bootstrap_components as dbc
 import dash_auth
@@ -29,16 +36,32 @@ class HashedAuth(dash_auth.BasicAuth):
             return False
         return auth.username == USERNAME and hash_password(auth.password) == PASSWORD_HASH
 
+# Manager para callbacks en segundo plano (consultas pesadas fuera del worker web).
+# Usa un cache local en disco compartido por los procesos de la máquina.
+background_callback_manager = DiskcacheManager(diskcache.Cache(os.getenv("DASH_CACHE_DIR", "./cache")))
+
 # Initialize Dash app
 app = Dash(__name__, meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}], 
-           external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+           external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True,
+           background_callback_manager=background_callback_manager)
+
+# /metrics se registra antes de la autenticación para que quede protegido también
+metrics.init_app(app.server)
 
 # Instanciar autenticación con diccionario dummy
 auth = HashedAuth(app, {'dummy': 'dummy'})
 
-# Layout
-app.layout = serve_layout()
+# /ready (sin autenticación, para health checks) y medición del arranque
+warmup.init_app(app.server, BOOT_STARTED)
+
+# Layout: se evalúa en cada carga de página (fechas del día); las partes estáticas están cacheadas
+app.layout = serve_layout
 register_callbacks(app)
+instrument_callbacks(app)
+
+# Precalentar datos en segundo plano (FAST_START=1) o antes de atender requests (FAST_START=0)
+warmup.start()
+print(f"[startup] app importada en {time.perf_counter() - BOOT_STARTED:.2f}s")
 
 server = app.server  # para que Gunicorn pueda encontrarlo
 
@@ -0,0 +1,89 @@
+// Callbacks clientside: se ejecutan en el navegador sin ida y vuelta al servidor
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    charts: {
+        // Re-arma el gráfico de Country Share a partir de los porcentajes precalculados
+        // en 'country_share_store' (ver get_data.get_country_share_data)
+        countryShare: function(shareData, countries, selector, totalSelector) {
+            var emptyFigure = {
+                data: [],
+                layout: {
+                    annotations: [{
+                        text: 'No data available for the selected countries',
+                        xref: 'paper', yref: 'paper', x: 0.5, y: 0.5, showarrow: false
+                    }]
+                }
+            };
+            if (!shareData || !shareData.dates || shareData.dates.length === 0) {
+                return emptyFigure;
+            }
+
+            var serie;
+            if (selector === 'Total Active Users') {
+                serie = 'count';
+            } else if (selector === 'Subscribed Users') {
+                serie = 'subscribed';
+            } else if (selector === 'Free Users') {
+                serie = 'free';
+            } else {
+                throw new Error('Selector inválido');
+            }
+            if (serie !== 'count') {
+                serie += (totalSelector === 'Relative to total') ? '_total' : '_cat';
+            }
+
+            var rows = shareData.shares[serie];
+            var selected = new Set(countries || []);
+            var nDates = shareData.dates.length;
+            var byCountry = {};
+            var others = null;
+
+            shareData.countries.forEach(function(country, i) {
+                if (selected.has(country)) {
+                    byCountry[country] = rows[i];
+                    return;
+                }
+                // Países no seleccionados se agrupan en 'Others'
+                if (others === null) {
+                    others = new Array(nDates).fill(null);
+                }
+                rows[i].forEach(function(value, j) {
+                    if (value !== null) {
+                        others[j] = (others[j] === null ? 0 : others[j]) + value;
+                    }
+                });
+            });
+            if (others !== null) {
+                byCountry['Others'] = others;
+            }
+
+            var round2 = function(value) {
+                return value === null ? null : Math.round(value * 100) / 100;
+            };
+            var traces = Object.keys(byCountry).sort().map(function(country) {
+                return {
+                    type: 'bar',
+                    x: shareData.dates,
+                    y: byCountry[country].map(round2),
+                    name: country
+                };
+            });
+
+            return {
+                data: traces,
+                layout: {
+                    barmode: 'stack',
+                    yaxis: {
+                        title: {text: 'Country Share (%)'},
+                        tickvals: [0, 25, 50, 75, 100],
+                        ticktext: ['0%', '25%', '50%', '75%', '100%']
+                    },
+                    xaxis: {title: {text: 'Date'}},
+                    title: {text: shareData.view + ' Country Share', x: 0.5},
+                    hovermode: 'x unified',
+                    height: 500,
+                    legend: {title: {text: 'Country'}}
+                }
+            };
+        }
+    }
+});
@@ -0,0 +1,7 @@
+"""
+Benchmarks del dashboard. Se ejecutan desde la raíz del repo, por ejemplo:
+
+    python -m benchmarks.bench_data_layer --scales 1x,10x
+
+Requieren las dependencias de benchmarks/requirements.txt además de las de la app.
+"""
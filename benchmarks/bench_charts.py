@@ -0,0 +1,209 @@
+"""
+Micro-benchmark de los constructores de charts.py (y features.plot_dau_lines), y del
+Store del share por país que consume el callback clientside.
+
+Cada constructor recibe frames pre-generados (sin Mongo) de tamaño creciente y se
+mide por separado:
+  - build_ms: construcción de la figura de Plotly
+  - to_plotly_json_ms: fig.to_plotly_json()
+  - encode_ms: codificación JSON con el mismo encoder que usa Dash (to_json_plotly)
+  - bytes: tamaño del JSON que viaja al navegador
+
+    python -m benchmarks.bench_charts --scales 1x,10x
+    python -m benchmarks.bench_charts --compare benchmarks/results/charts_abc1234.json
+
+Los resultados se guardan en benchmarks/results/charts_<commit>.json (o --output)
+para comparar entre commits.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+from benchmarks.synthetic import SCALES, ERROR_TYPES, generate_charts_data, generate_calls
+import charts
+import features
+from get_data import add_total_per_date, get_country_share_data, get_dau_mau_ratio_data
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def build_frames(scale, seed=0):
+    """Frames con la misma forma que producen los lectores de get_data.py"""
+    raw = generate_charts_data(scale, seed)
+
+    daily = pd.DataFrame(raw['dau-by-country']).rename(columns={'dau': 'count'})
+    new_users = pd.DataFrame(raw['daily-new-users'])
+    daily = daily.merge(new_users, on=['date', 'country'], how='left')
+    daily = daily[['date', 'country', 'count', 'new_users', 'subscribed', 'interactions', 'audio', 'text']]
+
+    monthly = pd.DataFrame(raw['mau-by-country']).rename(columns={'mau': 'count', 'month': 'date'})
+    monthly['new_users'] = 0
+    monthly = monthly[daily.columns]
+
+    daily_with_total = add_total_per_date(daily)
+    top_countries = daily_with_total.groupby('country')['count'].sum().nlargest(15).index.tolist()
+
+    free = pd.DataFrame(raw['free-cycles-by-country'])
+    free_users = free.groupby('country')['user_id'].nunique().reset_index(name='Users')
+    free_users['Share'] = (free_users['Users'] / free_users['Users'].sum() * 100).round(2)
+    free['last_date'] = free['last_date'].str[:4].astype(int)
+    cycles = free.groupby(['cycles_consumed', 'country', 'last_date']).size().reset_index(name='Users')
+    cycles_with_total = pd.concat([cycles, cycles.groupby(['cycles_consumed', 'last_date'])['Users'].sum()
+                                   .reset_index().assign(country='Total')])
+    facet_countries = top_countries[1:6] + ['Total']
+
+    errors = pd.DataFrame(raw['errors_by_date']).sort_values('localdate')
+    invalid = pd.DataFrame(raw['invalid-format-types']).drop(columns='localdate')
+    invalid_types = pd.DataFrame({'type': invalid.columns, 'count': invalid.sum()}).reset_index(drop=True)
+
+    calls = pd.DataFrame(generate_calls(scale, seed))
+    by_type = {t: calls[calls['type'] == t] for t in ['image', 'video', 'document', 'url']}
+    reminders = calls.groupby('localdate').size().reset_index(name='dau_reminds')
+    lists = calls.groupby('localdate').size().reset_index(name='dau_lists')
+    features_df = features.get_features_df(by_type['image'], by_type['document'], by_type['video'],
+                                           by_type['url'], reminders, lists)
+
+    return {
+        'daily': daily,
+        'daily_with_total': daily_with_total,
+        'totals_by_date': daily.groupby('date')[['count', 'new_users', 'interactions', 'audio', 'text', 'subscribed']].sum().reset_index(),
+        'countries': top_countries,
+        'ratio': get_dau_mau_ratio_data(daily_with_total, add_total_per_date(monthly)),
+        'free_users': free_users,
+        'cycles': cycles_with_total,
+        'facet_cycles': cycles_with_total[cycles_with_total['country'].isin(facet_countries)],
+        'errors': errors,
+        'invalid_types': invalid_types,
+        'features': features_df,
+    }
+
+
+def builders(f):
+    """Constructores a medir con sus argumentos: {nombre: función sin argumentos}"""
+    view = 'Daily'
+    return {
+        'active_users_chart': lambda: charts.active_users_chart(f['totals_by_date'], view),
+        'new_users_percentage_chart': lambda: charts.new_users_percentage_chart(f['totals_by_date'], view),
+        'total_interactions_chart': lambda: charts.total_interactions_chart(f['totals_by_date'], view),
+        'interactions_percentage_chart': lambda: charts.interactions_percentage_chart(f['totals_by_date'], view),
+        'active_subscribed_users_chart': lambda: charts.active_subscribed_users_chart(f['totals_by_date'], view),
+        'subscribed_users_percent_chart': lambda: charts.subscribed_users_percent_chart(f['totals_by_date'], view),
+        'users_by_country': lambda: charts.users_by_country(f['daily_with_total'], f['countries'], view),
+        'free_users_by_country': lambda: charts.free_users_by_country(f['daily_with_total'], f['countries'], view),
+        'subs_by_country_chart': lambda: charts.subs_by_country_chart(f['daily_with_total'], f['countries'], view),
+        'new_users_by_country': lambda: charts.new_users_by_country(f['daily_with_total'], f['countries'], view),
+        'interactions_by_country_chart': lambda: charts.interactions_by_country_chart(
+            f['daily_with_total'], f['countries'], view, 'Total Interactions'),
+        # El gráfico se arma en el navegador (charts.countryShare): se mide el Store que lo alimenta
+        'country_share_data': lambda: get_country_share_data(f['daily'], view),
+        'dau_mau_ratio_chart': lambda: charts.dau_mau_ratio_chart(f['ratio'], f['countries'], 'DAU/MAU Ratio por Mes'),
+        'heat_map_users_by_country': lambda: charts.heat_map_users_by_country(f['free_users']),
+        'tree_map_users_by_country': lambda: charts.tree_map_users_by_country(f['free_users']),
+        'plot_histogram_users_by_cycles': lambda: charts.plot_histogram_users_by_cycles(f['cycles']),
+        'plot_user_histogram_faceted': lambda: charts.plot_user_histogram_faceted(f['facet_cycles']),
+        'errors_by_date_chart': lambda: charts.errors_by_date_chart(f['errors'], ['total_errors'] + ERROR_TYPES[:2], view),
+        'invalid_format_types_chart': lambda: charts.invalid_format_types_chart(f['invalid_types'].copy()),
+        'plot_dau_lines': lambda: features.plot_dau_lines(f['features']),
+    }
+
+
+def measure(build, repeat):
+    """Mide construcción, to_plotly_json y codificación JSON por separado (medianas)"""
+    build_t, plotly_json_t, encode_t = [], [], []
+    size = 0
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            fig = build()
+            t1 = time.perf_counter()
+        fig_json = fig.to_plotly_json() if hasattr(fig, 'to_plotly_json') else fig
+        t2 = time.perf_counter()
+        encoded = to_json_plotly(fig_json)
+        t3 = time.perf_counter()
+        build_t.append(t1 - t0)
+        plotly_json_t.append(t2 - t1)
+        encode_t.append(t3 - t2)
+        size = len(encoded.encode())
+    ms = lambda values: round(statistics.median(values) * 1000, 2)
+    return {'build_ms': ms(build_t), 'to_plotly_json_ms': ms(plotly_json_t), 'encode_ms': ms(encode_t), 'bytes': size}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(scales, repeat=5, seed=0, only=None):
+    results = []
+    for scale_name in scales:
+        frames = build_frames(SCALES[scale_name], seed)
+        print(f"\n== {scale_name}: {len(frames['daily']):,} filas diarias, {len(frames['countries'])} países seleccionados")
+        print(f"{'constructor':<34}{'build ms':>10}{'json ms':>10}{'encode ms':>11}{'KB':>10}")
+        for name, build in builders(frames).items():
+            if only and name not in only:
+                continue
+            row = measure(build, repeat)
+            print(f"{name:<34}{row['build_ms']:>10}{row['to_plotly_json_ms']:>10}{row['encode_ms']:>11}"
+                  f"{row['bytes'] / 1024:>10.1f}")
+            results.append({'scale': scale_name, 'builder': name, 'rows': len(frames['daily']), **row})
+    return results
+
+
+def compare(results, baseline_path):
+    """Imprime la variación de cada medición respecto de un JSON anterior"""
+    with open(baseline_path) as f:
+        baseline = {(r['scale'], r['builder']): r for r in json.load(f)['results']}
+    print(f"\nComparación contra {baseline_path} (nuevo / anterior)")
+    print(f"{'escala':<7}{'constructor':<34}{'build':>8}{'json':>8}{'encode':>8}{'bytes':>8}")
+    for row in results:
+        old = baseline.get((row['scale'], row['builder']))
+        if not old:
+            continue
+        ratio = lambda key: f"{row[key] / old[key]:.2f}x" if old[key] else '-'
+        print(f"{row['scale']:<7}{row['builder']:<34}{ratio('build_ms'):>8}{ratio('to_plotly_json_ms'):>8}"
+              f"{ratio('encode_ms'):>8}{ratio('bytes'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1x,10x', help='Escalas separadas por coma (1x, 10x, 100x)')
+    parser.add_argument('--repeat', type=int, default=5, help='Corridas por constructor')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', help='Constructores a medir, separados por coma')
+    parser.add_argument('--output', help='Archivo JSON de resultados (por defecto benchmarks/results/charts_<commit>.json)')
+    parser.add_argument('--compare', help='JSON de una corrida anterior para comparar')
+    args = parser.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"Escalas desconocidas: {unknown}. Opciones: {list(SCALES)}")
+    only = set(args.only.split(',')) if args.only else None
+
+    results = run(scales, args.repeat, args.seed, only)
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f'charts_{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'commit': commit, 'date': datetime.now().isoformat(timespec='seconds'),
+                   'scales': scales, 'repeat': args.repeat, 'results': results}, f, indent=2)
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmark de los lectores de get_data.py y features.py contra datos sintéticos.
+
+Carga los datos de benchmarks/synthetic.py en un Mongo local (mongomock en proceso
+por defecto, o un mongod con --mongo-uri) y mide cada lector: latencia, pico de
+memoria de Python (tracemalloc) y documentos transferidos desde Mongo.
+
+    python -m benchmarks.bench_data_layer --scales 1x,10x --output bench_data.json
+    python -m benchmarks.bench_data_layer --mongo-uri mongodb://localhost:27017 --scales 100x
+
+mongomock no implementa algunos operadores de agregación ($dateFromString, $toDate);
+los lectores que los usan se reportan como 'unsupported' y requieren --mongo-uri.
+mongomock además recorre los documentos en Python: por defecto solo corre 1x y 10x;
+la escala 100x conviene medirla contra un mongod local.
+Con --mongo-uri las bases se crean con el prefijo --db-prefix (por defecto 'bench_').
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.synthetic import SCALES, END_DATE, date_range, generate_dataset, load_dataset
+import get_data
+import features
+
+
+class CountingCollection:
+    """Envuelve una colección y cuenta los documentos devueltos por find/aggregate"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.documents = 0
+
+    def find(self, *args, **kwargs):
+        return self._count(self._collection.find(*args, **kwargs))
+
+    def aggregate(self, *args, **kwargs):
+        return self._count(self._collection.aggregate(*args, **kwargs))
+
+    def _count(self, cursor):
+        for doc in cursor:
+            self.documents += 1
+            yield doc
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def readers(collections, start, end):
+    """
+    Lectores a medir: {nombre: (función sin argumentos, colecciones que lee)}.
+    Cada colección se envuelve en CountingCollection para contar documentos.
+    """
+    c = {name: CountingCollection(collection) for (db, name), collection in collections.items()}
+    dau, mau, new_users = c['dau-by-country'], c['mau-by-country'], c['daily-new-users']
+    free, errors, invalid = c['free-cycles-by-country'], c['errors_by_date'], c['invalid-format-types']
+    calls, lists, reminders = c['calls'], c['lists'], c['reminders']
+    return {
+        'get_daily_data': (lambda: get_data.get_daily_data(dau, new_users, start, end), [dau, new_users]),
+        'get_monthly_data': (lambda: get_data.get_monthly_data(mau, new_users, start, end), [mau, new_users]),
+        'calculate_total_metrics': (lambda: get_data.calculate_total_metrics(dau, mau, new_users), [dau, mau, new_users]),
+        'get_total_free_users': (lambda: get_data.get_total_free_users(free), [free]),
+        'get_heavy_free_users': (lambda: get_data.get_heavy_free_users(free), [free]),
+        'get_users_by_country_and_cycles': (lambda: get_data.get_users_by_country_and_cycles(free), [free]),
+        'aggregate_user_cycles': (lambda: get_data.aggregate_user_cycles(free), [free]),
+        'get_errors_by_date[Daily]': (lambda: get_data.get_errors_by_date(errors, 'Daily'), [errors]),
+        'get_errors_by_date[Weekly]': (lambda: get_data.get_errors_by_date(errors, 'Weekly'), [errors]),
+        'get_errors_by_date[Monthly]': (lambda: get_data.get_errors_by_date(errors, 'Monthly'), [errors]),
+        'get_invalid_format_types': (lambda: get_data.get_invalid_format_types(invalid, start, end), [invalid]),
+        'get_image_data': (lambda: features.get_image_data(calls, start, end), [calls]),
+        'get_documents_data': (lambda: features.get_documents_data(calls, start, end), [calls]),
+        'get_video_data': (lambda: features.get_video_data(calls, start, end), [calls]),
+        'get_youtube_data': (lambda: features.get_youtube_data(calls, start, end), [calls]),
+        'get_lists_data': (lambda: features.get_lists_data(lists, start, end), [lists]),
+        'get_reminders_data': (lambda: features.get_reminders_data(reminders, start, end), [reminders]),
+    }
+
+
+def measure(func, counted, repeat):
+    """
+    Ejecuta func `repeat` veces. La primera corrida mide memoria y documentos;
+    las siguientes solo latencia (tracemalloc agrega overhead).
+    """
+    for collection in counted:
+        collection.documents = 0
+    tracemalloc.start()
+    try:
+        # Los lectores imprimen trazas de depuración; no se incluyen en la salida
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    documents = sum(collection.documents for collection in counted)
+
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - t0)
+
+    return {
+        'latency_ms': round(statistics.median(latencies) * 1000, 2),
+        'latency_min_ms': round(min(latencies) * 1000, 2),
+        'peak_memory_mb': round(peak / 2**20, 2),
+        'documents': documents,
+    }
+
+
+def make_client(mongo_uri):
+    if mongo_uri:
+        import pymongo
+        return pymongo.MongoClient(mongo_uri)
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("mongomock no está instalado: pip install -r benchmarks/requirements.txt, o use --mongo-uri")
+    return mongomock.MongoClient()
+
+
+def run(scales, mongo_uri=None, db_prefix='bench_', repeat=3, seed=0, only=None):
+    client = make_client(mongo_uri)
+    results = []
+    for scale_name in scales:
+        scale = SCALES[scale_name]
+        t0 = time.perf_counter()
+        dataset = generate_dataset(scale, seed)
+        collections = load_dataset(client, dataset, db_prefix if mongo_uri else '')
+        sizes = {name: len(docs) for (db, name), docs in dataset.items()}
+        del dataset
+        print(f"\n== {scale_name}: {scale['countries']} países x {scale['days']} días x {scale['users']} usuarios "
+              f"({sum(sizes.values()):,} documentos, carga {time.perf_counter() - t0:.1f}s)")
+
+        # Rango por defecto del dashboard: último año hasta el fin de los datos
+        dates = date_range(scale)
+        start, end = max(dates[0], f'{END_DATE.year}-01-01'), END_DATE.isoformat()
+
+        print(f"{'lector':<34}{'latencia ms':>12}{'mín ms':>10}{'pico MB':>10}{'documentos':>12}")
+        for name, (func, counted) in readers(collections, start, end).items():
+            if only and name not in only:
+                continue
+            try:
+                row = measure(func, counted, repeat)
+            except Exception as e:
+                if mongo_uri or not _is_mongomock_limitation(e):
+                    raise
+                row = {'unsupported': f'{type(e).__name__}: {str(e)[:80]}'}
+                print(f"{name:<34}{'unsupported (mongomock)':>44}")
+            else:
+                print(f"{name:<34}{row['latency_ms']:>12}{row['latency_min_ms']:>10}"
+                      f"{row['peak_memory_mb']:>10}{row['documents']:>12,}")
+            results.append({'scale': scale_name, 'reader': name, 'range': [start, end],
+                            'collection_sizes': sizes, **row})
+    return results
+
+
+def _is_mongomock_limitation(error):
+    """Errores de operadores no implementados por mongomock"""
+    message = str(error)
+    return isinstance(error, NotImplementedError) or 'Unrecognized expression' in message or 'not implemented' in message
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', help='Escalas separadas por coma (1x, 10x, 100x). '
+                                         'Por defecto 1x,10x con mongomock y 1x,10x,100x con --mongo-uri')
+    parser.add_argument('--mongo-uri', help='mongod local a usar en lugar de mongomock')
+    parser.add_argument('--db-prefix', default='bench_', help='Prefijo de las bases creadas con --mongo-uri')
+    parser.add_argument('--repeat', type=int, default=3, help='Corridas de latencia por lector')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', help='Lectores a medir, separados por coma')
+    parser.add_argument('--output', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    default_scales = '1x,10x,100x' if args.mongo_uri else '1x,10x'
+    scales = [s.strip() for s in (args.scales or default_scales).split(',') if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"Escalas desconocidas: {unknown}. Opciones: {list(SCALES)}")
+    only = set(args.only.split(',')) if args.only else None
+
+    results = run(scales, args.mongo_uri, args.db_prefix, args.repeat, args.seed, only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark de get_country.getCountries (masivo) contra getCountry fila por fila.
+
+Genera números sintéticos de todas las regiones de phonenumbers (con repetidos,
+formatos con espacios y guiones, y un porcentaje de inválidos), resuelve el país
+con ambos métodos, verifica que los resultados sean idénticos y reporta los tiempos.
+
+    python -m benchmarks.bench_get_country --rows 200000 --unique 0.3
+    python -m benchmarks.bench_get_country --rows 1000000 --processes 4
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import phonenumbers
+
+from get_country import getCountry, getCountries, regionToCountry
+
+
+def _example_numbers():
+    """Número de ejemplo (E.164, sin '+') por región soportada"""
+    examples = {}
+    for region in sorted(phonenumbers.SUPPORTED_REGIONS):
+        number = (phonenumbers.example_number_for_type(region, phonenumbers.PhoneNumberType.MOBILE)
+                  or phonenumbers.example_number(region))
+        if number is not None:
+            examples[region] = phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)[1:]
+    return list(examples.values())
+
+
+def generate_phones(rows, unique_ratio=0.3, invalid_ratio=0.03, seed=0):
+    """Serie de `rows` números con ~rows * unique_ratio distintos"""
+    rng = np.random.default_rng(seed)
+    examples = _example_numbers()
+    weights = 1 / np.arange(1, len(examples) + 1) ** 1.1
+    n_unique = max(int(rows * unique_ratio), 1)
+
+    phones = []
+    for base in rng.choice(examples, size=n_unique, p=weights / weights.sum()).tolist():
+        # Variar los últimos dígitos del número de ejemplo
+        tail = ''.join(rng.choice(list('0123456789'), size=min(4, len(base) - 3)).tolist())
+        number = '+' + base[:len(base) - len(tail)] + tail
+        if rng.random() < 0.05:
+            number = f'{number[:3]} {number[3:6]}-{number[6:]}'
+        phones.append(number)
+
+    # Inválidos y casos borde: sin '+', cortos, largos, dígitos al azar
+    n_invalid = int(n_unique * invalid_ratio)
+    for _ in range(n_invalid):
+        digits = ''.join(rng.choice(list('0123456789'), size=int(rng.integers(1, 20))).tolist())
+        phones.append(rng.choice(['+', '', '+0', '00']) + digits)
+    phones += [None, '', 'abc']
+
+    sample = rng.choice(len(phones), size=rows)
+    return pd.Series([phones[i] for i in sample.tolist()], dtype=object)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--unique', type=float, default=0.3, help='Proporción de números distintos')
+    parser.add_argument('--processes', type=int, help='Procesos para el parseo completo en getCountries')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    phones = generate_phones(args.rows, args.unique, seed=args.seed)
+    print(f"{len(phones):,} números, {phones.nunique():,} distintos")
+
+    t0 = time.perf_counter()
+    expected = phones.map(getCountry)
+    row_by_row = time.perf_counter() - t0
+    print(f"getCountry fila por fila:       {row_by_row:8.2f}s")
+
+    regionToCountry.cache_clear()
+    t0 = time.perf_counter()
+    result = getCountries(phones, processes=args.processes)
+    cold = time.perf_counter() - t0
+    print(f"getCountries (en frío):         {cold:8.2f}s  ({row_by_row / cold:.1f}x)")
+
+    t0 = time.perf_counter()
+    getCountries(phones, processes=args.processes)
+    warm = time.perf_counter() - t0
+    print(f"getCountries (regiones en memo): {warm:7.2f}s  ({row_by_row / warm:.1f}x)")
+
+    mismatches = phones[result.values != expected.values]
+    if len(mismatches):
+        print(f"\n{len(mismatches)} resultados distintos de getCountry, por ejemplo:")
+        for phone in mismatches.unique()[:10]:
+            print(f"  {phone!r}: {getCountries([phone])[0]} != {getCountry(phone)}")
+        raise SystemExit(1)
+    print("Resultados idénticos a getCountry")
+
+
+if __name__ == '__main__':
+    main()
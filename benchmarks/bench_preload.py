@@ -0,0 +1,118 @@
+"""
+Memoria de los workers en modo preload (PRELOAD=1, ver preload.py).
+
+Importa la app con PRELOAD sobre los datos sintéticos (mongomock), graba los payloads de
+los escenarios de load_test y las respuestas del master, y ejecuta preload.before_fork().
+Después crea N workers con fork, como gunicorn --preload. Cada uno ejecuta
+preload.after_fork(), reproduce los payloads y verifica que las respuestas sean idénticas
+a las del master. Reporta Rss, Pss y memoria privada (Private_Clean + Private_Dirty) de
+cada worker, leídas de /proc/<pid>/smaps_rollup (solo Linux).
+
+    python -m benchmarks.bench_preload --workers 4
+    python -m benchmarks.bench_preload --workers 4 --no-freeze   # sin before_fork (gc.freeze)
+
+Sin preload cada worker importa y precalienta por su cuenta: su costo se aproxima con
+N x Rss del master.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from benchmarks.load_test import AUTH_HEADERS, SCALES, log, quiet, record, setup_app
+
+
+def smaps_rollup(pid='self'):
+    """{campo: kB} de /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values
+
+
+def private_kb(values):
+    return values['Private_Clean'] + values['Private_Dirty']
+
+
+# La pestaña General inicializa los DatePicker de features con datetime.now()
+NOW = re.compile(rb'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+[-+]\d{2}:\d{2}')
+
+
+def replay(app, payloads):
+    """Respuestas (bytes, sin los instantes de datetime.now()) de los payloads en orden"""
+    client = app.server.test_client()
+    with quiet():
+        return [NOW.sub(b'<now>', client.post('/_dash-update-component', json=p, headers=AUTH_HEADERS).get_data())
+                for p in payloads]
+
+
+def run_worker(app, payloads, expected, ready_w, release_r):
+    import preload
+    with quiet():
+        preload.after_fork()
+    responses = replay(app, payloads)
+    mismatches = sum(1 for got, want in zip(responses, expected) if got != want)
+    os.write(ready_w, f"{mismatches}\n".encode())
+    # Esperar a que el master mida la memoria de todos los workers juntos
+    os.read(release_r, 1)
+    os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='1x', help=f'Escala de los datos sintéticos ({", ".join(SCALES)})')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--no-freeze', action='store_true', help='No ejecutar before_fork (gc.freeze)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ['PRELOAD'] = '1'
+    app = setup_app(SCALES[args.scale], args.seed)
+    recorded = [item['payload'] for item in record(app, seed=args.seed) if item['scenario'] != 'features_button']
+    expected = replay(app, recorded)
+    log(f"{len(recorded)} payloads grabados")
+
+    import preload
+    if not args.no_freeze:
+        t0 = time.perf_counter()
+        with quiet():
+            preload.before_fork()
+        log(f"before_fork en {time.perf_counter() - t0:.2f}s")
+    before = smaps_rollup()
+
+    ready_r, ready_w = os.pipe()
+    release_r, release_w = os.pipe()
+    pids = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(app, recorded, expected, ready_w, release_r)
+        pids.append(pid)
+
+    ready = os.fdopen(ready_r)
+    mismatches = sum(int(ready.readline()) for _ in pids)
+    master, workers = smaps_rollup(), [smaps_rollup(pid) for pid in pids]
+    os.write(release_w, b'x' * len(pids))
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    print(f"{'proceso':<10}{'Rss MB':>10}{'Pss MB':>10}{'privada MB':>12}")
+    print(f"{'master':<10}{master['Rss'] / 1024:>10.1f}{master['Pss'] / 1024:>10.1f}{private_kb(master) / 1024:>12.1f}")
+    for i, values in enumerate(workers):
+        print(f"{f'worker {i}':<10}{values['Rss'] / 1024:>10.1f}{values['Pss'] / 1024:>10.1f}"
+              f"{private_kb(values) / 1024:>12.1f}")
+    total_pss = (master['Pss'] + sum(values['Pss'] for values in workers)) / 1024
+    print(f"\nPss total (master + {len(pids)} workers): {total_pss:.1f} MB; "
+          f"{len(pids)} workers independientes: ~{len(pids) * before['Rss'] / 1024:.1f} MB")
+    if mismatches:
+        log(f"{mismatches} respuestas distintas de las del master")
+        raise SystemExit(1)
+    log("Respuestas de los workers idénticas a las del master")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
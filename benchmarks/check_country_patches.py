@@ -0,0 +1,109 @@
+"""
+Verificación de los Patch de los gráficos por país (country_figure_update).
+
+Sobre los datos sintéticos (mongomock) reproduce la lógica del callback de DAU por país:
+cada paso reconstruye la figura (cambio de dataset o selector, desde el cache de
+get_dau_chart) o envía un Patch con las trazas agregadas o quitadas, y el Patch se
+aplica a la figura como lo hace el navegador. Después de cada paso las trazas de la
+figura deben coincidir, en orden, con el Store '*_traces': si no, los Patch siguientes
+borran por índice la traza equivocada.
+
+Incluye el caso de volver a elegir los mismos países en otro orden (acierto en el cache
+de figuras) y después quitar uno, más una secuencia aleatoria de pasos.
+
+    python -m benchmarks.check_country_patches
+    python -m benchmarks.check_country_patches --steps 500 --seed 1
+"""
+import argparse
+import contextlib
+import io
+import random
+
+from benchmarks.stress_caches import log, setup
+from benchmarks.synthetic import SCALES, END_DATE
+
+
+def apply_patch(figure, patch):
+    """Aplica las operaciones Delete/Append de un Patch sobre data, como el renderer de Dash"""
+    for op in patch.to_plotly_json()['operations']:
+        if op['location'][0] != 'data':
+            raise ValueError(f"Operación no soportada: {op}")
+        if op['operation'] == 'Delete':
+            del figure['data'][op['location'][1]]
+        elif op['operation'] == 'Append':
+            value = op['params']['value']
+            figure['data'].append(value.to_plotly_json() if hasattr(value, 'to_plotly_json') else value)
+        else:
+            raise ValueError(f"Operación no soportada: {op}")
+
+
+class DauChart:
+    """Estado del gráfico de DAU por país en el navegador: figura y Store de trazas"""
+
+    def __init__(self, cf, dataset, selector='Total Active Users'):
+        self.cf = cf
+        self.dataset = dataset
+        self.selector = selector
+        self.figure = None
+        self.traces = None
+
+    def step(self, countries, full_rebuild):
+        cf = self.cf
+        data_key, data = cf.store_data_with_total(self.dataset)
+        with contextlib.redirect_stdout(io.StringIO()):
+            update, self.traces = cf.country_figure_update(
+                data, self.traces, countries, cf.DAU_METRICS[self.selector],
+                lambda: cf.get_dau_chart(data, self.selector, countries, self.dataset['view'], data_key),
+                full_rebuild=full_rebuild)
+        if hasattr(update, 'to_plotly_json') and 'operations' in update.to_plotly_json():
+            apply_patch(self.figure, update)
+        else:
+            self.figure = update.to_plotly_json()
+            self.figure['data'] = [dict(trace) for trace in self.figure['data']]
+        return [trace.get('name') for trace in self.figure['data']]
+
+
+def check(chart, countries, full_rebuild, label, failures):
+    names = chart.step(countries, full_rebuild)
+    if names != list(chart.traces):
+        failures.append(f"{label}: trazas {names} y Store {chart.traces}")
+    elif names and set(names) != set(countries):
+        failures.append(f"{label}: trazas {names} para la selección {countries}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='1x', help=f'Escala de los datos sintéticos ({", ".join(SCALES)})')
+    parser.add_argument('--steps', type=int, default=200, help='Pasos de la secuencia aleatoria')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cf = setup(SCALES[args.scale], args.seed)
+    dataset = {'view': 'Daily', 'start_date': '2025-10-01', 'end_date': END_DATE.isoformat()}
+    countries = sorted(c for c in cf.get_store_data(dataset)['country'].unique())
+    a, b, c = countries[:3]
+    failures = []
+
+    # Misma selección en otro orden (acierto en el cache de figuras) y quitar un país
+    chart = DauChart(cf, dataset)
+    check(chart, [a, b], True, 'selección inicial', failures)
+    check(chart, [b, a], True, 'misma selección en otro orden', failures)
+    check(chart, [a], False, f'quitar {b}', failures)
+    check(chart, [a, c], False, f'agregar {c}', failures)
+
+    # Secuencia aleatoria de reconstrucciones y Patch
+    rng = random.Random(args.seed)
+    chart = DauChart(cf, dataset)
+    for i in range(args.steps):
+        selection = rng.sample(countries, rng.randint(1, min(5, len(countries))))
+        check(chart, selection, rng.random() < 0.3 or chart.figure is None, f'paso {i}', failures)
+
+    for failure in failures[:20]:
+        log(f"  FALLA: {failure}")
+    if failures:
+        raise SystemExit(1)
+    log(f"Trazas y Store coinciden en {args.steps + 4} pasos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,460 @@
+"""
+Prueba de carga de punta a punta de los callbacks del dashboard.
+
+Levanta la app completa en proceso (app.server.test_client(), con la autenticación
+real) sobre los datos sintéticos de benchmarks/synthetic.py y envía requests
+/_dash-update-component como los del navegador. Los payloads se graban primero
+recorriendo escenarios de uso y luego se reproducen con N hilos concurrentes:
+
+  - page_load: carga inicial de la pestaña General
+  - date_change: cambios del rango de fechas
+  - view_toggle: Weekly -> Monthly -> Daily
+  - tab_countries: cambio a la pestaña de países
+  - country_dropdown: agregar / quitar países en los dropdowns
+  - features_button: botón de features (callback en segundo plano; se mide hasta
+    que el resultado está disponible)
+
+Para cada callback se reporta throughput y latencias p50/p95/p99.
+
+    python -m benchmarks.load_test --concurrency 1,4,16 --requests 400
+    python -m benchmarks.load_test --record payloads.json
+    python -m benchmarks.load_test --payloads payloads.json --concurrency 8
+
+--payloads acepta también payloads copiados del navegador (el body JSON de
+/_dash-update-component), en una lista de objetos {"payload": {...}}.
+
+Con mongomock algunas consultas no están soportadas ($dateFromString, $toDate): los
+ciclos de free users (aggregate_user_cycles, de los que dependen las opciones de la
+pestaña General) y las listas y recordatorios por día del botón de features se
+calculan con pandas sobre los mismos documentos. Si un callback de un escenario
+responde con error al grabar, la prueba se detiene; con --skip-failed se excluye con
+un aviso (al final se listan los callbacks que quedaron sin grabar). Con un mongod
+local (--mongo-uri) se usan los lectores reales; las bases se crean con sus nombres
+reales, por eso solo se aceptan hosts locales.
+
+Con --snapshot DIR la app se sirve desde un snapshot exportado con `python -m snapshot`
+(ver snapshot.py), sin Mongo ni datos sintéticos.
+"""
+import argparse
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+from benchmarks.synthetic import SCALES, END_DATE, TIMEZONE, generate_dataset, load_dataset
+
+USERNAME = 'loadtest'
+PASSWORD = 'loadtest'
+AUTH_HEADERS = {'Authorization': 'Basic ' + base64.b64encode(f'{USERNAME}:{PASSWORD}'.encode()).decode()}
+
+# Intervalo de consulta del resultado de callbacks en segundo plano (el navegador usa 1s)
+POLL_INTERVAL = 0.05
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Descarta las trazas de depuración y de errores que imprimen la app y los lectores"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def make_client(mongo_uri):
+    if mongo_uri:
+        import pymongo
+        from pymongo.uri_parser import parse_uri
+        hosts = [host for host, _ in parse_uri(mongo_uri)['nodelist']]
+        if any(host not in ('localhost', '127.0.0.1', '::1') for host in hosts):
+            raise SystemExit(f"--mongo-uri debe apuntar a un mongod local (hosts: {hosts}): "
+                             "la prueba reemplaza las colecciones de la app")
+        return pymongo.MongoClient(mongo_uri)
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("mongomock no está instalado: pip install -r benchmarks/requirements.txt, o use --mongo-uri")
+    return mongomock.MongoClient()
+
+
+def mongomock_user_cycles(collection):
+    """aggregate_user_cycles calculado con pandas (mongomock no soporta $dateFromString)"""
+    import pandas as pd
+    df = pd.DataFrame(list(collection.find({}, {'_id': 0, 'cycles_consumed': 1, 'country': 1, 'last_date': 1})))
+    df['last_date'] = pd.to_datetime(df['last_date']).dt.year
+    return df.groupby(['cycles_consumed', 'country', 'last_date']).size().reset_index(name='Users')
+
+
+def mongomock_created_at_by_day(column):
+    """
+    Lector de features.get_lists_data / get_reminders_data calculado con pandas (mongomock
+    no soporta $toDate): documentos por día local de created_at en la columna `column`.
+    """
+    import pandas as pd
+    from datetime import datetime, time as day_time
+    zone = TIMEZONE.zone
+
+    def read(collection, start_date_str, end_date_str):
+        # Mismos límites que el lector (datetime.combine con la zona de pytz)
+        start = datetime.combine(datetime.fromisoformat(start_date_str).date(), day_time.min, TIMEZONE)
+        end = datetime.combine(datetime.fromisoformat(end_date_str).date(), day_time.max, TIMEZONE) + timedelta(days=1)
+        docs = collection.find({'created_at': {'$gte': start.timestamp(), '$lte': end.timestamp()}},
+                               {'_id': 0, 'created_at': 1})
+        created = pd.to_datetime(pd.Series([doc['created_at'] for doc in docs], dtype=float), unit='s', utc=True)
+        if created.empty:
+            return pd.DataFrame(columns=['localdate', column])
+        localdate = created.dt.tz_convert(zone).dt.strftime('%Y-%m-%d')
+        return localdate.value_counts().sort_index().rename_axis('localdate').reset_index(name=column)
+    return read
+
+
+def setup_app(scale, seed=0, mongo_uri=None, skip_load=False, snapshot=None):
+    """Carga los datos sintéticos, conecta la app a ese Mongo (o al snapshot) y la importa"""
+    if snapshot:
+        os.environ['SNAPSHOT_DIR'] = snapshot
+    else:
+        client = make_client(mongo_uri)
+        if not skip_load:
+            t0 = time.perf_counter()
+            load_dataset(client, generate_dataset(scale, seed))
+            log(f"Datos sintéticos cargados en {time.perf_counter() - t0:.1f}s")
+
+        import db
+        db.set_client(client)
+        if not mongo_uri:
+            # Antes de importar app: el warmup de la pestaña General ya usa el cargador
+            with quiet():
+                import callback_final
+                from get_data import add_total_as_country
+            callback_final.STATIC_LOADERS['usage_free_users'] = lambda: add_total_as_country(
+                mongomock_user_cycles(callback_final.collection_free_cycles_by_country))
+            callback_final.get_lists_data = mongomock_created_at_by_day('dau_lists')
+            callback_final.get_reminders_data = mongomock_created_at_by_day('dau_reminds')
+    os.environ['DASH_USER'] = USERNAME
+    os.environ['DASH_PASS_HASH'] = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    os.environ.setdefault('DASH_CACHE_DIR', tempfile.mkdtemp(prefix='dash-loadtest-'))
+
+    t0 = time.perf_counter()
+    with quiet():
+        import app
+    log(f"App importada en {time.perf_counter() - t0:.1f}s")
+    return app.app
+
+
+def split_output(output):
+    """'..a.x...b.y..' -> ['a.x', 'b.y']; 'a.x' -> ['a.x']"""
+    if output.startswith('..'):
+        return output[2:-2].split('...')
+    return [output]
+
+
+def prop_id(item):
+    return f"{item['id']}.{item['property']}"
+
+
+def send(client, payload):
+    """
+    Envía un payload y, si es un callback en segundo plano, consulta hasta tener el
+    resultado. Devuelve (ok, status, body).
+    """
+    response = client.post('/_dash-update-component', json=payload, headers=AUTH_HEADERS)
+    if response.status_code != 200:
+        return response.status_code == 204, response.status_code, None
+    body = response.get_json()
+    if 'cacheKey' not in body:
+        return True, 200, body
+
+    query = f"?cacheKey={body['cacheKey']}&job={body['job']}"
+    while True:
+        time.sleep(POLL_INTERVAL)
+        response = client.post('/_dash-update-component' + query, json=payload, headers=AUTH_HEADERS)
+        if response.status_code != 200:
+            return response.status_code == 204, response.status_code, None
+        polled = response.get_json()
+        if 'response' in polled:
+            return True, 200, polled
+
+
+class Recorder:
+    """
+    Reproduce de forma simplificada el renderer de Dash: mantiene los valores de los
+    componentes, dispara los callbacks cuyos inputs cambiaron (en orden de
+    dependencias) y graba cada payload enviado. Con strict, un callback que responde
+    con error detiene la grabación; si no, se excluye con un aviso.
+    """
+
+    def __init__(self, app, strict=True):
+        self.app = app
+        self.strict = strict
+        self.client = app.server.test_client()
+        deps = self.client.get('/_dash-dependencies', headers=AUTH_HEADERS).get_json()
+        # Solo callbacks del servidor (los clientside no generan requests)
+        self.callbacks = [d for d in deps if d['output'] in app.callback_map and not d['clientside_function']]
+        self.values = {}
+        self.present = set()
+        self.chunks = {}
+        layout = self.client.get('/_dash-layout', headers=AUTH_HEADERS).get_json()
+        self._insert(layout)
+        self.recorded = []
+
+    def _insert(self, node, container=None):
+        """Registra ids y props de un árbol de componentes (layout o children devueltos)"""
+        if isinstance(node, list):
+            for child in node:
+                self._insert(child, container)
+            return
+        if not isinstance(node, dict) or 'props' not in node:
+            return
+        props = node['props']
+        if isinstance(props.get('id'), str):
+            self.present.add(props['id'])
+            if container is not None:
+                self.chunks.setdefault(container, set()).add(props['id'])
+            for prop, value in props.items():
+                if prop != 'children':
+                    self.values[f"{props['id']}.{prop}"] = value
+        self._insert(props.get('children'), container)
+
+    def _replace_children(self, component_id, children):
+        for old in self.chunks.pop(component_id, set()):
+            self.present.discard(old)
+        new_ids = set(self.present)
+        self._insert(children, component_id)
+        return self.present - new_ids
+
+    @staticmethod
+    def _inserted(dep, new_ids):
+        """Como en Dash, un callback corre al insertarse componentes de sus inputs u outputs"""
+        outputs = [o.rsplit('.', 1)[0] for o in split_output(dep['output'])]
+        return any(i['id'] in new_ids for i in dep['inputs']) or any(o in new_ids for o in outputs)
+
+    def payload(self, dep, changed, new_ids):
+        outputs = [dict(zip(('id', 'property'), o.rsplit('.', 1))) for o in split_output(dep['output'])]
+        with_value = lambda items: [{**item, 'value': self.values.get(prop_id(item))} for item in items]
+        return {
+            'output': dep['output'],
+            'outputs': outputs if dep['output'].startswith('..') else outputs[0],
+            'inputs': with_value(dep['inputs']),
+            'changedPropIds': [prop_id(i) for i in dep['inputs'] if prop_id(i) in changed or i['id'] in new_ids],
+            'state': with_value(dep['state']),
+        }
+
+    def fire(self, scenario, changes, initial=False):
+        """Aplica cambios de props y ejecuta la cadena de callbacks resultante"""
+        self.values.update(changes)
+        changed, new_ids = set(changes), set(self.present) if initial else set()
+        fired = set()
+        while True:
+            ready = [d for d in self.callbacks if d['output'] not in fired
+                     and all(i['id'] in self.present for i in d['inputs'])
+                     and any(o.rsplit('.', 1)[0] in self.present for o in split_output(d['output']))
+                     and (any(prop_id(i) in changed for i in d['inputs'])
+                          or self._inserted(d, new_ids) and not d['prevent_initial_call'])]
+            if not ready:
+                return
+            # Espera a los callbacks que producen alguno de sus inputs
+            pending = {o for d in ready for o in split_output(d['output'])}
+            runnable = [d for d in ready
+                        if not any(prop_id(i) in pending - set(split_output(d['output'])) for i in d['inputs'])]
+            for dep in runnable or ready:
+                fired.add(dep['output'])
+                payload = self.payload(dep, changed, new_ids)
+                with quiet():
+                    ok, status, body = send(self.client, payload)
+                if not ok:
+                    message = f"[{scenario}] {callback_name(self.app, dep['output'])} falló al grabar (HTTP {status})"
+                    if self.strict:
+                        raise SystemExit(f"{message}; use --skip-failed para excluirlo de la prueba")
+                    log(f"  {message}; se excluye de la prueba")
+                    continue
+                self.recorded.append({'scenario': scenario, 'payload': payload})
+                for component_id, props in ((body or {}).get('response') or {}).items():
+                    for prop, value in props.items():
+                        self.values[f'{component_id}.{prop}'] = value
+                        changed.add(f'{component_id}.{prop}')
+                        if prop == 'children':
+                            new_ids |= self._replace_children(component_id, value)
+
+
+def date_ranges(n):
+    """Rangos de fecha de los cambios de fecha: últimos 30/90/180 días y último año"""
+    end = END_DATE.isoformat()
+    ranges = [((END_DATE - timedelta(days=days)).isoformat(), end) for days in (30, 90, 180, 364)]
+    return ranges[:n]
+
+
+def record(app, ranges=3, seed=0, strict=True):
+    """Graba los payloads de los escenarios de uso (ver Recorder para strict)"""
+    rng = random.Random(seed)
+    rec = Recorder(app, strict)
+    start, end = date_ranges(4)[-1]
+    rec.fire('page_load', {'start_date_picker.date': start, 'end_date_picker.date': end}, initial=True)
+    for start, end in date_ranges(ranges):
+        rec.fire('date_change', {'start_date_picker.date': start, 'end_date_picker.date': end})
+    rec.fire('view_toggle', {'view_selector.value': 'Weekly'})
+    rec.fire('view_toggle', {'view_selector.value': 'Monthly'})
+    rec.fire('view_toggle', {'view_selector.value': 'Daily'})
+    rec.fire('features_button', {'features-start-date.date': start, 'features-end-date.date': end,
+                                 'show-features-chart-btn.n_clicks': 1})
+    rec.fire('tab_countries', {'main-tabs.value': 'países'})
+    for dropdown in ('country_dropdown_dau', 'country_dropdown_new_users', 'country_dropdown_interactions',
+                     'country_dropdown_DAU/MAU_ratio'):
+        options = [o['value'] if isinstance(o, dict) else o for o in rec.values.get(f'{dropdown}.options') or []]
+        selected = list(rec.values.get(f'{dropdown}.value') or [])
+        if not options:
+            continue
+        # Quitar un país y agregar otro que no estaba seleccionado
+        if selected:
+            selected.remove(rng.choice(selected))
+            rec.fire('country_dropdown', {f'{dropdown}.value': list(selected)})
+        extra = [o for o in options if o not in selected]
+        if extra:
+            rec.fire('country_dropdown', {f'{dropdown}.value': selected + [rng.choice(extra)]})
+    # Callbacks que no se grabaron: fallaron, o sus componentes los crea un callback que falló
+    recorded = {item['payload']['output'] for item in rec.recorded}
+    missing = sorted(callback_name(app, d['output']) for d in rec.callbacks if d['output'] not in recorded)
+    if missing:
+        log(f"  {len(missing)} callbacks sin grabar (no se miden): {', '.join(missing)}")
+    return rec.recorded
+
+
+def callback_name(app, output):
+    """Nombre de la función del callback para un output"""
+    callback = app.callback_map.get(output, {}).get('callback')
+    return getattr(callback, '__name__', output)
+
+
+def run_load(app, recorded, concurrency, total, seed=0):
+    """Reproduce `total` requests con `concurrency` hilos; cada hilo usa su propio test client"""
+    rng = random.Random(seed)
+    work = [recorded[i % len(recorded)] for i in range(total)]
+    rng.shuffle(work)
+    queue = iter(work)
+    lock = threading.Lock()
+    samples = []
+
+    def worker():
+        client = app.server.test_client()
+        while True:
+            with lock:
+                item = next(queue, None)
+            if item is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                ok, status, _ = send(client, item['payload'])
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                samples.append((callback_name(app, item['payload']['output']), elapsed, ok))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    with quiet():
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - t0
+    return summarize(samples, wall, concurrency)
+
+
+def summarize(samples, wall, concurrency):
+    by_callback = {}
+    for name, elapsed, ok in samples:
+        by_callback.setdefault(name, []).append((elapsed, ok))
+    rows = []
+    for name, values in sorted(by_callback.items()):
+        latencies = np.array([elapsed for elapsed, _ in values]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        rows.append({
+            'callback': name, 'concurrency': concurrency, 'requests': len(values),
+            'errors': sum(1 for _, ok in values if not ok),
+            'throughput_rps': round(len(values) / wall, 2),
+            'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2), 'p99_ms': round(float(p99), 2),
+        })
+    total = {'callback': 'TOTAL', 'concurrency': concurrency, 'requests': len(samples),
+             'errors': sum(1 for *_, ok in samples if not ok),
+             'throughput_rps': round(len(samples) / wall, 2)}
+    if samples:
+        p50, p95, p99 = np.percentile(np.array([s[1] for s in samples]) * 1000, [50, 95, 99])
+        total.update({'p50_ms': round(float(p50), 2), 'p95_ms': round(float(p95), 2), 'p99_ms': round(float(p99), 2)})
+    return rows + [total]
+
+
+def print_rows(rows):
+    print(f"{'callback':<36}{'conc':>5}{'reqs':>7}{'err':>5}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for row in rows:
+        print(f"{row['callback']:<36}{row['concurrency']:>5}{row['requests']:>7}{row['errors']:>5}"
+              f"{row['throughput_rps']:>9}{row.get('p50_ms', '-'):>10}{row.get('p95_ms', '-'):>10}"
+              f"{row.get('p99_ms', '-'):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='1x', help=f'Escala de los datos sintéticos ({", ".join(SCALES)})')
+    parser.add_argument('--mongo-uri', help='mongod local a usar en lugar de mongomock')
+    parser.add_argument('--skip-load', action='store_true', help='No cargar datos (reusar los del mongod de --mongo-uri)')
+    parser.add_argument('--snapshot', help='Servir la app desde este snapshot en lugar de Mongo')
+    parser.add_argument('--concurrency', default='1,4,16', help='Niveles de concurrencia separados por coma')
+    parser.add_argument('--requests', type=int, default=200, help='Requests por nivel de concurrencia')
+    parser.add_argument('--ranges', type=int, default=3, help='Rangos de fecha distintos en date_change (1-4)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-failed', action='store_true',
+                        help='Excluir con un aviso los callbacks que fallan al grabar en lugar de detener la prueba')
+    parser.add_argument('--payloads', help='JSON con payloads grabados a reproducir en lugar de los escenarios')
+    parser.add_argument('--record', help='Guardar los payloads grabados en este archivo y salir')
+    parser.add_argument('--output', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    if args.scale not in SCALES:
+        parser.error(f"Escala desconocida: {args.scale}. Opciones: {list(SCALES)}")
+    if args.skip_load and not args.mongo_uri:
+        parser.error("--skip-load requiere --mongo-uri")
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+
+    app = setup_app(SCALES[args.scale], args.seed, args.mongo_uri, args.skip_load, args.snapshot)
+    if args.payloads:
+        with open(args.payloads) as f:
+            recorded = [item if 'payload' in item else {'payload': item} for item in json.load(f)]
+    else:
+        t0 = time.perf_counter()
+        recorded = record(app, args.ranges, args.seed, strict=not args.skip_failed)
+        log(f"{len(recorded)} payloads grabados en {time.perf_counter() - t0:.1f}s")
+    if args.record:
+        with open(args.record, 'w') as f:
+            f.write(to_json_plotly(recorded))
+        log(f"Payloads guardados en {args.record}")
+        return
+    if not recorded:
+        raise SystemExit("No hay payloads para reproducir")
+
+    results = []
+    for concurrency in levels:
+        rows = run_load(app, recorded, concurrency, args.requests, args.seed)
+        print(f"\n== concurrencia {concurrency}")
+        print_rows(rows)
+        results.extend(rows)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scale': args.scale, 'requests': args.requests, 'payloads': len(recorded),
+                       'results': results}, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Prueba de concurrencia de los caches de callback_final.py (workers gthread).
+
+Importa callback_final sobre los datos sintéticos (mongomock) y lanza N hilos que, a
+la vez y en orden aleatorio, piden los mismos datasets, totales, rankings, ratios
+DAU/MAU, figuras de DAU por país y datos estáticos (con cargas sintéticas: los
+lectores reales necesitan $dateFromString). Las lecturas a Mongo se demoran
+--latency segundos para simular E/S y agrandar las ventanas de carrera. Verifica:
+
+  - sin consultas duplicadas: cada tramo cerrado se lee una sola vez y cada entrada
+    derivada (totales, ratio, figuras, datos estáticos) se calcula una sola vez;
+  - sin entradas rotas: todos los hilos reciben el mismo objeto para la misma clave
+    y los totales de una versión se calcularon con los datos de esa versión. Con
+    --ttl chico la partición abierta y los datos estáticos vencen durante la prueba
+    (cada consulta de la partición abierta devuelve valores distintos) y se
+    verifican solo los tramos cerrados, los totales y los errores;
+  - sin errores en los hilos ni locks de entradas sin liberar.
+
+    python -m benchmarks.stress_caches --threads 16 --rounds 50
+    python -m benchmarks.stress_caches --threads 32 --ttl 0.2 --latency 0.02
+"""
+import argparse
+import contextlib
+import io
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from benchmarks.synthetic import SCALES, END_DATE, generate_dataset, load_dataset
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def setup(scale, seed):
+    import mongomock
+    import db
+    client = mongomock.MongoClient()
+    load_dataset(client, generate_dataset(scale, seed))
+    db.set_client(client)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import callback_final
+    return callback_final
+
+
+class Recorder:
+    """Envuelve funciones de callback_final para contar llamadas por argumentos"""
+
+    def __init__(self, module, latency):
+        self.module = module
+        self.latency = latency
+        self.calls = defaultdict(Counter)
+        self.open_fetches = 0
+        self._lock = threading.Lock()
+
+    def count(self, name, key):
+        with self._lock:
+            self.calls[name][key] += 1
+
+    def wrap(self, name, key_func=lambda *args: args):
+        original = getattr(self.module, name)
+
+        def wrapper(*args, **kwargs):
+            self.count(name, key_func(*args))
+            return original(*args, **kwargs)
+        setattr(self.module, name, wrapper)
+
+    def wrap_read_range(self):
+        original = self.module.read_range
+        today = datetime.now(self.module.timezone).strftime('%Y-%m-%d')
+
+        def read_range(view, start_date, end_date, daily_data=None):
+            self.count('read_range', (view, start_date, end_date))
+            time.sleep(self.latency)
+            if end_date < self.module.open_partition_start(view):
+                return original(view, start_date, end_date, daily_data)
+            # Partición abierta: cada consulta devuelve un valor distinto (el número de
+            # consulta) para detectar totales calculados con datos de otra versión
+            with self._lock:
+                self.open_fetches += 1
+                fetch = self.open_fetches
+            date = today if view == 'Daily' else today[:7]
+            return pd.DataFrame({'date': [date, date], 'country': ['Argentina', 'Brazil'], 'count': [fetch, fetch],
+                                 'subscribed': 0, 'interactions': 0, 'audio': 0, 'text': 0, 'new_users': 0})
+        self.module.read_range = read_range
+
+    def replace_static_loaders(self):
+        # Los lectores reales usan $dateFromString (no soportado por mongomock); acá
+        # importa el cache, así que cada carga devuelve un objeto nuevo
+        loaders = self.module.STATIC_LOADERS
+        for cache_key in list(loaders):
+            def load(cache_key=cache_key):
+                self.count('static', cache_key)
+                time.sleep(self.latency)
+                return pd.DataFrame({'key': [cache_key]})
+            loaders[cache_key] = load
+
+
+def date_ranges():
+    """Rangos que comparten inicio (extensión del tramo cerrado) y uno que llega a hoy"""
+    today = datetime.now().date()
+    end = END_DATE
+    return [
+        ((end - timedelta(days=59)).isoformat(), (end - timedelta(days=30)).isoformat()),
+        ((end - timedelta(days=59)).isoformat(), end.isoformat()),
+        ((end - timedelta(days=120)).isoformat(), end.isoformat()),
+        ((today - timedelta(days=20)).isoformat(), today.isoformat()),
+    ]
+
+
+def make_operations(cf, recorder, observed, errors):
+    ranges = date_ranges()
+    static_keys = list(cf.STATIC_LOADERS)
+
+    def check_total(dataset):
+        # Totales de la versión vigente: deben coincidir con los datos de esa versión
+        data_key, total = cf.store_data_with_total(dataset)
+        version, data = cf.get_store_entry(dataset)
+        if data_key.endswith(f"_v{version}"):
+            expected = data.groupby('date')['count'].sum()
+            got = total[total['country'] == 'Total'].set_index('date')['count']
+            if not got.reindex(expected.index).equals(expected):
+                errors.append(f"total roto para {data_key}")
+        observed[data_key].add(id(total))
+
+    def op_dataset(rng):
+        start, end = rng.choice(ranges)
+        view = rng.choice(['Daily', 'Weekly', 'Monthly'])
+        version, data = cf.get_chart_entry(view, start, end)
+        observed[f"{view}_{start}_{end}_v{version}"].add(id(data))
+
+    def op_total(rng):
+        start, end = rng.choice(ranges)
+        check_total({'view': rng.choice(['Daily', 'Monthly']), 'start_date': start, 'end_date': end})
+
+    def op_rankings(rng):
+        start, end = rng.choice(ranges)
+        cf.get_store_rankings({'view': 'Daily', 'start_date': start, 'end_date': end})
+
+    def op_ratio(rng):
+        start, end = rng.choice(ranges)
+        cf.get_ratio_data(start, end, rng.choice([None, ['Argentina', 'Total']]))
+
+    def op_dau_chart(rng):
+        start, end = rng.choice(ranges)
+        dataset = {'view': 'Daily', 'start_date': start, 'end_date': end}
+        data_key, data = cf.store_data_with_total(dataset)
+        selector = rng.choice(list(cf.DAU_METRICS))
+        fig = cf.get_dau_chart(data, selector, ['Argentina', 'Total'], 'Daily', data_key)
+        observed[f"dau_{data_key}_{selector}"].add(id(fig))
+
+    def op_static(rng):
+        key = rng.choice(static_keys)
+        observed[f"static_{key}_{cf._static_cache.get(key, (0,))[0]}"].add(id(cf.get_static_data(key)))
+
+    return [op_dataset, op_total, op_rankings, op_ratio, op_dau_chart, op_static]
+
+
+def run(cf, recorder, threads, rounds, seed):
+    observed = defaultdict(set)
+    errors = []
+    operations = make_operations(cf, recorder, observed, errors)
+    barrier = threading.Barrier(threads)
+
+    def worker(i):
+        rng = random.Random(seed + i)
+        barrier.wait()
+        for _ in range(rounds):
+            op = rng.choice(operations)
+            try:
+                op(rng)
+            except Exception as e:
+                errors.append(f"{op.__name__}: {type(e).__name__}: {e}")
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+    return observed, errors, time.perf_counter() - t0
+
+
+def report(cf, recorder, observed, errors, ttl_refreshes):
+    from singleflight import in_flight
+    failures = list(errors)
+
+    closed_reads = {key: n for key, n in recorder.calls['read_range'].items()
+                    if key[2] < cf.open_partition_start(key[0])}
+    failures += [f"tramo cerrado leído {n} veces: {key}" for key, n in closed_reads.items() if n > 1]
+    # Con --ttl las entradas vencen y se descartan durante la prueba: se recalculan con
+    # razón (y los id() de los objetos liberados se pueden reutilizar)
+    if not ttl_refreshes:
+        failures += [f"partición abierta leída {n} veces: {key}" for key, n in recorder.calls['read_range'].items()
+                     if key not in closed_reads and n > 1]
+        # Dos rangos pueden compartir el mismo DataFrame (p. ej. si el tramo que se agrega
+        # está vacío): los totales se cuentan contra las claves 'total_' del cache
+        totals = sum(recorder.calls['add_total_per_date'].values())
+        total_keys = sum(1 for key in list(cf._charts_cache) if key.startswith('total_'))
+        if totals != total_keys:
+            failures.append(f"add_total_per_date calculado {totals} veces para {total_keys} totales")
+        for name in ('get_dau_mau_ratio_data', 'users_by_country', 'free_users_by_country',
+                     'subs_by_country_chart', 'static'):
+            failures += [f"{name} calculado {n} veces para la misma entrada" for n in recorder.calls[name].values()
+                         if n > 1]
+        failures += [f"{len(ids)} objetos distintos para {key}" for key, ids in observed.items() if len(ids) > 1]
+    if in_flight():
+        failures.append(f"{in_flight()} locks de entradas sin liberar")
+
+    reads = sum(recorder.calls['read_range'].values())
+    log(f"{reads} lecturas de Mongo ({len(closed_reads)} tramos cerrados, {recorder.open_fetches} de la "
+        f"partición abierta), {sum(recorder.calls['static'].values())} cargas estáticas, "
+        f"{len(observed)} claves observadas")
+    for failure in failures[:20]:
+        log(f"  FALLA: {failure}")
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='1x', help=f'Escala de los datos sintéticos ({", ".join(SCALES)})')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=40, help='Operaciones por hilo')
+    parser.add_argument('--latency', type=float, default=0.05, help='Demora de cada lectura a Mongo (s)')
+    parser.add_argument('--ttl', type=float, help='OPEN_PARTITION_TTL, STATIC_CACHE_TTL y SCHEDULED_STATIC_TTL durante la prueba (s)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    cf = setup(SCALES[args.scale], args.seed)
+    log(f"Datos sintéticos cargados y callback_final importado en {time.perf_counter() - t0:.1f}s")
+
+    recorder = Recorder(cf, args.latency)
+    recorder.wrap_read_range()
+    recorder.replace_static_loaders()
+    recorder.wrap('add_total_per_date', key_func=lambda df: None)
+    recorder.wrap('get_dau_mau_ratio_data', key_func=lambda dau, mau: (id(dau), id(mau)))
+    for name in ('users_by_country', 'free_users_by_country', 'subs_by_country_chart'):
+        recorder.wrap(name, key_func=lambda data, countries, view: id(data))
+    if args.ttl is not None:
+        cf.OPEN_PARTITION_TTL = args.ttl
+        cf.STATIC_CACHE_TTL = args.ttl
+        cf.SCHEDULED_STATIC_TTL = args.ttl
+
+    observed, errors, seconds = run(cf, recorder, args.threads, args.rounds, args.seed)
+    log(f"{args.threads} hilos x {args.rounds} operaciones en {seconds:.1f}s")
+    if not report(cf, recorder, observed, errors, args.ttl is not None):
+        raise SystemExit(1)
+    log("Sin entradas rotas ni consultas duplicadas")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Generador de datos sintéticos con la forma de las colecciones que lee el dashboard.
+
+El volumen se define por escala (países x días x usuarios). La escala 1x es una
+estimación del volumen de producción; 10x y 100x la multiplican para ver cómo
+crecen los tiempos de cada lector.
+"""
+from datetime import date, datetime, timedelta
+import numpy as np
+import pytz
+
+# Escalas: el producto países x días x usuarios crece 1x / 10x / 100x
+SCALES = {
+    '1x': {'countries': 50, 'days': 365, 'users': 10_000},
+    '10x': {'countries': 100, 'days': 730, 'users': 25_000},
+    '100x': {'countries': 200, 'days': 1460, 'users': 125_000},
+}
+
+# Los datos terminan siempre en la misma fecha para que las corridas sean comparables
+END_DATE = date(2025, 12, 31)
+
+TIMEZONE = pytz.timezone('America/Argentina/Buenos_Aires')
+
+# Colecciones generadas: (base de datos, colección)
+COLLECTIONS = [
+    ('TranscribeMe-charts', 'dau-by-country'),
+    ('TranscribeMe-charts', 'mau-by-country'),
+    ('TranscribeMe-charts', 'daily-new-users'),
+    ('TranscribeMe-charts', 'free-cycles-by-country'),
+    ('TranscribeMe-charts', 'errors_by_date'),
+    ('TranscribeMe-charts', 'invalid-format-types'),
+    ('TranscribeMe', 'calls'),
+    ('ListMe', 'lists'),
+    ('RemindMe', 'reminders'),
+]
+
+_REAL_COUNTRIES = [
+    'Argentina', 'Mexico', 'Spain', 'Colombia', 'Chile', 'Peru', 'Brazil', 'United States', 'Venezuela',
+    'Ecuador', 'Uruguay', 'Paraguay', 'Bolivia', 'Guatemala', 'Honduras', 'El Salvador', 'Costa Rica',
+    'Panama', 'Dominican Republic', 'Cuba', 'Italy', 'France', 'Germany', 'Portugal', 'United Kingdom',
+    'India', 'Indonesia', 'Nigeria', 'Egypt', 'Turkey', 'Morocco', 'Philippines', 'Pakistan', 'Kenya',
+    'South Africa', 'Canada', 'Australia', 'Japan', 'Netherlands', 'Belgium', 'Switzerland', 'Austria',
+    'Poland', 'Romania', 'Greece', 'Sweden', 'Norway', 'Denmark', 'Finland', 'Ireland',
+]
+
+ERROR_TYPES = ['INVALID_FORMAT', 'TIMEOUT', 'TRANSCRIPTION_FAILED', 'FILE_TOO_LARGE', 'UNKNOWN']
+INVALID_FORMAT_TYPES = ['pdf', 'docx', 'zip', 'exe', 'txt', 'pptx', 'gif', 'heic']
+CALL_TYPES = ['audio', 'text', 'image', 'video', 'document', 'url']
+CALL_TYPE_PROBS = [0.55, 0.25, 0.08, 0.04, 0.04, 0.04]
+
+
+def country_names(n):
+    """Primeros n países: nombres reales y luego nombres sintéticos"""
+    names = _REAL_COUNTRIES[:n]
+    names += [f'Country {i:03d}' for i in range(len(names), n)]
+    return names
+
+
+def date_range(scale):
+    """Fechas 'yyyy-mm-dd' de la escala, terminando en END_DATE"""
+    start = END_DATE - timedelta(days=scale['days'] - 1)
+    return [(start + timedelta(days=i)).isoformat() for i in range(scale['days'])]
+
+
+def _country_weights(n):
+    """Distribución tipo Zipf: pocos países concentran la mayoría de usuarios"""
+    weights = 1 / np.arange(1, n + 1) ** 1.1
+    return weights / weights.sum()
+
+
+def _daily_activity(scale, rng):
+    """Matriz días x países de DAU con estacionalidad semanal y ruido"""
+    days = scale['days']
+    weights = _country_weights(scale['countries'])
+    weekly = 1 + 0.15 * np.sin(np.arange(days) * 2 * np.pi / 7)
+    total = scale['users'] * 0.1 * weekly
+    noise = rng.uniform(0.8, 1.2, size=(days, scale['countries']))
+    return np.maximum(np.rint(total[:, None] * weights[None, :] * noise), 1).astype(np.int64)
+
+
+def generate_charts_data(scale, seed=0):
+    """
+    Genera las colecciones de TranscribeMe-charts.
+
+    Returns:
+        dict: {nombre de colección: lista de documentos}
+    """
+    rng = np.random.default_rng(seed)
+    countries = country_names(scale['countries'])
+    dates = date_range(scale)
+    dau = _daily_activity(scale, rng)
+
+    subscribed = np.rint(dau * rng.uniform(0.05, 0.2, dau.shape)).astype(np.int64)
+    interactions = np.rint(dau * rng.uniform(2, 5, dau.shape)).astype(np.int64)
+    audio = np.rint(interactions * rng.uniform(0.4, 0.7, dau.shape)).astype(np.int64)
+    text = interactions - audio
+    new_users = np.rint(dau * rng.uniform(0.05, 0.15, dau.shape)).astype(np.int64)
+
+    dau_docs = []
+    new_users_docs = []
+    for i, day in enumerate(dates):
+        row_dau, row_subs, row_int = dau[i].tolist(), subscribed[i].tolist(), interactions[i].tolist()
+        row_audio, row_text, row_new = audio[i].tolist(), text[i].tolist(), new_users[i].tolist()
+        for j, country in enumerate(countries):
+            dau_docs.append({'date': day, 'country': country, 'dau': row_dau[j], 'subscribed': row_subs[j],
+                             'interactions': row_int[j], 'audio': row_audio[j], 'text': row_text[j]})
+            new_users_docs.append({'date': day, 'country': country, 'new_users': row_new[j]})
+
+    # MAU: un documento por mes y país, con 'month' = primer día del mes
+    months = np.array([d[:7] for d in dates])
+    mau_docs = []
+    for month in dict.fromkeys(months):
+        mask = months == month
+        mau = np.rint(dau[mask].mean(axis=0) * rng.uniform(4, 8, scale['countries'])).astype(np.int64).tolist()
+        month_subs = subscribed[mask].sum(axis=0).tolist()
+        month_int = interactions[mask].sum(axis=0).tolist()
+        month_audio = audio[mask].sum(axis=0).tolist()
+        month_text = text[mask].sum(axis=0).tolist()
+        for j, country in enumerate(countries):
+            mau_docs.append({'month': f'{month}-01', 'country': country, 'mau': mau[j],
+                             'subscribed': month_subs[j], 'interactions': month_int[j],
+                             'audio': month_audio[j], 'text': month_text[j]})
+
+    # Free users: un documento por usuario
+    n_users = scale['users']
+    user_country = rng.choice(scale['countries'], size=n_users, p=_country_weights(scale['countries']))
+    cycles = np.minimum(rng.geometric(0.15, size=n_users) - 1, 30).tolist()
+    max_cycles = rng.choice([5, 10], size=n_users).tolist()
+    last_date = rng.choice(dates, size=n_users).tolist()
+    free_cycles_docs = [
+        {'user_id': f'user_{u}', 'country': countries[c], 'cycles_consumed': cycles[u],
+         'max_cycles': max_cycles[u], 'last_date': last_date[u]}
+        for u, c in enumerate(user_country.tolist())
+    ]
+
+    # Errores por día
+    errors = rng.poisson(lam=max(scale['users'] / 2000, 1), size=(scale['days'], len(ERROR_TYPES))).tolist()
+    errors_docs = []
+    for day, counts in zip(dates, errors):
+        doc = {'localdate': day, 'total_errors': int(sum(counts))}
+        doc.update(dict(zip(ERROR_TYPES, counts)))
+        errors_docs.append(doc)
+
+    invalid = rng.poisson(lam=3, size=(scale['days'], len(INVALID_FORMAT_TYPES))).tolist()
+    invalid_docs = [dict(localdate=day, **dict(zip(INVALID_FORMAT_TYPES, counts))) for day, counts in zip(dates, invalid)]
+
+    return {
+        'dau-by-country': dau_docs,
+        'mau-by-country': mau_docs,
+        'daily-new-users': new_users_docs,
+        'free-cycles-by-country': free_cycles_docs,
+        'errors_by_date': errors_docs,
+        'invalid-format-types': invalid_docs,
+    }
+
+
+def generate_calls(scale, seed=0):
+    """Documentos de TranscribeMe.calls: ~1% de los usuarios hace una llamada por día"""
+    rng = np.random.default_rng(seed + 1)
+    dates = date_range(scale)
+    per_day = rng.poisson(lam=max(scale['users'] / 100, 1), size=len(dates)).tolist()
+    docs = []
+    for day, n in zip(dates, per_day):
+        types = rng.choice(CALL_TYPES, size=n, p=CALL_TYPE_PROBS).tolist()
+        users = rng.integers(0, scale['users'], size=n).tolist()
+        youtube = (rng.random(n) < 0.7).tolist()
+        for call_type, user, is_youtube in zip(types, users, youtube):
+            result_type = 'youtube_transcription' if call_type == 'url' and is_youtube else f'{call_type}_transcription'
+            docs.append({
+                'localdate': day, 'user_id': f'user_{user}', 'type': call_type,
+                'event_type': 'document_transcription' if call_type == 'document' else f'{call_type}_message',
+                'source': 'whatsapp', 'extras': {}, 'result': {'type': result_type}, 'error': None,
+            })
+    return docs
+
+
+def generate_created_at(scale, per_user_per_day, seed=0):
+    """Documentos con 'created_at' (timestamp Unix) para ListMe.lists y RemindMe.reminders"""
+    rng = np.random.default_rng(seed + 2)
+    start = TIMEZONE.localize(datetime.combine(END_DATE - timedelta(days=scale['days'] - 1), datetime.min.time()))
+    n = int(scale['users'] * per_user_per_day * scale['days'])
+    offsets = rng.uniform(0, scale['days'] * 86400, size=n)
+    return [{'created_at': ts, 'user_id': f'user_{u}'}
+            for ts, u in zip((start.timestamp() + offsets).tolist(), rng.integers(0, scale['users'], size=n).tolist())]
+
+
+def generate_dataset(scale, seed=0):
+    """
+    Genera todas las colecciones para una escala.
+
+    Returns:
+        dict: {(base de datos, colección): lista de documentos}
+    """
+    charts = generate_charts_data(scale, seed)
+    dataset = {('TranscribeMe-charts', name): docs for name, docs in charts.items()}
+    dataset[('TranscribeMe', 'calls')] = generate_calls(scale, seed)
+    dataset[('ListMe', 'lists')] = generate_created_at(scale, 0.005, seed)
+    dataset[('RemindMe', 'reminders')] = generate_created_at(scale, 0.003, seed + 10)
+    return dataset
+
+
+def load_dataset(client, dataset, db_prefix='', batch_size=10_000):
+    """
+    Carga el dataset en un MongoClient (o mongomock.MongoClient), reemplazando las
+    colecciones existentes. Las bases se crean como f'{db_prefix}{nombre}'.
+
+    Returns:
+        dict: {(base de datos, colección): Collection}
+    """
+    collections = {}
+    for (db_name, name), docs in dataset.items():
+        collection = client[f'{db_prefix}{db_name}'][name]
+        collection.drop()
+        for i in range(0, len(docs), batch_size):
+            # insert_many agrega _id a cada dict; se insertan copias para no mutar el dataset
+            collection.insert_many([dict(doc) for doc in docs[i:i + batch_size]], ordered=False)
+        collections[(db_name, name)] = collection
+    return collections
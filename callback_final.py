@@ -1,19 +1,28 @@
-import pymongo
-from dash import Input, Output, State, html, dcc
+from db import get_client
+from dash import Input, Output, State, html, dcc, clientside_callback, ClientsideFunction, Patch, ctx, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import pytz
 import pandas as pd
 import os
-from get_data import (get_daily_data, get_monthly_data, add_total_per_date, get_total_free_users,
+import time
+import threading
+import warmup
+import preload
+from layout import default_date_range, common_date_ranges, view_options, resolve_view, timezone
+from metrics import register_cache, record_cache_lookup, record_cache_eviction
+from singleflight import get_or_build, key_lock
+from get_data import (get_daily_data, get_monthly_data, get_weekly_data, add_total_per_date, get_total_free_users,
                       get_heavy_free_users, aggregate_user_cycles, add_total_as_country, filter_user_cycles,
-                      calculate_total_metrics, get_dau_mau_ratio_data, get_errors_by_date, get_invalid_format_types)
+                      calculate_total_metrics, get_dau_mau_ratio_data, get_errors_by_date, get_invalid_format_types,
+                      get_country_share_data, get_country_rankings)
 from charts import (active_users_chart, total_interactions_chart, heat_map_users_by_country, plot_user_histogram_faceted,
                     users_by_country, new_users_by_country, tree_map_users_by_country, interactions_by_country_chart,
                     new_users_percentage_chart, interactions_percentage_chart, subs_by_country_chart, free_users_by_country,
-                    dau_mau_ratio_chart, active_subscribed_users_chart, subscribed_users_percent_chart, country_share,
-                    errors_by_date_chart, invalid_format_types_chart)
+                    dau_mau_ratio_chart, active_subscribed_users_chart, subscribed_users_percent_chart,
+                    errors_by_date_chart, invalid_format_types_chart, country_area_trace, INTERACTION_METRICS)
 # from monitoreo import (get_last_dt_active_users, extract_user_content, asign_countries, get_all_countries_and_continents,
 #                        desencrypt_messages, ENCRYPT_KEY_ID, get_messages)
 
@@ -21,84 +30,572 @@ from features import (get_documents_data, get_image_data, get_video_data, get_yo
                       get_lists_data, get_reminders_data, get_features_df,
                       plot_dau_lines)
 
+# Modo snapshot: los find se sirven desde archivos (ver db.py) y las lecturas que
+# son agregaciones en Mongo, desde los resultados exportados
+if os.getenv('SNAPSHOT_DIR'):
+    from snapshot import (get_total_free_users, get_heavy_free_users, aggregate_user_cycles,
+                          calculate_total_metrics, get_lists_data, get_reminders_data)
+
 # MongoDB connection
 load_dotenv()
-MONGO_URI = os.getenv('MONGO_URI')
-client = pymongo.MongoClient(MONGO_URI)
 
-db_TME = client['TranscribeMe']
-collection_freePlanCycles = db_TME['freePlanCycles']
-collection_userPreferences = db_TME['userPreferences']
-collection_calls = db_TME['calls']
+def bind_collections():
+    """
+    Enlaza las colecciones al cliente del proceso. Se llama al importar y, con PRELOAD,
+    en cada worker después del fork (el cliente del master no se puede compartir).
+    """
+    global client, db_TME, db_Analytics, db_TME_charts, db_ListMe, db_RemindMe
+    global collection_freePlanCycles, collection_userPreferences, collection_calls, collection_dau
+    global collection_dau_by_country, collection_new_users, collection_mau_by_country
+    global collection_free_cycles_by_country, collection_errors_by_date, collection_invalid_format_types
+    global collection_lists, collection_rme
+    client = get_client()
+
+    db_TME = client['TranscribeMe']
+    collection_freePlanCycles = db_TME['freePlanCycles']
+    collection_userPreferences = db_TME['userPreferences']
+    collection_calls = db_TME['calls']
+
+    db_Analytics = client['Analytics']
+    collection_dau = db_Analytics['dau']
+
+    db_TME_charts = client['TranscribeMe-charts']
+    collection_dau_by_country = db_TME_charts['dau-by-country']
+    collection_new_users = db_TME_charts['daily-new-users']
+    collection_mau_by_country = db_TME_charts['mau-by-country']
+    collection_free_cycles_by_country = db_TME_charts['free-cycles-by-country']
+    collection_errors_by_date = db_TME_charts['errors_by_date']
+    collection_invalid_format_types = db_TME_charts['invalid-format-types']
+
+    db_ListMe = client['ListMe']
+    collection_lists = db_ListMe['lists']
 
-db_Analytics = client['Analytics']
-collection_dau = db_Analytics['dau']
+    db_RemindMe = client['RemindMe']
+    collection_rme = db_RemindMe['reminders']
 
-db_TME_charts = client['TranscribeMe-charts']
-collection_dau_by_country = db_TME_charts['dau-by-country']
-collection_new_users = db_TME_charts['daily-new-users']
-collection_mau_by_country = db_TME_charts['mau-by-country']
-collection_free_cycles_by_country = db_TME_charts['free-cycles-by-country']
-collection_errors_by_date = db_TME_charts['errors_by_date']
-collection_invalid_format_types = db_TME_charts['invalid-format-types']
+bind_collections()
+preload.add_after_fork(bind_collections)
 
-db_ListMe = client['ListMe']
-collection_lists = db_ListMe['lists']
+# Métricas totales (todo el histórico): se calculan una sola vez, en el warmup o en
+# el primer uso. El lock evita calcularlas dos veces si un callback llega mientras
+# el warmup está en curso.
+_total_metrics = None
+_total_metrics_lock = threading.Lock()
 
-db_RemindMe = client['RemindMe']
-collection_rme = db_RemindMe['reminders']
+def get_total_metrics():
+    global _total_metrics
+    if _total_metrics is None:
+        with _total_metrics_lock:
+            if _total_metrics is None:
+                _total_metrics = calculate_total_metrics(collection_dau_by_country, collection_mau_by_country,
+                                                         collection_new_users)
+    return _total_metrics
 
-# Calcular métricas una sola vez al importar el módulo
-TOTAL_METRICS = calculate_total_metrics(collection_dau_by_country, collection_mau_by_country, collection_new_users)
+# Caches de módulo: con workers gthread los comparten los hilos del proceso. Cada
+# entrada se calcula una sola vez aunque la pidan varios callbacks a la vez (ver
+# singleflight.py).
 
 # Cache para data de DAU
 _dau_chart_cache = {}
+register_cache('dau_chart', _dau_chart_cache)
 
-def get_dau_chart(data, dau_selector, countries, view):
-    cache_key = f'{view}_{dau_selector}_{str(sorted(countries) if countries else [])}'
+# Columna a graficar según el selector de DAU por país
+DAU_METRICS = {'Total Active Users': 'count', 'Free Users': 'free', 'Subscribed Users': 'subscribed'}
 
-    if cache_key not in _dau_chart_cache:
+def get_dau_chart(data, dau_selector, countries, view, dataset_key=''):
+    # Clave con la selección en orden: las trazas siguen ese orden y los Patch de
+    # country_figure_update borran por índice según el Store '*_traces'
+    cache_key = f'{dataset_key}_{dau_selector}_{str(list(countries or []))}'
+
+    def build():
         print(f"Obteniendo los datos para graficar {view} {dau_selector} para los países {countries}")
         if dau_selector == 'Total Active Users':
-            _dau_chart_cache[cache_key] = users_by_country(data, countries, view)
+            return users_by_country(data, countries, view)
         elif dau_selector == 'Free Users':
-            _dau_chart_cache[cache_key] = free_users_by_country(data, countries, view)
+            return free_users_by_country(data, countries, view)
         elif dau_selector == 'Subscribed Users':
-            _dau_chart_cache[cache_key] = subs_by_country_chart(data, countries, view)
-    return _dau_chart_cache[cache_key]
+            return subs_by_country_chart(data, countries, view)
+    return get_or_build('dau_chart', _dau_chart_cache, cache_key, build)
 
 
 # Cache para gráficos (datos que cambian según filtros)
 _charts_cache = {}
+register_cache('charts', _charts_cache)
 
-def get_chart_data(view, start_date, end_date):
-    """Obtiene datos para gráficos con cache"""
+# Invalidación por recencia: los días cerrados (y los meses cerrados, en la vista
+# mensual) no cambian y se cachean sin vencimiento. La partición abierta (el día en
+# curso, o el mes en curso en Monthly) se consulta por separado y se vuelve a consultar
+# cada OPEN_PARTITION_TTL segundos. Cada dataset tiene una versión (el momento en que se
+# consultó su partición abierta; 0 si el rango está cerrado) que viaja en el handle del
+# Store y forma parte de la clave de los caches derivados (totales, rankings, figuras,
+# ratio): al cambiar, las entradas de la versión anterior se descartan. El dataset se
+# guarda en _charts_cache junto con su versión, (versión, DataFrame), para que un hilo
+# nunca lea los datos de una versión con la clave de otra.
+OPEN_PARTITION_TTL = int(os.getenv('OPEN_PARTITION_TTL', 300))
+
+# {(view, inicio del rango): (última fecha cubierta, DataFrame de los días/meses cerrados)}
+_closed_data = {}
+register_cache('charts_closed', _closed_data)
+# {(view, inicio, fin): (consultado en, DataFrame de la partición abierta)}
+_open_data = {}
+register_cache('charts_open', _open_data)
+
+def shift_date(date_str, days):
+    return (datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+
+def open_partition_start(view):
+    """Primer día de la partición abierta: hoy, o el primer día del mes en curso en Monthly"""
+    return datetime.now(timezone).strftime('%Y-%m-01' if view == 'Monthly' else '%Y-%m-%d')
+
+def month_start(date_str):
+    return date_str[:8] + '01'
+
+def read_range(view, start_date, end_date, daily_data=None):
+    """Consulta Mongo para un tramo del dataset ('Daily' o 'Monthly')"""
+    print(f"Obteniendo datos para gráficos: {view} desde {start_date} hasta {end_date}")
+    if view == 'Daily':
+        return get_daily_data(collection_dau_by_country, collection_new_users, start_date, end_date)
+    return get_monthly_data(collection_mau_by_country, collection_new_users, start_date, end_date,
+                            daily_data=daily_data)
+
+def concat_parts(parts):
+    parts = [part for part in parts if not part.empty] or parts[:1]
+    return parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+
+def cached_daily(range_start, start_date, end_date):
+    """Días cerrados [start_date, end_date] ya cacheados para el rango, o None"""
+    covered, daily = _closed_data.get(('Daily', range_start), (None, None))
+    if covered is None or covered < end_date:
+        return None
+    return daily[(daily['date'] >= start_date) & (daily['date'] <= end_date)]
+
+def get_closed_data(view, range_start, end_date):
+    """
+    Días/meses cerrados desde range_start hasta end_date. Los rangos con el mismo inicio
+    comparten un único DataFrame que se extiende consultando solo el tramo que falta.
+    """
+    covered, data = _closed_data.get((view, range_start), (None, None))
+    if covered is None or covered < end_date:
+        # Un solo hilo extiende el DataFrame; los demás esperan y vuelven a mirar
+        with key_lock('charts_closed', (view, range_start)):
+            covered, data = _closed_data.get((view, range_start), (None, None))
+            if covered is None or covered < end_date:
+                gap_start = range_start if covered is None else shift_date(covered, 1)
+                # Si el dataset diario del mismo tramo ya está en cache, los nuevos usuarios
+                # por mes salen de ahí y solo se consulta mau-by-country
+                daily_data = cached_daily(range_start, gap_start, end_date) if view == 'Monthly' else None
+                gap = read_range(view, gap_start, end_date, daily_data)
+                data = gap if data is None else concat_parts([data, gap])
+                covered = end_date
+                _closed_data[(view, range_start)] = (covered, data)
+    return data if covered == end_date else data[data['date'] <= end_date]
+
+def get_open_data(view, start_date, end_date):
+    """Partición abierta [start_date, end_date]: (versión, DataFrame), vence a los OPEN_PARTITION_TTL segundos"""
+    def fetch():
+        if (view, start_date, end_date) in _open_data:
+            record_cache_eviction('charts_open')
+        # Las particiones de días/meses que ya cerraron no se vuelven a usar
+        for key in [key for key in list(_open_data) if key[0] == view and key[1] < start_date]:
+            _open_data.pop(key, None)
+        return time.time(), read_range(view, start_date, end_date)
+
+    entry = get_or_build('charts_open', _open_data, (view, start_date, end_date), fetch,
+                         valid=lambda entry: time.time() - entry[0] <= OPEN_PARTITION_TTL)
+    return int(entry[0] * 1000), entry[1]
+
+def purge_version(cache_key, version=None):
+    """Descarta las entradas de los caches derivados de una versión del dataset (o de todas)"""
+    tag = f"{cache_key}_v{'' if version is None else version}"
+    for name, cache in (('charts', _charts_cache), ('dau_chart', _dau_chart_cache), ('ratio', _ratio_cache)):
+        if version is None:
+            stale = [key for key in list(cache) if tag in key]
+        else:
+            stale = [key for key in list(cache) if key.endswith(tag) or f"{tag}_" in key]
+        for key in stale:
+            cache.pop(key, None)
+        if stale:
+            record_cache_eviction(name, len(stale))
+
+# Límite de datasets (rangos) en cache. Al superarlo se descartan los usados hace más
+# tiempo, con sus derivados. Los rangos que llegaban a la partición abierta (el rango
+# inicial, los últimos 30 días, lo que va del año) cambian de fin cada día: cuando esa
+# partición cierra, su dataset ya no lo pide nadie y se descarta en el momento.
+CHART_CACHE_MAX_RANGES = int(os.getenv('CHART_CACHE_MAX_RANGES', 48))
+# {clave del dataset: último uso}
+_range_used = {}
+
+def cached_ranges():
+    """Claves de los datasets en _charts_cache (sin los totales y rankings derivados)"""
+    return [key for key in list(_charts_cache) if not key.startswith(('total_', 'rankings_'))]
+
+def evict_ranges(cache_keys):
+    """Descarta datasets (todas sus versiones) con sus derivados y los tramos cerrados que quedan sin uso"""
+    for cache_key in cache_keys:
+        _range_used.pop(cache_key, None)
+        if _charts_cache.pop(cache_key, None) is not None:
+            record_cache_eviction('charts')
+        purge_version(cache_key)
+    # Tramos cerrados de los datasets cacheados o en construcción; Weekly se deriva del
+    # dataset diario del mismo inicio
+    in_use = set()
+    for cache_key in cached_ranges() + list(_range_used):
+        view, start_date, _ = cache_key.split('_')
+        in_use.add(('Daily' if view == 'Weekly' else view, start_date))
+    stale = [key for key in list(_closed_data) if key not in in_use]
+    for key in stale:
+        _closed_data.pop(key, None)
+    if stale:
+        record_cache_eviction('charts_closed', len(stale))
+
+def evict_old_ranges():
+    """Descarta los datasets de rangos que cerraron desde que se cachearon y los menos usados sobre el límite"""
+    closed, used = [], []
+    for cache_key in cached_ranges():
+        view, _, end_date = cache_key.split('_')
+        entry = _charts_cache.get(cache_key)
+        if entry is not None and entry[0] and end_date < open_partition_start('Daily' if view == 'Weekly' else view):
+            closed.append(cache_key)
+        else:
+            used.append((_range_used.get(cache_key, 0), cache_key))
+    excess = len(used) - CHART_CACHE_MAX_RANGES
+    if closed or excess > 0:
+        evict_ranges(closed + [cache_key for _, cache_key in sorted(used)[:max(excess, 0)]])
+
+def get_chart_entry(view, start_date, end_date):
+    """(versión, DataFrame) del dataset para gráficos, con cache (ver invalidación por recencia arriba)"""
     cache_key = f"{view}_{start_date}_{end_date}"
-    
-    if cache_key not in _charts_cache:
-        print(f"Obteniendo datos para gráficos: {view} desde {start_date} hasta {end_date}")
-        if view == 'Daily':
-            _charts_cache[cache_key] = get_daily_data(collection_dau_by_country, collection_new_users, start_date, end_date)
-        elif view == 'Monthly':
-            _charts_cache[cache_key] = get_monthly_data(collection_mau_by_country, collection_new_users, start_date, end_date)
-    
-    return _charts_cache[cache_key]
+    _range_used[cache_key] = time.time()
+
+    if view == 'Weekly':
+        # Derivado del dataset diario del mismo rango (cacheado), sin consultar Mongo
+        version, daily_data = get_chart_entry('Daily', start_date, end_date)
+        build = lambda: get_weekly_data(daily_data)
+    else:
+        open_start = open_partition_start(view)
+        head_end = min(end_date, shift_date(open_start, -1))
+        tail = get_open_data(view, max(start_date, open_start), end_date) if end_date >= open_start else None
+        version = tail[0] if tail else 0
+        # En Monthly el tramo cerrado se cachea solo con meses completos: un mes cortado a
+        # mitad se extendería después sin los nuevos usuarios del resto del mes. El mes
+        # final incompleto se consulta aparte (queda en el dataset cacheado del rango).
+        partial = None
+        if view == 'Monthly' and head_end == end_date and shift_date(end_date, 1)[8:] != '01':
+            head_end = shift_date(month_start(end_date), -1)
+            partial = (max(start_date, month_start(end_date)), end_date)
+
+        def build():
+            parts = []
+            if start_date <= head_end:
+                parts.append(get_closed_data(view, start_date, head_end))
+            if partial:
+                parts.append(read_range(view, *partial))
+            if tail:
+                parts.append(tail[1])
+            # Rango inválido (inicio posterior al fin): el lector devuelve el DataFrame vacío
+            return concat_parts(parts) if parts else read_range(view, start_date, end_date)
+
+    # Una versión más nueva que la pedida también sirve (otro hilo ya refrescó la
+    # partición); un rango que quedó cerrado (versión 0) se reconstruye sin la partición
+    current = lambda entry: entry is not None and (entry[0] == version or 0 < version < entry[0])
+    entry = _charts_cache.get(cache_key)
+    if not current(entry):
+        with key_lock('charts', cache_key):
+            previous = _charts_cache.get(cache_key)
+            if not current(previous):
+                record_cache_lookup('charts', False)
+                entry = (version, build())
+                _charts_cache[cache_key] = entry
+                if previous is not None:
+                    purge_version(cache_key, previous[0])
+                else:
+                    evict_old_ranges()
+                return entry
+            entry = previous
+    record_cache_lookup('charts', True)
+    return entry
+
+def get_chart_data(view, start_date, end_date):
+    """Obtiene datos para gráficos con cache (ver get_chart_entry)"""
+    return get_chart_entry(view, start_date, end_date)[1]
+
+def parse_date_range(start_date, end_date):
+    """Normaliza las fechas de los DatePicker al formato 'yyyy-mm-dd'"""
+    start = datetime.strptime(start_date[:10], '%Y-%m-%d')
+    end = datetime.strptime(end_date[:10], '%Y-%m-%d')
+    return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+def get_store_entry(dataset):
+    """Resuelve el handle publicado en 'chart_data_store' a (versión, DataFrame cacheado)"""
+    if not dataset:
+        raise PreventUpdate
+    return get_chart_entry(dataset['view'], dataset['start_date'], dataset['end_date'])
+
+def get_store_data(dataset):
+    """Resuelve el handle publicado en 'chart_data_store' al DataFrame cacheado"""
+    return get_store_entry(dataset)[1]
+
+def dataset_key(dataset, version=None):
+    """Clave del dataset del handle con su versión (por defecto la vigente), para los caches derivados"""
+    if version is None:
+        version = get_store_entry(dataset)[0]
+    return f"{dataset['view']}_{dataset['start_date']}_{dataset['end_date']}_v{version}"
+
+def store_data_with_total(dataset):
+    """
+    Dataset con la fila 'Total' por fecha (cacheado) y la clave versionada con la que se
+    guardó, ambos de la misma versión del dataset.
 
-# Cache para datos de ratio
+    Returns:
+        (str, DataFrame): Clave derivada ('total_...') y datos.
+    """
+    version, data = get_store_entry(dataset)
+    cache_key = f"total_{dataset_key(dataset, version)}"
+
+    def build():
+        data_with_total = add_total_per_date(data)
+        # El ranking de países se calcula una vez junto con el dataset
+        _charts_cache[f"rankings_{cache_key}"] = get_country_rankings(data_with_total)
+        return data_with_total
+    return cache_key, get_or_build('charts', _charts_cache, cache_key, build)
+
+def get_store_data_with_total(dataset):
+    """Igual que get_store_data pero con la fila 'Total' por fecha (cacheado)"""
+    return store_data_with_total(dataset)[1]
+
+def get_store_rankings(dataset):
+    """Ranking top-N de países por métrica para el dataset (ver get_country_rankings)"""
+    cache_key, data_with_total = store_data_with_total(dataset)
+    rankings = _charts_cache.get(f"rankings_{cache_key}")
+    # Puede faltar si otro hilo descartó esa versión mientras tanto
+    return rankings if rankings is not None else get_country_rankings(data_with_total)
+
+def patch_country_traces(data, previous, countries, metric):
+    """
+    Construye un Patch que quita/agrega solo las trazas de los países que cambiaron
+    respecto de la selección anterior, en lugar de reenviar la figura completa.
+
+    Args:
+        data: DataFrame con la columna country y la métrica.
+        previous: Lista de países con traza en la figura actual, en orden.
+        countries: Nueva selección de países.
+        metric: Métrica a graficar (ver charts.country_area_trace).
+
+    Returns:
+        (Patch, list): El Patch y el nuevo orden de trazas.
+    """
+    patched = Patch()
+    # Borrar de atrás hacia adelante para que los índices sigan siendo válidos
+    for i in reversed(range(len(previous))):
+        if previous[i] not in countries:
+            del patched['data'][i]
+    kept = [c for c in previous if c in countries]
+    added = [c for c in countries if c not in previous]
+    for country in added:
+        patched['data'].append(country_area_trace(data, country, metric))
+    return patched, kept + added
+
+def only_triggered_by(component_id):
+    """True si el callback en curso se disparó únicamente por el 'value' del componente"""
+    return set(ctx.triggered_prop_ids) == {f'{component_id}.value'}
+
+def country_figure_update(data, previous, countries, metric, build_figure, full_rebuild):
+    """
+    Decide entre reconstruir la figura o enviar un Patch con las trazas que cambiaron.
+
+    Se reconstruye completa si cambió el dataset o el selector, si la figura actual no
+    tiene trazas (mensaje de 'No data') o si la nueva selección no tiene datos.
+
+    Returns:
+        (figure | Patch, list): La actualización y el orden de trazas para el Store.
+    """
+    countries = countries or []
+    has_data = data['country'].isin(countries).any()
+    if full_rebuild or not previous or not has_data:
+        return build_figure(), (countries if has_data else [])
+    return patch_country_traces(data, previous, countries, metric)
+
+# Cache con vencimiento para datos históricos que no dependen del rango de fechas
+# (opciones de las pestañas, free users, errores). Se refresca cada
+# STATIC_CACHE_TTL segundos. Las entradas que recalcula un job del refresco programado
+# (una vez por día, ver STATIC_JOBS) vencen recién a los SCHEDULED_STATIC_TTL segundos en
+# el worker que ejecuta los jobs (en los demás no se refrescan, ver warmup.is_scheduled):
+# así el primer request de cada hora en horario pico no paga la agregación completa, y
+# si el job falla o no entra en la ventana igual se refrescan en el primer uso.
+STATIC_CACHE_TTL = int(os.getenv('STATIC_CACHE_TTL', 3600))
+SCHEDULED_STATIC_TTL = int(os.getenv('SCHEDULED_STATIC_TTL', 2 * 86400))
+_static_cache = {}
+register_cache('static', _static_cache)
+
+def static_ttl(cache_key):
+    """Segundos que dura una entrada del cache estático"""
+    job = STATIC_JOBS.get(cache_key)
+    if job and warmup.is_scheduled(job):
+        return max(STATIC_CACHE_TTL, SCHEDULED_STATIC_TTL)
+    return STATIC_CACHE_TTL
+
+def get_static_entry(cache_key):
+    """(cargado en, STATIC_LOADERS[cache_key]()) cacheado durante static_ttl(cache_key) segundos"""
+    def load():
+        if cache_key in _static_cache:
+            record_cache_eviction('static')
+        print(f"Refrescando datos estáticos: {cache_key}")
+        return time.time(), STATIC_LOADERS[cache_key]()
+    return get_or_build('static', _static_cache, cache_key, load,
+                        valid=lambda entry: time.time() - entry[0] <= static_ttl(cache_key))
+
+def get_static_data(cache_key):
+    """Devuelve STATIC_LOADERS[cache_key]() cacheado durante static_ttl(cache_key) segundos"""
+    return get_static_entry(cache_key)[1]
+
+def refresh_static_data(cache_key):
+    """Recalcula una entrada del cache estático; mientras tanto se sigue sirviendo la anterior"""
+    with key_lock('static', cache_key):
+        value = STATIC_LOADERS[cache_key]()
+        _static_cache[cache_key] = (time.time(), value)
+    return value
+
+def get_usage_free_users():
+    """Ciclos consumidos por free users (histórico) con la fila 'Total' por país"""
+    return get_static_data('usage_free_users')
+
+def get_free_users_data(selector):
+    """Free users por país (histórico): 'Total Free Users' o 'Heavy Free Users'"""
+    return get_static_data({'Total Free Users': 'total_free_users', 'Heavy Free Users': 'heavy_free_users'}[selector])
+
+def get_errors_data(view):
+    """Errores por fecha (histórico) agrupados según la vista"""
+    return get_static_data(f'errors_{view}')
+
+def load_general_tab_options():
+    usage_free_users = get_usage_free_users()
+    countries = list(usage_free_users['country'].unique())
+    countries = sorted([c for c in countries if c != 'Total']) + ['Total']
+
+    # Las columnas de errores son las mismas en todas las vistas
+    errors = [col for col in get_errors_data('Daily').columns if col != 'localdate']
+    return countries, errors
+
+def get_general_tab_options():
+    """Opciones de los dropdowns de la pestaña general: (países, errores)"""
+    return get_static_data('general_tab_options')
+
+# Histograma de ciclos por (países, años). La clave incluye cuándo se cargó
+# usage_free_users, así que al refrescarse el cache estático se descartan los anteriores
+_histogram_cache = {}
+register_cache('histogram', _histogram_cache)
+
+def get_usage_histogram(countries, year_range):
+    """Figura de plot_user_histogram_faceted para los países y años elegidos, cacheada"""
+    # Datos y momento de carga de la misma entrada (el refresco programado puede reemplazarla)
+    loaded_at, usage_free_users = get_static_entry('usage_free_users')
+    cache_key = (loaded_at, tuple(countries or []), tuple(year_range))
+
+    def build():
+        stale = [key for key in list(_histogram_cache) if key[0] != loaded_at]
+        for key in stale:
+            _histogram_cache.pop(key, None)
+        if stale:
+            record_cache_eviction('histogram', len(stale))
+        filtered_df = filter_user_cycles(usage_free_users, countries or [], year_range)
+        return plot_user_histogram_faceted(filtered_df, countries)
+    return get_or_build('histogram', _histogram_cache, cache_key, build)
+
+# Cómo se calcula cada entrada del cache estático (también los usa el refresco programado)
+STATIC_LOADERS = {
+    'usage_free_users': lambda: add_total_as_country(aggregate_user_cycles(collection_free_cycles_by_country)),
+    'total_free_users': lambda: get_total_free_users(collection_free_cycles_by_country),
+    'heavy_free_users': lambda: get_heavy_free_users(collection_free_cycles_by_country),
+    **{f'errors_{view}': (lambda view=view: get_errors_by_date(collection_errors_by_date, view))
+       for view in ('Daily', 'Weekly', 'Monthly')},
+    'general_tab_options': load_general_tab_options,
+}
+
+# Job del refresco programado que recalcula cada entrada del cache estático
+STATIC_JOBS = {
+    **{cache_key: 'free_users' for cache_key in ('usage_free_users', 'total_free_users', 'heavy_free_users')},
+    **{f'errors_{view}': 'errors' for view in ('Daily', 'Weekly', 'Monthly')},
+    'general_tab_options': 'errors',
+}
+
+# Cache para datos de ratio: se calcula una vez por rango para todos los países
+# (incluido 'Total') y se guarda ya separado por país para filtrar al renderizar
 _ratio_cache = {}
+register_cache('ratio', _ratio_cache)
 
 def get_ratio_data(start_date, end_date, countries=None):
-    """Obtiene datos de ratio DAU/MAU con cache"""
-    cache_key = f"ratio_{start_date}_{end_date}_{str(sorted(countries) if countries else [])}"
-    
-    if cache_key not in _ratio_cache:
-        print(f"Obteniendo datos de ratio DAU/MAU para {countries}")
-        dau_data = get_chart_data(view='Daily', start_date = start_date, end_date = end_date)
-        mau_data = get_chart_data(view='Monthly', start_date = start_date, end_date = end_date)
-        dau_and_total_data = add_total_per_date(dau_data)
-        mau_and_total_data = add_total_per_date(mau_data)
-        _ratio_cache[cache_key] = get_dau_mau_ratio_data(dau_and_total_data, mau_and_total_data, countries)
-    return _ratio_cache[cache_key]
+    """Obtiene datos de ratio DAU/MAU con cache, filtrados por países"""
+    daily = {'view': 'Daily', 'start_date': start_date, 'end_date': end_date}
+    monthly = {'view': 'Monthly', 'start_date': start_date, 'end_date': end_date}
+    # Clave y datos de la misma versión de cada dataset
+    daily_key, dau_and_total_data = store_data_with_total(daily)
+    monthly_key, mau_and_total_data = store_data_with_total(monthly)
+    cache_key = f"ratio_{daily_key[len('total_'):]}_{monthly_key[len('total_'):]}"
+
+    def build():
+        print(f"Obteniendo datos de ratio DAU/MAU desde {start_date} hasta {end_date}")
+        ratio_data = get_dau_mau_ratio_data(dau_and_total_data, mau_and_total_data)
+        return ratio_data, dict(tuple(ratio_data.groupby('country', sort=False)))
+
+    ratio_data, by_country = get_or_build('ratio', _ratio_cache, cache_key, build)
+    if not countries:
+        return ratio_data
+    selected = [by_country[c] for c in countries if c in by_country]
+    if not selected:
+        return ratio_data.iloc[0:0]
+    return pd.concat(selected).sort_values('month_key', kind='stable')
+
+def warm_default_range():
+    """Dataset, ranking de países y ratio DAU/MAU del rango inicial de los selectores"""
+    start_date, end_date = default_date_range()
+    get_store_rankings({'view': resolve_view(start_date, end_date), 'start_date': start_date, 'end_date': end_date})
+    get_ratio_data(start_date, end_date)
+
+def warm_common_ranges():
+    """Datasets, rankings y ratio DAU/MAU de los rangos habituales en ambas vistas"""
+    for start_date, end_date in common_date_ranges():
+        for view in dict.fromkeys([resolve_view(start_date, end_date), 'Monthly']):
+            get_store_rankings({'view': view, 'start_date': start_date, 'end_date': end_date})
+        get_ratio_data(start_date, end_date)
+
+def refresh_static_job(job):
+    """Recalcula las entradas del cache estático del job (en orden de STATIC_JOBS)"""
+    for cache_key in [cache_key for cache_key, name in STATIC_JOBS.items() if name == job]:
+        refresh_static_data(cache_key)
+
+def refresh_free_users():
+    refresh_static_job('free_users')
+
+def refresh_errors():
+    refresh_static_job('errors')
+
+def refresh_total_metrics():
+    """Recalcula las métricas totales hasta hoy y reemplaza las anteriores"""
+    global _total_metrics
+    _total_metrics = calculate_total_metrics(collection_dau_by_country, collection_mau_by_country,
+                                             collection_new_users)
+
+# Tareas de precalentamiento: se ejecutan al iniciar la app (ver warmup.py). Sin el
+# dataset del rango inicial la primera carga de página consulta Mongo: la app no está lista
+warmup.add_task('total_metrics', get_total_metrics)
+warmup.add_task('default_range', warm_default_range, critical=True)
+warmup.add_task('general_tab', get_general_tab_options)
+
+def warm_static_data():
+    """Todas las entradas del cache estático: free users, errores y opciones de la pestaña general"""
+    for cache_key in STATIC_LOADERS:
+        get_static_data(cache_key)
+
+# Con PRELOAD el master carga también los históricos de free users y errores antes del
+# fork, para que los workers los compartan en lugar de consultarlos cada uno
+if warmup.PRELOAD:
+    warmup.add_task('static', warm_static_data)
+
+# Refresco programado en la ventana de baja carga (ver warmup.py)
+warmup.add_job('ranges', warm_common_ranges)
+warmup.add_job('free_users', refresh_free_users)
+warmup.add_job('errors', refresh_errors)
+warmup.add_job('total_metrics', refresh_total_metrics)
 
 def register_callbacks(app):
     
@@ -116,37 +613,70 @@ def register_callbacks(app):
     )
     def update_total_metrics(start_date):
         """Retorna métricas totales fijas - NO cambian con los filtros"""
+        total_metrics = get_total_metrics()
         return (
-            TOTAL_METRICS['total_new_users'],
-            TOTAL_METRICS['average_dau'], 
-            TOTAL_METRICS['average_mau'],
-            TOTAL_METRICS['total_interactions'], 
-            TOTAL_METRICS['total_audio'], 
-            TOTAL_METRICS['total_text']
+            total_metrics['total_new_users'],
+            total_metrics['average_dau'], 
+            total_metrics['average_mau'],
+            total_metrics['total_interactions'], 
+            total_metrics['total_audio'], 
+            total_metrics['total_text']
         )
+
+    # Vista según el rango: al cambiar las fechas, si la vista elegida supera
+    # MAX_CHART_POINTS se pasa a la más fina que no lo supere (las opciones siguen
+    # habilitadas, así que se puede volver a elegir la vista fina a mano).
+    # load_chart_data espera a este callback, así que el dataset se carga una sola vez.
+    @app.callback(
+        [
+            Output('view_selector', 'options'),
+            Output('view_selector', 'value')
+        ],
+        [
+            Input('start_date_picker', 'date'),
+            Input('end_date_picker', 'date')
+        ],
+        State('view_selector', 'value')
+    )
+    def limit_view_granularity(start_date, end_date, view):
+        start_date_str, end_date_str = parse_date_range(start_date, end_date)
+        resolved = resolve_view(start_date_str, end_date_str, view)
+        return view_options(start_date_str, end_date_str), (resolved if resolved != view else no_update)
+
+    # Callback de carga de datos: resuelve (view, start, end) una sola vez y publica
+    # un handle al cache en 'chart_data_store'. Los gráficos dependen de ese Store.
+    @app.callback(
+        Output('chart_data_store', 'data'),
+        [
+            Input('view_selector', 'value'),
+            Input('start_date_picker', 'date'), 
+            Input('end_date_picker', 'date')
+        ]
+    )
+    def load_chart_data(view, start_date, end_date):
+        """Carga el dataset del período una vez y devuelve su handle"""
+        start_date_str, end_date_str = parse_date_range(start_date, end_date)
+        version, _ = get_chart_entry(view, start_date_str, end_date_str)
+        # La versión cambia cuando se refresca la partición abierta: el Store cambia y
+        # los gráficos se vuelven a calcular con los datos nuevos
+        return {'view': view, 'start_date': start_date_str, 'end_date': end_date_str, 'version': version}
     
     # Callback para el contenido de las pestañas
     @app.callback(
         Output('tab-content', 'children'),
         [
             Input('main-tabs', 'value'), 
-            Input('view_selector', 'value'),
-            Input('start_date_picker', 'date'), 
-            Input('end_date_picker', 'date')
+            Input('view_selector', 'value')
         ]
     )
-    def render_tab_content(active_tab, view, start_date, end_date):
-        """Renderiza el contenido según la pestaña seleccionada"""
-        
+    def render_tab_content(active_tab, view):
+        """
+        Renderiza el esqueleto de la pestaña seleccionada. No depende de las fechas: las
+        opciones de la pestaña general salen de cache y las de países las completa
+        update_country_dropdowns a partir del dataset compartido.
+        """
         if active_tab == 'general':
-            usage_free_users = aggregate_user_cycles(collection_free_cycles_by_country)
-            usage_free_users = add_total_as_country(usage_free_users)
-            countries = list(usage_free_users['country'].unique())
-            countries = sorted([c for c in countries if c != 'Total']) + ['Total']
-            
-            # Errors
-            errors_by_date = get_errors_by_date(collection_errors_by_date, view)
-            errors = [col for col in errors_by_date.columns if col != 'localdate']
+            countries, errors = get_general_tab_options()
             return html.Div([
                 # Gráficos - Vista General
                 html.Div([
@@ -182,6 +712,8 @@ def register_callbacks(app):
                                              min_date_allowed=datetime(2024, 1, 1),
                                              style={'marginRight': '20px'}),
                         html.Button("Mostrar gráfico", id="show-features-chart-btn", n_clicks=0),
+                        html.Progress(id="features-progress", value="0", max="6",
+                                      style={'visibility': 'hidden', 'width': '100%', 'marginTop': '10px'}),
                         dcc.Graph(id="features-chart")], 
                     style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
                     
@@ -228,63 +760,47 @@ def register_callbacks(app):
                 ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around'})
             ])
         elif active_tab == 'países':
-            # Obtener países disponibles para el período seleccionado
-            start = datetime.strptime(start_date[:10], '%Y-%m-%d')
-            end = datetime.strptime(end_date[:10], '%Y-%m-%d')
-            start_date_str = start.strftime('%Y-%m-%d')
-            end_date_str = end.strftime('%Y-%m-%d')
-            
-            data = get_chart_data(view, start_date_str, end_date_str)
-            data_with_total = add_total_per_date(data)
-            countries = data_with_total["country"].unique() if len(data_with_total) > 0 else []
-            
             return html.Div([
                 # ACTIVE USERS CHART
                 html.Div([
                         html.Label("Selecciona país(es):"),
-                        dcc.Dropdown(id="country_dropdown_dau", options=[{"label": c, "value": c} for c in countries],
-                                    value=data_with_total.groupby('country')['count'].sum().sort_values(ascending=False).head(15).index.tolist(),
-                                    multi=True),
+                        dcc.Dropdown(id="country_dropdown_dau", options=[], value=[], multi=True),
                         html.H3(f"{view} Active Users", style={'textAlign': 'center'}), 
                         dcc.RadioItems(id = 'dau_selector', options = ['Total Active Users', 'Free Users', 'Subscribed Users'], value = 'Total Active Users',inline=True, labelStyle={'margin-right': '20px'}, style={'marginTop': '10px', 'textAlign': 'center'}), 
+                        dcc.Store(id='dau_by_country_traces'),
                         dcc.Graph(id='dau_by_country')], 
                     style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
                 # COUNTRY SHARES CHART
                 html.Div([
                         html.Label("Selecciona país(es):"),
-                        dcc.Dropdown(id="country_shares_dropdown", options=[{"label": c, "value": c} for c in countries],
-                                    value=data_with_total.groupby('country')['count'].sum().sort_values(ascending=False).head(15).index.tolist(),
-                                    multi=True),
+                        dcc.Dropdown(id="country_shares_dropdown", options=[], value=[], multi=True),
                         html.H3(f"Country Shares of {view} Active Users", style={'textAlign': 'center'}), 
                         dcc.RadioItems(id = 'dau_selector_share', options = ['Total Active Users', 'Free Users', 'Subscribed Users'], value = 'Total Active Users',inline=True, labelStyle={'margin-right': '20px'}, style={'marginTop': '10px', 'textAlign': 'center'}), 
                         dcc.RadioItems(id = 'total_category_selector', options = ["Relative to selected category total", "Relative to total"], value = "Relative to selected category total",inline=True, labelStyle={'margin-right': '20px'}, style={'marginTop': '10px', 'textAlign': 'center'}), 
+                        dcc.Store(id='country_share_store'),
                         dcc.Graph(id='country_share_by_country')], 
                     style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
                 # New users chart
                 html.Div([
                         html.Label("Selecciona país(es):"),
-                        dcc.Dropdown(id="country_dropdown_new_users", options=[{"label": c, "value": c} for c in countries],
-                                    value=data_with_total.groupby('country')['new_users'].sum().sort_values(ascending=False).head(15).index.tolist(),
-                                    multi=True),
+                        dcc.Dropdown(id="country_dropdown_new_users", options=[], value=[], multi=True),
                         html.H3(f"{view} New Users", style={'textAlign': 'center'}), 
+                        dcc.Store(id='new_users_by_country_traces'),
                         dcc.Graph(id='new_users_by_country')], 
                     style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
                 # Interactions chart
                 html.Div([
                         html.Label("Selecciona país(es):"),
-                        dcc.Dropdown(id="country_dropdown_interactions", options=[{"label": c, "value": c} for c in countries],
-                                    value=data_with_total.groupby('country')['interactions'].sum().sort_values(ascending=False).head(15).index.tolist(),
-                                    multi=True),
+                        dcc.Dropdown(id="country_dropdown_interactions", options=[], value=[], multi=True),
                         html.H3(f"{view} Interactions", style={'textAlign': 'center'}), 
                         dcc.RadioItems(id = 'interaction_selector', options = ['Total Interactions', 'Audio', 'Text'], value = 'Total Interactions',inline=True, labelStyle={'margin-right': '20px'}, style={'marginTop': '10px', 'textAlign': 'center'}), 
+                        dcc.Store(id='interactions_by_country_traces'),
                         dcc.Graph(id='interactions_by_country')], 
                     style={'flex': '1', 'minWidth': '45%', 'margin': '10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'}),
                 # DAU/MAU ratio chart
                 html.Div([
                         html.Label("Selecciona país(es):"),
-                        dcc.Dropdown(id="country_dropdown_DAU/MAU_ratio", options=[{"label": c, "value": c} for c in countries],
-                                    value=data_with_total.groupby('country')['count'].sum().sort_values(ascending=False).head(15).index.tolist(),
-                                    multi=True),
+                        dcc.Dropdown(id="country_dropdown_DAU/MAU_ratio", options=[], value=[], multi=True),
                         html.H3("DAU/MAU Ratio por Mes", style={'textAlign': 'center'}), 
                         dcc.Graph(id='dau_mau_ratio_chart')], 
                     style={'margin': '20px 10px', 'border': '1px solid #ddd', 'borderRadius': '5px', 'padding': '10px'})
@@ -307,6 +823,32 @@ def register_callbacks(app):
         #                 ], style={'margin': '20px', 'marginBottom': '40px'}),
 
         return html.Div([html.P("Selecciona una pestaña para ver el contenido.")])
+
+    # Opciones y selección por defecto de los dropdowns de países según el período
+    @app.callback(
+        [
+            Output('country_dropdown_dau', 'options'),
+            Output('country_dropdown_dau', 'value'),
+            Output('country_shares_dropdown', 'options'),
+            Output('country_shares_dropdown', 'value'),
+            Output('country_dropdown_new_users', 'options'),
+            Output('country_dropdown_new_users', 'value'),
+            Output('country_dropdown_interactions', 'options'),
+            Output('country_dropdown_interactions', 'value'),
+            Output('country_dropdown_DAU/MAU_ratio', 'options'),
+            Output('country_dropdown_DAU/MAU_ratio', 'value')
+        ],
+        Input('chart_data_store', 'data')
+    )
+    def update_country_dropdowns(dataset):
+        """Completa los dropdowns de la pestaña de países para el dataset seleccionado"""
+        rankings = get_store_rankings(dataset)
+        options = [{"label": c, "value": c} for c in rankings['countries']]
+        return (options, rankings['count'],
+                options, rankings['count'],
+                options, rankings['new_users'],
+                options, rankings['interactions'],
+                options, rankings['count'])
     
     # Callback para gráficos generales - SÍ cambian con filtros
     @app.callback(
@@ -319,21 +861,14 @@ def register_callbacks(app):
             Output('subscribed_users_percent_fig', 'figure')
         ],
         [
-            Input('start_date_picker', 'date'), 
-            Input('end_date_picker', 'date'),
-            Input('view_selector', 'value'),
+            Input('chart_data_store', 'data'),
         ]
     )
-    def update_general_charts(start_date, end_date, view):
+    def update_general_charts(dataset):
         """Actualiza gráficos generales según filtros seleccionados"""
-        # Parsear fechas
-        start = datetime.strptime(start_date[:10], '%Y-%m-%d')
-        end = datetime.strptime(end_date[:10], '%Y-%m-%d')
-        start_date_str = start.strftime('%Y-%m-%d')
-        end_date_str = end.strftime('%Y-%m-%d')
-        
         # Obtener datos para el período seleccionado
-        data = get_chart_data(view, start_date_str, end_date_str)
+        view = dataset['view'] if dataset else None
+        data = get_store_data(dataset)
         
         # Agregar datos para gráficos
         total_active_users = data.groupby('date')[['count', 'new_users']].sum().reset_index()
@@ -366,7 +901,7 @@ def register_callbacks(app):
         ]
     )
     def update_errors_charts(errors, view, start, end):
-        errors_data = get_errors_by_date(collection_errors_by_date, view)
+        errors_data = get_errors_data(view)
         errors_by_date_fig = errors_by_date_chart(errors_data, errors, view)
         
         invalid_format_types = get_invalid_format_types(collection_invalid_format_types, start, end)
@@ -387,86 +922,116 @@ def register_callbacks(app):
         ]
     )
     def update_general_free_users_charts(free_users_data_selector,countries_list, year_range):
-        # Total Free Users
-        if free_users_data_selector == 'Total Free Users':
-            free_users_data = get_total_free_users(collection_free_cycles_by_country)
-        elif free_users_data_selector == 'Heavy Free Users':
-            free_users_data = get_heavy_free_users(collection_free_cycles_by_country)
-
-        usage_free_users = aggregate_user_cycles(collection_free_cycles_by_country)
-        usage_free_users = add_total_as_country(usage_free_users)
-        filtered_df = filter_user_cycles(usage_free_users, countries_list, year_range)
-        
+        # Total o Heavy Free Users (histórico, cacheado)
+        free_users_data = get_free_users_data(free_users_data_selector)
+
         # # Graficos 
         heat_map_users_fig = heat_map_users_by_country(free_users_data, title = 'Heavy User condition: cycles_consumed >= max_cycles')
         tree_map_users_fig = tree_map_users_by_country(free_users_data, title = 'Heavy User condition: cycles_consumed >= max_cycles')
-        free_users_usage_fig = plot_user_histogram_faceted (filtered_df)
+        # Histograma ya binado, cacheado por (países, años)
+        free_users_usage_fig = get_usage_histogram(countries_list, year_range)
         return heat_map_users_fig, tree_map_users_fig,free_users_usage_fig
 
 
-    # Callback para gráficos por país - SÍ cambian con filtros
+    # Callbacks para gráficos por país - uno por figura, cada uno depende solo del
+    # dataset compartido y de su propio dropdown/selector. Si solo cambia el dropdown
+    # se envía un Patch con las trazas agregadas o quitadas; los Stores '*_traces'
+    # guardan el orden de trazas de cada figura.
     @app.callback(
         [
             Output('dau_by_country', 'figure'),
-            Output('country_share_by_country', 'figure'),
-            Output('new_users_by_country', 'figure'),
-            Output('interactions_by_country', 'figure')
+            Output('dau_by_country_traces', 'data')
         ],
         [
-            Input('start_date_picker', 'date'), 
-            Input('end_date_picker', 'date'),
-            Input('view_selector', 'value'),
+            Input('chart_data_store', 'data'),
             Input("country_dropdown_dau", "value"),
-            Input("country_dropdown_new_users", "value"),
+            Input('dau_selector', 'value')
+        ],
+        State('dau_by_country_traces', 'data')
+    )
+    def update_dau_by_country(dataset, countries, dau_selector, previous):
+        """Actualiza el gráfico de usuarios activos por país"""
+        data_key, data = store_data_with_total(dataset)
+        return country_figure_update(
+            data, previous, countries, DAU_METRICS[dau_selector],
+            lambda: get_dau_chart(data, dau_selector, countries, dataset['view'], data_key),
+            full_rebuild=not only_triggered_by('country_dropdown_dau'))
+
+    @app.callback(
+        [
+            Output('new_users_by_country', 'figure'),
+            Output('new_users_by_country_traces', 'data')
+        ],
+        [
+            Input('chart_data_store', 'data'),
+            Input("country_dropdown_new_users", "value")
+        ],
+        State('new_users_by_country_traces', 'data')
+    )
+    def update_new_users_by_country(dataset, countries, previous):
+        """Actualiza el gráfico de nuevos usuarios por país"""
+        data = get_store_data_with_total(dataset)
+        return country_figure_update(
+            data, previous, countries, 'new_users',
+            lambda: new_users_by_country(data, countries, dataset['view']),
+            full_rebuild=not only_triggered_by('country_dropdown_new_users'))
+
+    @app.callback(
+        [
+            Output('interactions_by_country', 'figure'),
+            Output('interactions_by_country_traces', 'data')
+        ],
+        [
+            Input('chart_data_store', 'data'),
             Input("country_dropdown_interactions", "value"),
-            Input ('country_shares_dropdown', 'value'),
-            Input('dau_selector', 'value'),
-            Input('dau_selector_share', 'value'),
-            Input ('total_category_selector', 'value'),
             Input('interaction_selector', 'value')
-        ]
+        ],
+        State('interactions_by_country_traces', 'data')
     )
-    def update_charts_by_country(start_date, end_date, view, 
-                                 country_dropdown_dau, country_dropdown_new_users, 
-                                 country_dropdown_interactions, country_shares_dropdown,
-                                 dau_selector, dau_selector_share, total_category_selector, interaction_selector):
-        """Actualiza gráficos por país según filtros seleccionados"""
-        # Parsear fechas
-        start = datetime.strptime(start_date[:10], '%Y-%m-%d')
-        end = datetime.strptime(end_date[:10], '%Y-%m-%d')
-        start_date_str = start.strftime('%Y-%m-%d')
-        end_date_str = end.strftime('%Y-%m-%d')
+    def update_interactions_by_country(dataset, countries, interaction_selector, previous):
+        """Actualiza el gráfico de interacciones por país"""
+        data = get_store_data_with_total(dataset)
+        return country_figure_update(
+            data, previous, countries, INTERACTION_METRICS[interaction_selector],
+            lambda: interactions_by_country_chart(data, countries, dataset['view'], interaction_selector),
+            full_rebuild=not only_triggered_by('country_dropdown_interactions'))
 
-        # Obtener datos para el período seleccionado
-        data = get_chart_data(view, start_date_str, end_date_str)
-        data_with_total = add_total_per_date(data)
+    # Shares por país: el servidor envía una sola vez los porcentajes de todas las
+    # categorías y modos; los selectores y el dropdown se resuelven en el navegador
+    @app.callback(
+        Output('country_share_store', 'data'),
+        Input('chart_data_store', 'data')
+    )
+    def update_country_share_data(dataset):
+        data = get_store_data(dataset)
+        return get_country_share_data(data, dataset['view'])
 
-        # Generar gráficos por país
-        users_by_country_fig = get_dau_chart(data_with_total, dau_selector, country_dropdown_dau, view)
-        country_share_by_country = country_share(data, country_shares_dropdown, view, dau_selector_share, total_category_selector)
-        new_users_by_country_fig = new_users_by_country(data_with_total, country_dropdown_new_users, view)
-        interactions_by_country_fig = interactions_by_country_chart(data_with_total, country_dropdown_interactions, view, interaction_selector)
-        return users_by_country_fig, country_share_by_country, new_users_by_country_fig, interactions_by_country_fig
+    clientside_callback(
+        ClientsideFunction(namespace='charts', function_name='countryShare'),
+        Output('country_share_by_country', 'figure'),
+        [
+            Input('country_share_store', 'data'),
+            Input('country_shares_dropdown', 'value'),
+            Input('dau_selector_share', 'value'),
+            Input('total_category_selector', 'value')
+        ]
+    )
     
     # Nuevo callback para el gráfico DAU/MAU ratio
     @app.callback(
         Output('dau_mau_ratio_chart', 'figure'),
         [
-            Input('start_date_picker', 'date'), 
-            Input('end_date_picker', 'date'),
+            Input('chart_data_store', 'data'),
             Input("country_dropdown_DAU/MAU_ratio", "value")
         ]
     )
-    def update_dau_mau_ratio_chart(start_date, end_date, countries):
+    def update_dau_mau_ratio_chart(dataset, countries):
         """Actualiza gráfico de ratio DAU/MAU"""
-        # Parsear fechas
-        start = datetime.strptime(start_date[:10], '%Y-%m-%d')
-        end = datetime.strptime(end_date[:10], '%Y-%m-%d')
-        start_date_str = start.strftime('%Y-%m-%d')
-        end_date_str = end.strftime('%Y-%m-%d')
-
-        # Obtener datos de ratio
-        ratio_data = get_ratio_data(start_date_str, end_date_str, countries)
+        if not dataset:
+            raise PreventUpdate
+
+        # Obtener datos de ratio (siempre diario + mensual, independiente de la vista)
+        ratio_data = get_ratio_data(dataset['start_date'], dataset['end_date'], countries)
     
         # Generar gráfico
         return dau_mau_ratio_chart(ratio_data, countries, "DAU/MAU Ratio por Mes")
@@ -497,22 +1062,40 @@ def register_callbacks(app):
         mensajes_df = pd.DataFrame({"mensajes": mensajes})
         return dcc.send_data_frame(mensajes_df.to_csv, "contenido_mensajes_usuarios.csv", index = False)
     
-    # Callback de features
+    # Callback de features - corre en segundo plano (background_callback_manager de app.py)
+    # para no bloquear un worker web; informa el avance por cada consulta terminada y se
+    # cancela si el usuario cambia las fechas.
     @app.callback(
         Output("features-chart", "figure"),
         Input("show-features-chart-btn", "n_clicks"),
         State("features-start-date", 'date'),
         State("features-end-date", 'date'),
+        background=True,
+        progress=[Output("features-progress", "value"), Output("features-progress", "max")],
+        running=[
+            (Output("show-features-chart-btn", "disabled"), True, False),
+            (Output("features-progress", "style"),
+             {'visibility': 'visible', 'width': '100%', 'marginTop': '10px'},
+             {'visibility': 'hidden', 'width': '100%', 'marginTop': '10px'}),
+        ],
+        cancel=[Input("features-start-date", 'date'), Input("features-end-date", 'date')],
         prevent_initial_call=True
     )
-    def show_features_dau_chart(n_clicks, start, end):
-        image_data_df = get_image_data(collection_calls, start, end)
-        docs_data_df = get_documents_data(collection_calls, start, end)
-        video_data_df = get_video_data(collection_calls, start, end)
-        youtube_data_df = get_youtube_data(collection_calls, start, end)
-
-        list_data_df = get_lists_data(collection_lists, start, end)
-        reminders_data_df = get_reminders_data(collection_rme, start, end)
+    def show_features_dau_chart(set_progress, n_clicks, start, end):
+        queries = [
+            (get_image_data, collection_calls),
+            (get_documents_data, collection_calls),
+            (get_video_data, collection_calls),
+            (get_youtube_data, collection_calls),
+            (get_lists_data, collection_lists),
+            (get_reminders_data, collection_rme),
+        ]
+        results = []
+        set_progress(("0", str(len(queries))))
+        for i, (reader, collection) in enumerate(queries, start=1):
+            results.append(reader(collection, start, end))
+            set_progress((str(i), str(len(queries))))
+        image_data_df, docs_data_df, video_data_df, youtube_data_df, list_data_df, reminders_data_df = results
 
         final_df = get_features_df(image_data_df, docs_data_df, video_data_df, youtube_data_df, reminders_data_df, list_data_df)
         fig = plot_dau_lines(final_df)
@@ -1,6 +1,10 @@
+import os
+
+import numpy as np
 import plotly.graph_objs as go
-import plotly.express as px
+# plotly.express (~0.1s de import) se importa dentro de las funciones que lo usan
 import pandas as pd
+from instrumentation import instrument_functions
 
 def active_users_chart(df, view):
     fig = go.Figure()
@@ -93,6 +97,30 @@ def subscribed_users_percent_chart(df, view):
                         yaxis_tickformat=',', title_x=0.5)
     return fig
 
+# Columna a graficar según el selector de interacciones
+INTERACTION_METRICS = {'Total Interactions': 'interactions', 'Audio': 'audio', 'Text': 'text'}
+
+def country_area_trace(data, country, metric):
+    """
+    Traza de área de un país para los gráficos por país.
+
+    Args:
+        data: DataFrame con columnas date, country y la métrica.
+        country: País a graficar.
+        metric: Columna a graficar, o 'free' para count - subscribed.
+    """
+    country_data = data[data['country'] == country]
+    if metric == 'free':
+        y_data = country_data['count'] - country_data['subscribed']
+    else:
+        y_data = country_data[metric]
+    return go.Scatter(x=country_data['date'],y=y_data,name=country,mode='lines+markers',
+                      line_shape='spline',  # Líneas suaves
+                      marker=dict(size=4, symbol='circle'),
+                      fill='tozeroy',  # Área desde y=0
+                      opacity=0.5  # Transparencia para ver áreas superpuestas
+    )
+
 def users_by_country(data, countries, view):
     # Filtrar datos por países seleccionados
     filtered = data[data["country"].isin(countries)]
@@ -109,83 +137,13 @@ def users_by_country(data, countries, view):
     # Crear gráfico de área superpuesta
     fig = go.Figure()
     for country in countries:
-        country_data = filtered[filtered['country'] == country]
-        fig.add_trace(
-            go.Scatter(x=country_data['date'],y=country_data['count'],name=country,mode='lines+markers',
-                        line_shape='spline',  # Líneas suaves
-                        marker=dict(size=4, symbol='circle'),
-                        fill='tozeroy',  # Área desde y=0
-                        opacity=0.5  # Transparencia para ver áreas superpuestas
-            )
-        )
+        fig.add_trace(country_area_trace(filtered, country, 'count'))
     
     # Configurar layout
     fig.update_layout(yaxis_title="Users", xaxis_title="Date", yaxis_tickformat=',', title=f"{view} Active Users",
                         title_x=0.5, hovermode='x unified', showlegend=True)    
     return fig
 
-def country_share(data, countries, view, selector, total_selector):
-    # Crear una copia de los datos para no modificar el original
-    df = data.copy()
-    
-    # Crear categoría 'Others' para países no seleccionados
-    df['country'] = df['country'].apply(lambda x: x if x in countries else 'Others')
-    
-    # Agrupar por fecha y país, sumando los conteos
-    grouped = df.groupby(['date', 'country'])[['count', 'subscribed']].sum().reset_index()
-    grouped['free_users'] = grouped['count'] - grouped['subscribed']
-
-    # Calcular porcentajes por día
-    grouped['count_pct'] = grouped['count'] / grouped.groupby('date')['count'].transform('sum') * 100
-    if total_selector == "Relative to selected category total":
-        grouped['subscribed_pct'] = grouped['subscribed'] / grouped.groupby('date')['subscribed'].transform('sum') * 100
-        grouped['free_users_pct'] = grouped['free_users'] / grouped.groupby('date')['free_users'].transform('sum') * 100
-    elif total_selector == "Relative to total":
-        grouped['subscribed_pct'] = grouped['subscribed'] / grouped.groupby('date')['count'].transform('sum') * 100
-        grouped['free_users_pct'] = grouped['free_users'] / grouped.groupby('date')['count'].transform('sum') * 100
-    
-    # Manejar caso de datos vacíos
-    if grouped.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for the selected countries",
-            xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False
-        )
-        return fig
-
-    if selector == 'Total Active Users':
-        grouped['y'] = grouped['count_pct']
-    elif selector == 'Subscribed Users':
-        grouped['y'] = grouped['subscribed_pct']
-    elif selector == 'Free Users':
-        grouped['y'] = grouped['free_users_pct']
-    else:
-        raise ValueError("Selector inválido")
-    grouped['y'] = grouped['y'].round(2)  #para redondear porcentajes
-    
-    # Crear figura
-    fig = go.Figure()
-
-    # Agregar una traza por país
-    for country in grouped['country'].unique():
-        country_data = grouped[grouped['country'] == country]
-        fig.add_trace(go.Bar(x=country_data['date'], y=country_data['y'], name=country))
-
-    # Configurar layout
-    fig.update_layout(
-        barmode='stack',
-        yaxis_title="Country Share (%)",
-        xaxis_title="Date",
-        title=f"{view} Country Share",
-        title_x=0.5,
-        hovermode='x unified',
-        yaxis=dict(tickvals=[0, 25, 50, 75, 100], ticktext=['0%', '25%', '50%', '75%', '100%']),
-        height=500,
-        legend_title="Country"
-    )
-
-    return fig
-
 def interactions_by_country_chart(data, countries, view, selector):
     # Filtrar datos por países seleccionados
     filtered = data[data["country"].isin(countries)]
@@ -201,23 +159,9 @@ def interactions_by_country_chart(data, countries, view, selector):
     
     # Crear gráfico de área superpuesta
     fig = go.Figure()
+    metric = INTERACTION_METRICS[selector]
     for country in countries:
-        country_data = filtered[filtered['country'] == country]
-        if selector == 'Total Interactions':
-            y_data = country_data['interactions']
-        elif selector == 'Audio':
-            y_data = country_data['audio']
-        elif selector == 'Text':
-            y_data = country_data['text']
-
-        fig.add_trace(
-            go.Scatter(x=country_data['date'],y=y_data,name=country,mode='lines+markers',
-                        line_shape='spline',  # Líneas suaves
-                        marker=dict(size=4, symbol='circle'),
-                        fill='tozeroy',  # Área desde y=0
-                        opacity=0.5  # Transparencia para ver áreas superpuestas
-            )
-        )
+        fig.add_trace(country_area_trace(filtered, country, metric))
     
     # Configurar layout
     fig.update_layout(yaxis_title="Users", xaxis_title="Date", yaxis_tickformat=',', title=f"{view} Active Users",
@@ -240,15 +184,7 @@ def new_users_by_country(data, countries, view):
     # Crear gráfico de área superpuesta
     fig = go.Figure()
     for country in countries:
-        country_data = filtered[filtered['country'] == country]
-        fig.add_trace(
-            go.Scatter(x=country_data['date'],y=country_data['new_users'],name=country,mode='lines+markers',
-                        line_shape='spline',  # Líneas suaves
-                        marker=dict(size=4, symbol='circle'),
-                        fill='tozeroy',  # Área desde y=0
-                        opacity=0.5  # Transparencia para ver áreas superpuestas
-            )
-        )
+        fig.add_trace(country_area_trace(filtered, country, 'new_users'))
     
     # Configurar layout
     fig.update_layout(yaxis_title="Users", xaxis_title="Date", yaxis_tickformat=',', title=f"{view} New Users",
@@ -271,15 +207,7 @@ def subs_by_country_chart(data, countries, view):
     # Crear gráfico de área superpuesta
     fig = go.Figure()
     for country in countries:
-        country_data = filtered[filtered['country'] == country]
-        fig.add_trace(
-            go.Scatter(x=country_data['date'],y=country_data['subscribed'],name=country,mode='lines+markers',
-                        line_shape='spline',  # Líneas suaves
-                        marker=dict(size=4, symbol='circle'),
-                        fill='tozeroy',  # Área desde y=0
-                        opacity=0.5  # Transparencia para ver áreas superpuestas
-            )
-        )
+        fig.add_trace(country_area_trace(filtered, country, 'subscribed'))
     
     # Configurar layout
     fig.update_layout(yaxis_title="Users", xaxis_title="Date", yaxis_tickformat=',', title=f"{view} Subscribed Active Users",
@@ -302,16 +230,7 @@ def free_users_by_country(data, countries, view):
     # Crear gráfico de área superpuesta
     fig = go.Figure()
     for country in countries:
-        country_data = filtered[filtered['country'] == country]
-        country_data['free'] = country_data['count'] - country_data['subscribed']
-        fig.add_trace(
-            go.Scatter(x=country_data['date'],y=country_data['free'],name=country,mode='lines+markers',
-                        line_shape='spline',  # Líneas suaves
-                        marker=dict(size=4, symbol='circle'),
-                        fill='tozeroy',  # Área desde y=0
-                        opacity=0.5  # Transparencia para ver áreas superpuestas
-            )
-        )
+        fig.add_trace(country_area_trace(filtered, country, 'free'))
     
     # Configurar layout
     fig.update_layout(yaxis_title="Users", xaxis_title="Date", yaxis_tickformat=',', title=f"{view} Free Active Users",
@@ -327,6 +246,7 @@ def dau_mau_ratio_chart(data, countries, title="DAU/MAU Ratio"):
         countries: Lista de países seleccionados
         title: Título del gráfico
     """
+    import plotly.express as px
     
     if data.empty:
         fig = go.Figure()
@@ -389,6 +309,7 @@ def heat_map_users_by_country(total_users_by_country, title = 'Includes All Hist
     return fig
 
 def tree_map_users_by_country(df_treemap, title = 'Includes All Historic Free Users'):
+    import plotly.express as px
     fig_treemap = px.treemap(
         df_treemap,
         path=['country'],
@@ -420,6 +341,7 @@ def tree_map_users_by_country(df_treemap, title = 'Includes All Historic Free Us
     return fig_treemap
 
 def plot_histogram_users_by_cycles(df):
+    import plotly.express as px
     total_df = (
         df.groupby("cycles_consumed", as_index=False)["Users"]
         .sum()
@@ -445,32 +367,87 @@ def plot_histogram_users_by_cycles(df):
     
     return fig
 
-def plot_user_histogram_faceted(df):
-    fig = px.histogram(
-        df,
-        x='cycles_consumed',
-        y='Users',
-        color='last_date',
-        facet_col='country',
-        barmode='stack',
-        nbins=21,
-        title='Users by Consumed Cycles (per country and year)'
-    )
+# Histograma por país: como mucho HISTOGRAM_MAX_FACETS paneles, HISTOGRAM_FACET_COLUMNS por fila
+HISTOGRAM_BINS = 21
+HISTOGRAM_FACET_COLUMNS = int(os.getenv('HISTOGRAM_FACET_COLUMNS', 4))
+HISTOGRAM_MAX_FACETS = int(os.getenv('HISTOGRAM_MAX_FACETS', 12))
 
-    # Limpiar etiquetas "country=Argentina" → solo "Argentina"
-    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
-    # Eliminar títulos de ejes X individuales
-    fig.for_each_xaxis(lambda x: x.update(title=''))
+def _cycle_bins(cycles, nbins=HISTOGRAM_BINS):
+    """Bordes de bins de ancho entero comunes a todos los paneles (como mucho nbins bins)"""
+    low, high = int(cycles.min()), int(cycles.max())
+    width = max(-(-(high - low + 1) // nbins), 1)
+    return np.arange(low, high + 1 + width, width)
 
-    # Mostrar el eje X solo una vez
-    fig.update_xaxes(matches=None, showticklabels=True)
-    fig.update_traces(marker_line_width=1, marker_line_color='white')
+def _bin_user_cycles(df, countries, years, edges):
+    """
+    Usuarios por (país, año, bin) en un solo np.bincount, pesando por 'Users'.
 
-    fig.update_layout(
-        xaxis_title='Cycles Consumed',
-        yaxis_title='Free Users',
-        legend_title='Year'
-    )
+    Returns:
+        np.ndarray: Matriz (len(countries), len(years), len(edges) - 1).
+    """
+    nbins = len(edges) - 1
+    country_codes = pd.Categorical(df['country'], categories=countries).codes
+    year_codes = np.searchsorted(years, df['last_date'].to_numpy())
+    bin_codes = np.searchsorted(edges, df['cycles_consumed'].to_numpy(), side='right') - 1
+    keys = (country_codes * len(years) + year_codes) * nbins + bin_codes
+    counts = np.bincount(keys, weights=df['Users'].to_numpy(), minlength=len(countries) * len(years) * nbins)
+    return np.rint(counts).astype(np.int64).reshape(len(countries), len(years), nbins)
+
+def plot_user_histogram_faceted(df, countries=None):
+    """
+    Histograma de usuarios por ciclos consumidos, un panel por país y barras apiladas por año.
+
+    Los bins se calculan acá (np.bincount) y se dibujan como go.Bar con solo los bins no
+    vacíos, en vez de mandarle las filas a px.histogram. Los paneles siguen el orden de
+    `countries` (o el de aparición en df) y se limitan a HISTOGRAM_MAX_FACETS.
+    """
+    from plotly.colors import qualitative
+    from plotly.subplots import make_subplots
+
+    title = 'Users by Consumed Cycles (per country and year)'
+    if df.empty:
+        return go.Figure(layout=dict(title=title))
+
+    present = set(df['country'])
+    facets = [c for c in (countries or pd.unique(df['country'])) if c in present]
+    if len(facets) > HISTOGRAM_MAX_FACETS:
+        title += f' - showing {HISTOGRAM_MAX_FACETS} of {len(facets)} countries'
+        facets = facets[:HISTOGRAM_MAX_FACETS]
+        df = df[df['country'].isin(facets)]
+
+    years = np.sort(df['last_date'].unique())
+    edges = _cycle_bins(df['cycles_consumed'])
+    counts = _bin_user_cycles(df, facets, years, edges)
+    centers = (edges[:-1] + edges[1:] - 1) / 2
+    width = edges[1] - edges[0]
+    labels = np.array([f'{a}' if b - a == 1 else f'{a}-{b - 1}' for a, b in zip(edges[:-1], edges[1:])])
+
+    columns = min(len(facets), HISTOGRAM_FACET_COLUMNS)
+    rows = -(-len(facets) // columns)
+    fig = make_subplots(rows=rows, cols=columns, subplot_titles=facets, shared_yaxes=True,
+                        horizontal_spacing=0.03, vertical_spacing=0.35 / rows)
+    colors = qualitative.Plotly
+    # Cada año aparece una vez en la leyenda, con la primera traza que lo tiene
+    shown = set()
+    for i, country in enumerate(facets):
+        for j, year in enumerate(years):
+            values = counts[i, j]
+            mask = values > 0
+            if not mask.any():
+                continue
+            fig.add_trace(go.Bar(x=centers[mask], y=values[mask], width=width, customdata=labels[mask],
+                                 name=str(year), legendgroup=str(year), showlegend=year not in shown,
+                                 marker_color=colors[j % len(colors)],
+                                 hovertemplate=f'{year}<br>Cycles: %{{customdata}}<br>Users: %{{y:,}}<extra></extra>'),
+                          row=i // columns + 1, col=i % columns + 1)
+            shown.add(year)
+
+    fig.update_traces(marker_line_width=1, marker_line_color='white')
+    fig.update_xaxes(showticklabels=True)
+    # Títulos de ejes una sola vez: X en la última fila, Y en la primera columna
+    fig.update_xaxes(title_text='Cycles Consumed', row=rows)
+    fig.update_yaxes(title_text='Free Users', col=1)
+    fig.update_layout(title=title, barmode='stack', bargap=0, legend_title='Year', height=max(450, 300 * rows))
 
     return fig
 
@@ -493,6 +470,7 @@ def errors_by_date_chart(data, errors, view):
     return fig
 
 def invalid_format_types_chart(df):
+    import plotly.express as px
     # Calcular porcentajes
     total = df['count'].sum()
     df['percentage'] = df['count'] / total * 100
@@ -548,3 +526,7 @@ def invalid_format_types_chart(df):
             trace.name = others_row['details'].iloc[0]  # Mostrar detalles en la leyenda
 
     return fig
+
+
+# Medir el tiempo de construcción de cada figura (ver instrumentation.py)
+instrument_functions(__name__, 'plotly')
@@ -0,0 +1,84 @@
+"""
+Cliente de MongoDB compartido por la app.
+
+Por defecto se conecta a MONGO_URI. Los benchmarks y la prueba de carga pueden
+reemplazarlo con set_client() (por ejemplo un mongomock con datos sintéticos)
+antes de importar callback_final.
+
+Con SNAPSHOT_DIR definido se sirven los datos desde un snapshot exportado con
+`python -m snapshot`, sin conectarse a Mongo (ver snapshot.py). Los lectores leen los
+find con find_frame(), que en ese modo arma el DataFrame directo desde el archivo Arrow.
+
+MongoClient no se puede compartir entre procesos: con PRELOAD cada worker llama a
+reset_client() después del fork y crea el suyo (ver preload.py).
+"""
+import os
+import threading
+import pandas as pd
+import pymongo
+from dotenv import load_dotenv
+from instrumentation import MongoCommandTimer
+from metrics import MongoMetrics
+from querylog import QueryLogger
+
+load_dotenv()
+MONGO_URI = os.getenv('MONGO_URI')
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR')
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Devuelve el cliente de MongoDB, creándolo en el primer uso. MongoClient es seguro
+    entre hilos (tiene su propio pool de conexiones), así que todos los hilos del
+    proceso comparten uno; el lock evita crear dos si el primer uso es concurrente.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None and SNAPSHOT_DIR:
+                from snapshot import SnapshotClient
+                _client = SnapshotClient(SNAPSHOT_DIR)
+            elif _client is None:
+                _client = pymongo.MongoClient(MONGO_URI, event_listeners=[MongoCommandTimer(), MongoMetrics(),
+                                                                          QueryLogger()])
+    return _client
+
+
+def reset_client():
+    """
+    Descarta el MongoClient heredado del proceso padre (después de un fork) para que el
+    próximo get_client() cree uno propio. No se cierra: sus conexiones son del padre.
+    Los demás clientes (snapshot, mongomock) se conservan.
+    """
+    global _client, _client_lock
+    _client_lock = threading.Lock()
+    if isinstance(_client, pymongo.MongoClient):
+        _client = None
+
+
+def close_client():
+    """Cierra el MongoClient del proceso (el master con PRELOAD, antes de crear los workers)"""
+    if isinstance(_client, pymongo.MongoClient):
+        _client.close()
+
+
+def set_client(client):
+    """Reemplaza el cliente que usará la app (debe llamarse antes de importar callback_final)"""
+    global _client
+    _client = client
+
+
+def find_frame(collection, query, projection):
+    """
+    Resultado de un find como DataFrame. Las colecciones del modo snapshot lo arman
+    directo desde la tabla Arrow (SnapshotCollection.find_frame); las de pymongo y
+    mongomock, a partir de la lista de documentos.
+    """
+    # Se mira la clase: en pymongo y mongomock cualquier atributo de una colección es
+    # una subcolección (collection.find_frame existe aunque no sea un método)
+    if hasattr(type(collection), 'find_frame'):
+        return collection.find_frame(query, projection)
+    return pd.DataFrame(list(collection.find(query, projection)))
@@ -2,6 +2,8 @@ import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, time
 import pytz
+from db import find_frame
+from instrumentation import instrument_functions
 
 def get_image_data(collection, start_date, end_date):
     """
@@ -15,8 +17,7 @@ def get_image_data(collection, start_date, end_date):
     """
     query_img = {"localdate": {"$gte": start_date, "$lte": end_date }, "type": "image"}
     projection_img = {"_id":0, "localdate":1, "user_id":1, "source":1, "extras":1, "result":1, "error":1}
-    documentos_img = list(collection.find(query_img, projection_img))
-    image_data_df = pd.DataFrame(documentos_img)
+    image_data_df = find_frame(collection, query_img, projection_img)
     return image_data_df
 
 def get_documents_data(collection, start_date, end_date):
@@ -25,8 +26,7 @@ def get_documents_data(collection, start_date, end_date):
     # Búsqueda y extracción de la data DOCUMENTS
     query_doc = {"localdate": {"$gte": start_date, "$lte": end_date }, "type": "document", "event_type": 'document_transcription'}
     projection_doc = {"_id":0, "localdate":1, "user_id":1, "source":1, "extras":1, "result":1, "error":1}
-    documentos_doc = list(collection.find(query_doc, projection_doc))
-    pdf_data_df = pd.DataFrame(documentos_doc)
+    pdf_data_df = find_frame(collection, query_doc, projection_doc)
     return pdf_data_df
 
 def get_video_data(collection, start_date, end_date):
@@ -41,8 +41,7 @@ def get_video_data(collection, start_date, end_date):
     """
     query_video = {"localdate": {"$gte": start_date, "$lte": end_date }, "type": "video"}
     projection_video = {"_id":0, "localdate":1, "user_id":1, "source":1, "extras":1, "result":1, "error":1}
-    documentos_video = list(collection.find(query_video, projection_video))
-    video_data_df = pd.DataFrame(documentos_video)
+    video_data_df = find_frame(collection, query_video, projection_video)
     return video_data_df
 
 def get_features_df (image_data_df, pdf_data_df, video_data_df, youtube_data_df, rme_data, list_data):
@@ -73,8 +72,7 @@ def get_youtube_data(collection, start_date, end_date):
     """
     query_youtube = {"localdate": {"$gte": start_date, "$lte": end_date }, "result.type": "youtube_transcription"}
     projection_youtube = {"_id":0, "localdate":1, "user_id":1, "source":1, "extras":1, "result":1, "error":1}
-    documentos_youtube = list(collection.find(query_youtube, projection_youtube))
-    youtube_data_df = pd.DataFrame(documentos_youtube)
+    youtube_data_df = find_frame(collection, query_youtube, projection_youtube)
     return youtube_data_df
 
 
@@ -282,3 +280,8 @@ def get_reminders_data(collection, start_date_str, end_date_str):
     # Asegurar que las columnas estén en el orden correcto
     df = df[["localdate", "dau_reminds"]]
     return df
+
+
+# Medir lectores y construcción de la figura (ver instrumentation.py)
+instrument_functions(__name__, 'data', prefix='get_')
+instrument_functions(__name__, 'plotly', names=['plot_dau_lines'])
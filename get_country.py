@@ -1,3 +1,9 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
 import phonenumbers
 from phonenumbers import geocoder
 import pycountry  
@@ -24,4 +30,98 @@ def getCountry(phone):
             country_name = country_name.split(',')[0]
         return country_name  # Retorna el nombre del país
     except Exception as e:
-        return "Invalid_number"  # Retorna "Invalid_number" si ocurre algún error
\ No newline at end of file
+        return "Invalid_number"  # Retorna "Invalid_number" si ocurre algún error
+
+
+# Códigos de llamada que corresponden a una sola región: para ellos la región no
+# depende del resto del número y no hace falta parsearlo (p. ej. 54 -> AR).
+# Los compartidos (1, 7, 44, ...) requieren el parseo completo de phonenumbers.
+SINGLE_REGION_CODES = {str(code): regions[0] for code, regions in phonenumbers.COUNTRY_CODE_TO_REGION_CODE.items()
+                       if len(regions) == 1}
+MULTI_REGION_CODES = {str(code) for code, regions in phonenumbers.COUNTRY_CODE_TO_REGION_CODE.items()
+                      if len(regions) > 1}
+
+# Números E.164 "limpios" (se aceptan espacios y guiones). El rango de dígitos deja
+# los casos borde de longitud (muy cortos o muy largos) al parseo completo.
+_E164 = re.compile(r'\+(\d{7,17})')
+_SEPARATORS = str.maketrans('', '', ' -')
+
+# Con processes, el parseo completo se reparte en procesos si hay al menos esta cantidad de números
+POOL_MIN_NUMBERS = 5000
+
+
+@lru_cache(maxsize=None)
+def regionToCountry(region):
+    """Nombre del país para un código de región, con el mismo criterio que getCountry"""
+    try:
+        country_name = pycountry.countries.get(alpha_2=region).name
+        if ',' in country_name:
+            country_name = country_name.split(',')[0]
+        return country_name
+    except Exception:
+        return "Invalid_number"
+
+
+def _fast_region(phone):
+    """
+    Región de un número sin parsearlo, o None si necesita el parseo completo
+    (formato no E.164, código compartido por varias regiones o longitud borde).
+    """
+    if not isinstance(phone, str):
+        return None
+    match = _E164.fullmatch(phone.translate(_SEPARATORS))
+    if match is None:
+        return None
+    digits = match.group(1)
+    # Igual que phonenumbers: el código es el primer prefijo de 1 a 3 dígitos que existe
+    for length in (1, 2, 3):
+        code = digits[:length]
+        if code in MULTI_REGION_CODES:
+            return None
+        if code in SINGLE_REGION_CODES:
+            national_length = len(digits) - length
+            return SINGLE_REGION_CODES[code] if 6 <= national_length <= 14 else None
+    return None
+
+
+def getCountries(phones, processes=None):
+    """
+    Versión masiva de getCountry: resuelve el país de una serie de números de teléfono.
+
+    Los números repetidos se resuelven una sola vez. Los que tienen un código de
+    llamada de una sola región se resuelven con una tabla de prefijos; el resto
+    (códigos compartidos como +1, formatos no E.164, inválidos) pasa por getCountry.
+
+    Parámetros:
+    phones (pd.Series | array | list): Números de teléfono en formato E.164.
+    processes (int): Si se indica, el parseo completo se reparte en ese número de
+                     procesos (útil en corridas en frío con muchos números distintos).
+
+    Retorna:
+    pd.Series: Nombre del país de cada número (mismo índice si phones es una Serie);
+               "Invalid_number" para los números que getCountry no puede resolver.
+    """
+    series = phones if isinstance(phones, pd.Series) else pd.Series(phones, dtype=object)
+    codes, uniques = pd.factorize(series)
+    uniques = list(uniques)
+
+    names = np.empty(len(uniques) + 1, dtype=object)
+    # Los valores nulos (código -1) toman el último elemento, igual que getCountry
+    names[-1] = "Invalid_number"
+    pending = []
+    for i, phone in enumerate(uniques):
+        region = _fast_region(phone)
+        if region is None:
+            pending.append(i)
+        else:
+            names[i] = regionToCountry(region)
+
+    numbers = [uniques[i] for i in pending]
+    if processes and len(numbers) >= POOL_MIN_NUMBERS:
+        with ProcessPoolExecutor(processes) as pool:
+            resolved = list(pool.map(getCountry, numbers, chunksize=max(len(numbers) // (processes * 4), 1)))
+    else:
+        resolved = [getCountry(phone) for phone in numbers]
+    names[pending] = resolved
+
+    return pd.Series(names[codes], index=series.index, name=series.name)
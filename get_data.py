@@ -1,5 +1,8 @@
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
+from db import find_frame
+from instrumentation import instrument_functions
 
 from datetime import datetime, timedelta
 import pandas as pd
@@ -49,27 +52,21 @@ def get_daily_data(collection_dau, collection_new_users, start_date, end_date):
         }
 
         # Extraer documentos
-        documentos = list(collection_dau.find(query, projection))
-        print(f"Documentos extraídos de collection_dau: {len(documentos)}")  # Depuración
+        df = find_frame(collection_dau, query, projection)
+        print(f"Documentos extraídos de collection_dau: {len(df)}")  # Depuración
 
         proj = {"_id": 0, "date": 1, "country": 1, "new_users": 1}
-        docs = list(collection_new_users.find(query, proj))
-        print(f"Documentos extraídos de collection_new_users: {len(docs)}")  # Depuración
+        df2 = find_frame(collection_new_users, query, proj)
+        print(f"Documentos extraídos de collection_new_users: {len(df2)}")  # Depuración
 
         # Verificar si se encontraron documentos
-        if not documentos:
+        if df.empty:
             print(f"No se encontraron documentos en la colección '{collection_dau.name}' entre {start_date} y {end_date}.")
             return pd.DataFrame(columns=['date', 'country', 'count', 'new_users', 'subscribed', 'interactions', 'audio', 'text'])
 
-        # Convertir a DataFrame
-        df = pd.DataFrame(documentos)
-        df2 = pd.DataFrame(docs)
-        
         # Depuración: Verificar contenido de los DataFrames
         print("Columnas en df:", df.columns.tolist())
         print("Columnas en df2:", df2.columns.tolist())
-        print("Primeros registros de df:", df.head().to_dict())
-        print("Primeros registros de df2:", df2.head().to_dict())
 
         # Cambiar nombre
         df = df.rename(columns={'dau': 'count'})
@@ -103,7 +100,7 @@ def get_daily_data(collection_dau, collection_new_users, start_date, end_date):
         print(f"Error al extraer datos: {e}")
         return pd.DataFrame(columns=['date', 'country', 'count', 'new_users', 'subscribed', 'interactions', 'audio', 'text'])
 
-def get_monthly_data(collection, collection_new_users, start_date, end_date):
+def get_monthly_data(collection, collection_new_users, start_date, end_date, daily_data=None):
     """
     Extrae documentos de TranscribeMe-charts.dau-by-country en un rango de fechas y los convierte en un DataFrame.
     
@@ -112,6 +109,9 @@ def get_monthly_data(collection, collection_new_users, start_date, end_date):
         collection_new_users (Collection): Objeto de colección de pymongo para nuevos usuarios.
         start_date (str): Fecha inicial en formato 'yyyy-mm-dd'.
         end_date (str): Fecha final en formato 'yyyy-mm-dd'.
+        daily_data (pd.DataFrame): Resultado de get_daily_data para el mismo rango (opcional).
+            Si se pasa, los nuevos usuarios por mes se suman desde ahí y no se consulta
+            collection_new_users.
     
     Returns:
         pd.DataFrame: DataFrame con las columnas date, country, count, new_users, subscribed, interactions, audio, text.
@@ -148,29 +148,21 @@ def get_monthly_data(collection, collection_new_users, start_date, end_date):
         }
 
         # Extraer documentos
-        documentos = list(collection.find(query, projection))
-        print(f"Documentos extraídos de collection: {len(documentos)}")  # Depuración
-        if documentos:
-            print("Ejemplo de documento:", documentos[0])  # Mostrar un documento
+        df = find_frame(collection, query, projection)
+        print(f"Documentos extraídos de collection: {len(df)}")  # Depuración
 
-        proj = {"_id": 0, "date": 1, "country": 1, "new_users": 1}
-        docs = list(collection_new_users.find({'date': {'$gte': start_date, '$lte': end_date}}, proj))
-        print(f"Documentos extraídos de collection_new_users: {len(docs)}")  # Depuración
-        if docs:
-            print("Ejemplo de documento new_users:", docs[0])  # Mostrar un documento
+        if daily_data is None:
+            proj = {"_id": 0, "date": 1, "country": 1, "new_users": 1}
+            df2 = find_frame(collection_new_users, {'date': {'$gte': start_date, '$lte': end_date}}, proj)
+            print(f"Documentos extraídos de collection_new_users: {len(df2)}")  # Depuración
 
         # Verificar si se encontraron documentos
-        if not documentos:
+        if df.empty:
             print(f"No se encontraron documentos en la colección '{collection.name}' entre {start_date} y {end_date}.")
             return pd.DataFrame(columns=['date', 'country', 'count', 'new_users', 'subscribed', 'interactions', 'audio', 'text'])
 
-        # Convertir a DataFrame
-        df = pd.DataFrame(documentos)
-        df2 = pd.DataFrame(docs)
-
         # Depuración: Verificar columnas
         print("Columnas en df:", df.columns.tolist())
-        print("Columnas en df2:", df2.columns.tolist())
 
         # Verificar si 'month' existe en df
         if 'month' not in df.columns:
@@ -183,17 +175,23 @@ def get_monthly_data(collection, collection_new_users, start_date, end_date):
         # Convertir 'date' en df a formato 'yyyy-mm' para compatibilidad
         df['month'] = pd.to_datetime(df['date']).dt.to_period('M').astype(str)
 
-        # Crear una columna 'month' en df2 para el año-mes
-        if not df2.empty and 'date' in df2.columns:
-            df2['month'] = pd.to_datetime(df2['date'], errors='coerce').dt.to_period('M').astype(str)
+        if daily_data is not None:
+            # Nuevos usuarios por mes y país a partir del dataset diario ya extraído
+            new_users_df = monthly_new_users(daily_data)
         else:
-            print("Advertencia: df2 está vacío o no contiene la columna 'date'")
-            df2['month'] = None
+            print("Columnas en df2:", df2.columns.tolist())
+
+            # Crear una columna 'month' en df2 para el año-mes
+            if not df2.empty and 'date' in df2.columns:
+                df2['month'] = pd.to_datetime(df2['date'], errors='coerce').dt.to_period('M').astype(str)
+            else:
+                print("Advertencia: df2 está vacío o no contiene la columna 'date'")
+                df2['month'] = None
 
-        # Agrupar por month y country para calcular new_users
-        new_users_df = df2.groupby(['month', 'country']).agg(
-            new_users=('new_users', 'sum')
-        ).reset_index()
+            # Agrupar por month y country para calcular new_users
+            new_users_df = df2.groupby(['month', 'country']).agg(
+                new_users=('new_users', 'sum')
+            ).reset_index()
 
         # Unir los DataFrames por 'month' y 'country'
         df = df.merge(new_users_df[['month', 'country', 'new_users']], 
@@ -215,6 +213,34 @@ def get_monthly_data(collection, collection_new_users, start_date, end_date):
         print(f"Error al extraer datos: {e}")
         return pd.DataFrame(columns=['date', 'country', 'count', 'new_users', 'subscribed', 'interactions', 'audio', 'text'])
 
+# Métricas del DataFrame diario que se suman en la vista semanal; count (DAU) y
+# subscribed se promedian sobre los días de la semana con datos
+WEEKLY_SUM_METRICS = ['new_users', 'interactions', 'audio', 'text']
+WEEKLY_MEAN_METRICS = ['count', 'subscribed']
+
+def get_weekly_data(daily_data):
+    """
+    Agrega el DataFrame de get_daily_data por semana (de lunes a domingo) y país,
+    sin consultar Mongo.
+
+    Args:
+        daily_data (pd.DataFrame): Datos diarios con columnas date, country y las métricas.
+
+    Returns:
+        pd.DataFrame: Mismas columnas, con date = lunes de cada semana ('yyyy-mm-dd').
+    """
+    if daily_data.empty:
+        return daily_data.copy()
+
+    keys = [week_starts(daily_data['date']), daily_data['country'].to_numpy()]
+    sums = daily_data[WEEKLY_SUM_METRICS].groupby(keys).sum()
+    means = daily_data[WEEKLY_MEAN_METRICS].groupby(keys).mean().round(1)
+
+    weekly = pd.concat([means, sums], axis=1)
+    weekly.index.names = ['date', 'country']
+    weekly = weekly.reset_index()[daily_data.columns]
+    return weekly.sort_values('date', kind='stable', ignore_index=True)
+
 def add_total_per_date (df):
     # Calcular totales por fecha
     total_por_fecha = df.groupby('date', as_index=False)[['count', 'new_users', 'interactions', 'audio', 'text', 'subscribed']].sum()
@@ -227,6 +253,74 @@ def add_total_per_date (df):
     df = pd.concat([df, total_por_fecha], ignore_index=True)
     return df
 
+def get_country_rankings(data, metrics=('count', 'new_users', 'interactions'), top_n=15):
+    """
+    Calcula en una sola pasada el ranking de países por cada métrica.
+
+    Args:
+        data (pd.DataFrame): Datos con columnas country y las métricas.
+        metrics (tuple): Métricas a rankear.
+        top_n (int): Cantidad de países por ranking.
+
+    Returns:
+        dict: {'countries': países en orden de aparición, métrica: top_n países de mayor a menor}
+    """
+    if data.empty:
+        return {'countries': [], **{metric: [] for metric in metrics}}
+
+    totals = data.groupby('country')[list(metrics)].sum()
+    rankings = {metric: totals[metric].nlargest(top_n).index.tolist() for metric in metrics}
+    rankings['countries'] = data['country'].unique().tolist()
+    return rankings
+
+def get_country_share_data(data, view):
+    """
+    Precalcula el share (%) de cada país por fecha para las tres categorías y los dos
+    modos de normalización, en formato columnar compacto para el callback clientside.
+
+    Los porcentajes se calculan contra el total de todos los países de cada fecha, por lo
+    que no dependen de la selección: 'Others' es la suma de los países no seleccionados.
+
+    Args:
+        data (pd.DataFrame): Datos con columnas date, country, count, subscribed.
+        view (str): Vista seleccionada (se usa en el título del gráfico).
+
+    Returns:
+        dict: {'view', 'dates', 'countries', 'shares': {serie: [[pct por fecha] por país]}}
+              Las series son count, subscribed_cat, free_cat, subscribed_total y free_total.
+              Las fechas sin dato para un país quedan en None.
+    """
+    if data.empty:
+        return {'view': view, 'dates': [], 'countries': [], 'shares': {}}
+
+    grouped = data.groupby(['date', 'country'])[['count', 'subscribed']].sum()
+    grouped['free_users'] = grouped['count'] - grouped['subscribed']
+    totals = grouped.groupby(level='date').transform('sum')
+
+    shares = pd.DataFrame({
+        'count': grouped['count'] / totals['count'] * 100,
+        'subscribed_cat': grouped['subscribed'] / totals['subscribed'] * 100,
+        'free_cat': grouped['free_users'] / totals['free_users'] * 100,
+        'subscribed_total': grouped['subscribed'] / totals['count'] * 100,
+        'free_total': grouped['free_users'] / totals['count'] * 100,
+    }).replace([np.inf, -np.inf], np.nan).round(4)
+
+    # Matriz fecha x país por serie
+    wide = shares.unstack('country')
+    countries = sorted(wide.columns.get_level_values('country').unique())
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([shares.columns, countries]))
+
+    def to_rows(frame):
+        values = frame.T.astype(object).where(frame.T.notna(), None)
+        return values.values.tolist()
+
+    return {
+        'view': view,
+        'dates': [str(d) for d in wide.index],
+        'countries': countries,
+        'shares': {serie: to_rows(wide[serie]) for serie in shares.columns}
+    }
+
 
 # Para formatear los datos históricos
 def format_number_smart(number):
@@ -280,11 +374,30 @@ def get_total_free_users(collection):
     
     return df
 
+# Heavy users de free-cycles-by-country: cycles_consumed >= max_cycles. La marca
+# HEAVY_FIELD y el índice parcial HEAVY_INDEX los mantiene `python -m heavy_users`
+# (cron); la app solo los lee.
+HEAVY_FIELD = 'is_heavy'
+HEAVY_INDEX = 'heavy_users'
+HEAVY_CONDITION = {'$gte': ['$cycles_consumed', '$max_cycles']}
+
+def has_heavy_index(collection):
+    """True si la colección tiene el índice parcial de heavy users (la marca está mantenida)"""
+    return HEAVY_INDEX in collection.index_information()
+
 def get_heavy_free_users(collection):
+    # 1. Filtrar usuarios donde cycles_consumed >= max_cycles. Con la marca is_heavy
+    # mantenida (ver heavy_users.py) se leen solo las entradas del índice parcial; si
+    # no, la condición se evalúa documento por documento recorriendo la colección.
+    if has_heavy_index(collection):
+        heavy_filter = [{"$match": {HEAVY_FIELD: True}},
+                        {"$project": {"_id": 0, "country": 1, "user_id": 1}}]
+    else:
+        heavy_filter = [{"$match": {"$expr": HEAVY_CONDITION}}]
+
     # Pipeline de agregación
     pipeline = [
-        # 1. Filtrar usuarios donde cycles_consumed >= max_cycles
-        {"$match": {"$expr": {"$gte": ["$cycles_consumed", "$max_cycles"]}}},
+        *heavy_filter,
         # 2. Agrupar por país y contar usuarios únicos
         {
             "$group": {
@@ -444,61 +557,105 @@ def calculate_total_metrics(collection_dau_by_country, collection_mau_by_country
         'total_text': format_number_smart(total_text)
     }
 
+def month_keys(dates):
+    """
+    Clave entera de mes (año * 12 + mes - 1) para una serie de fechas.
+    Solo se parsean las fechas únicas; el resto es indexado con NumPy.
+    """
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.to_datetime(uniques)
+    keys = np.asarray(parsed.year * 12 + parsed.month - 1, dtype=np.int32)
+    return keys[codes]
+
+def week_starts(dates):
+    """
+    Lunes de la semana ('yyyy-mm-dd') de cada fecha de la serie.
+    Solo se parsean las fechas únicas; el resto es indexado con NumPy.
+    """
+    codes, uniques = pd.factorize(dates)
+    parsed = pd.to_datetime(uniques)
+    mondays = (parsed - pd.to_timedelta(parsed.dayofweek, unit='D')).strftime('%Y-%m-%d')
+    return np.asarray(mondays, dtype=object)[codes]
+
+def month_key_labels(keys):
+    """Convierte claves enteras de mes al formato 'yyyy-mm'"""
+    codes, uniques = pd.factorize(keys)
+    labels = np.array([f"{k // 12:04d}-{k % 12 + 1:02d}" for k in uniques], dtype=object)
+    return labels[codes]
+
+def monthly_new_users(daily_data):
+    """
+    Suma los nuevos usuarios del DataFrame diario por mes ('yyyy-mm') y país.
+
+    Returns:
+        pd.DataFrame: Columnas month, country, new_users.
+    """
+    if daily_data.empty:
+        return pd.DataFrame(columns=['month', 'country', 'new_users'])
+    country_codes, countries = pd.factorize(daily_data['country'])
+    months = month_keys(daily_data['date'])
+    first_month = months.min()
+    # Clave única (mes, país) -> suma con bincount
+    n_countries = len(countries)
+    keys = (months - first_month).astype(np.int64) * n_countries + country_codes
+    totals = np.bincount(keys, weights=daily_data['new_users'].to_numpy(dtype=np.float64))
+    present = np.flatnonzero(np.bincount(keys))
+    return pd.DataFrame({
+        'month': month_key_labels(present // n_countries + first_month),
+        'country': np.asarray(countries, dtype=object)[present % n_countries],
+        'new_users': totals[present].astype(np.int64),
+    })
+
 def get_dau_mau_ratio_data(dau_data, mau_data, countries=None):
     """
-    Obtiene datos combinados de DAU y MAU para calcular el ratio DAU/MAU
+    Calcula el ratio DAU/MAU mensual por país (DAU promedio del mes / MAU del mes)
     
     Args:
-        collection_dau: Colección de datos diarios
-        collection_mau: Colección de datos mensuales  
-        start_date: Fecha inicio (YYYY-MM-DD)
-        end_date: Fecha fin (YYYY-MM-DD)
-        countries: Lista de países a filtrar (opcional)
+        dau_data: DataFrame diario con columnas date, country, count
+        mau_data: DataFrame mensual con columnas date, country, count
+        countries: Lista de países a filtrar (opcional). Sin filtro se calcula para
+                   todos los países presentes (incluida la fila 'Total' si existe).
     
     Returns:
-        DataFrame con columnas: year_month, country, avg_dau, mau, dau_mau_ratio
+        DataFrame con columnas month_key, year_month, country, avg_dau, mau, dau_mau_ratio
     """
-    dau_data = dau_data.copy()
-    mau_data = mau_data.copy()
-
-    # 3. Filtrar por países si se especifica
+    # 1. Filtrar por países si se especifica
     if countries:
         dau_data = dau_data[dau_data['country'].isin(countries)]
         mau_data = mau_data[mau_data['country'].isin(countries)]
-    
-    # 4. Crear year_month para DAU (agregar por mes)
-    dau_data['date'] = pd.to_datetime(dau_data['date'])
-    dau_data['year_month'] = dau_data['date'].dt.to_period('M').astype(str)
-    
-    # 5. Calcular DAU promedio por mes y país
-    avg_dau_monthly = dau_data.groupby(['year_month', 'country'])['count'].mean().reset_index()
-    avg_dau_monthly.rename(columns={'count': 'avg_dau'}, inplace=True)
-    
-    # 6. Preparar MAU data
-    mau_data['date'] = pd.to_datetime(mau_data['date'])
-    mau_data['year_month'] = mau_data['date'].dt.to_period('M').astype(str)
-    mau_monthly = mau_data.groupby(['year_month', 'country'])['count'].sum().reset_index()
-    mau_monthly.rename(columns={'count': 'mau'}, inplace=True)
-    
-    # 7. Combinar DAU y MAU
-    ratio_data = pd.merge(avg_dau_monthly, mau_monthly, on=['year_month', 'country'], how='inner')
-    
-    # 8. Calcular ratio DAU/MAU
+
+    # 2. DAU promedio y MAU por mes (clave entera) y país
+    avg_dau_monthly = (dau_data['count']
+                       .groupby([month_keys(dau_data['date']), dau_data['country'].to_numpy()])
+                       .mean().rename('avg_dau'))
+    mau_monthly = (mau_data['count']
+                   .groupby([month_keys(mau_data['date']), mau_data['country'].to_numpy()])
+                   .sum().rename('mau'))
+
+    # 3. Combinar DAU y MAU
+    ratio_data = pd.concat([avg_dau_monthly, mau_monthly], axis=1, join='inner')
+    ratio_data.index.names = ['month_key', 'country']
+    ratio_data = ratio_data.reset_index()
+
+    # 4. Calcular ratio DAU/MAU
     ratio_data['dau_mau_ratio'] = ratio_data['avg_dau'] / ratio_data['mau']
-    
-    # 9. Ordenar por fecha
-    ratio_data = ratio_data.sort_values('year_month')
+
+    # 5. Ordenar por fecha
+    ratio_data = ratio_data.sort_values('month_key', kind='stable', ignore_index=True)
+    ratio_data.insert(1, 'year_month', month_key_labels(ratio_data['month_key'].to_numpy()))
     
     return ratio_data
 
 def get_errors_by_date (collection, view):
-    results = list(collection.find({}, {'_id': 0}))
-    df = pd.DataFrame(results)
+    df = find_frame(collection, {}, {'_id': 0})
 
     if view == 'Monthly':
         df['localdate'] = pd.to_datetime(df['localdate']).dt.strftime("%Y-%m")
         # Agrupar por mes y sumar las columnas numéricas
         df = df.groupby('localdate').sum().reset_index()
+    elif view == 'Weekly':
+        df['localdate'] = week_starts(df['localdate'])
+        df = df.groupby('localdate').sum().reset_index()
 
     df = df.sort_values('localdate')
     return df
@@ -506,7 +663,10 @@ def get_errors_by_date (collection, view):
 def get_invalid_format_types (collection, start, end):
     # Definir el filtro de fechas
     query = {'localdate': {'$gte': start,'$lte': end}}
-    results = list(collection.find(query, {'_id': 0, 'localdate': 0}))
-    df = pd.DataFrame(results)
+    df = find_frame(collection, query, {'_id': 0, 'localdate': 0})
     new_df = pd.DataFrame({'type': df.columns,'count': df.sum()}).reset_index(drop=True)
     return new_df
+
+
+# Medir el tiempo de cada lector dentro del callback en curso (ver instrumentation.py)
+instrument_functions(__name__, 'data')
@@ -0,0 +1,42 @@
+"""
+Configuración de gunicorn (ver Procfile).
+
+Workers gthread: cada worker atiende GUNICORN_THREADS requests a la vez en hilos, así
+una consulta lenta (por ejemplo la de features) no bloquea el worker entero mientras
+espera a Mongo. Los hilos comparten los caches de callback_final.py (seguros entre
+hilos, ver singleflight.py) y el MongoClient del proceso. La cantidad de workers la
+toma gunicorn de WEB_CONCURRENCY.
+
+Con PRELOAD=1 el master importa la app y precalienta antes de crear los workers, que
+comparten esos datos copy-on-write (ver preload.py). gunicorn --preload equivale a
+PRELOAD=1: la app lee el modo de warmup.PRELOAD al importarse, así que se pasa a la
+variable antes de que gunicorn la importe. Si igual no coinciden (preload_app activado
+de otra forma), el master no arranca: con la app precargada sin PRELOAD el master
+iniciaría los hilos de warmup y el refresco, y los workers heredarían su cliente de
+Mongo y los locks que esos hilos tuvieran tomados.
+"""
+import os
+import sys
+
+if '--preload' in sys.argv[1:] + os.getenv('GUNICORN_CMD_ARGS', '').split():
+    os.environ['PRELOAD'] = '1'
+
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = os.getenv('PRELOAD', '0') == '1'
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        import preload
+        import warmup
+        if not warmup.PRELOAD:
+            raise RuntimeError("preload_app está activo pero la app se importó sin PRELOAD=1; "
+                               "iniciar gunicorn con PRELOAD=1")
+        preload.before_fork()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        import preload
+        preload.after_fork()
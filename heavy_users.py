@@ -0,0 +1,59 @@
+"""
+Marca de heavy users en TranscribeMe-charts.free-cycles-by-country.
+
+Un free user es heavy cuando cycles_consumed >= max_cycles. Esa condición compara dos
+campos del mismo documento ($expr) y ningún índice la puede resolver, así que
+get_heavy_free_users recorría la colección completa. Este script mantiene el campo
+booleano is_heavy y un índice parcial (solo con los heavy users) sobre
+(is_heavy, country, user_id), que el lector usa cuando existe (el campo, el índice y
+la condición están en get_data.py).
+
+La app no escribe en la colección: el script se programa como cron después de cada
+carga de free-cycles-by-country (p. ej. una vez por día, antes de la ventana del
+refresco programado WARM_WINDOW). Solo modifica los documentos cuya marca no coincide
+con sus ciclos, así que las corridas son incrementales. Mientras no corre, los heavy
+users que cargó la última actualización de la colección no aparecen; borrar el índice
+vuelve a la consulta que recorre la colección.
+
+    python -m heavy_users
+    python -m heavy_users --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import time
+
+from get_data import HEAVY_CONDITION, HEAVY_FIELD, HEAVY_INDEX
+
+
+def update_heavy_flag(collection):
+    """
+    Recalcula is_heavy en los documentos donde falta o quedó desactualizada y crea el
+    índice parcial si no existe.
+
+    Returns:
+        int: Documentos actualizados.
+    """
+    stale = {'$expr': {'$ne': [{'$ifNull': [f'${HEAVY_FIELD}', None]}, HEAVY_CONDITION]}}
+    result = collection.update_many(stale, [{'$set': {HEAVY_FIELD: HEAVY_CONDITION}}])
+    collection.create_index([(HEAVY_FIELD, 1), ('country', 1), ('user_id', 1)], name=HEAVY_INDEX,
+                            partialFilterExpression={HEAVY_FIELD: True})
+    return result.modified_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', help='Base a actualizar (por defecto MONGO_URI)')
+    args = parser.parse_args()
+
+    import pymongo
+    from db import MONGO_URI
+    collection = pymongo.MongoClient(args.mongo_uri or MONGO_URI)['TranscribeMe-charts']['free-cycles-by-country']
+
+    t0 = time.perf_counter()
+    updated = update_heavy_flag(collection)
+    heavy = collection.count_documents({HEAVY_FIELD: True})
+    print(f"Marca {HEAVY_FIELD} actualizada en {updated} documentos ({heavy} heavy users) "
+          f"en {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
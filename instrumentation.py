@@ -0,0 +1,216 @@
+"""
+Instrumentación de los callbacks: tiempos por etapa y profiling bajo demanda.
+
+Cada callback registrado se envuelve con instrument_callbacks(app) y mide:
+  - wall y CPU (del hilo que atiende el request)
+  - mongo: tiempo de los comandos de MongoDB (CommandListener del cliente de db.py)
+  - pandas: tiempo en las funciones de get_data.py / features.py menos el de Mongo
+  - plotly: tiempo en los constructores de charts.py (y features.plot_dau_lines)
+  - otros: el resto (lógica del callback y serialización JSON de la respuesta)
+
+Los módulos se instrumentan al final de cada archivo con instrument_functions().
+Los callbacks más lentos que TIMING_LOG_THRESHOLD_MS se imprimen con su desglose.
+
+Profiling de un request: enviar el header `X-Profile: cprofile` (o `pyinstrument`,
+si está instalado) o listar callbacks en PROFILE_CALLBACKS (nombres separados por
+coma). El perfil se guarda en PROFILE_DIR (.prof para cProfile, .html para pyinstrument).
+
+Los callbacks en segundo plano corren en otro proceso: solo se mide el lanzamiento
+y las consultas del resultado.
+"""
+import contextvars
+import cProfile
+import functools
+import inspect
+import os
+import sys
+import time
+from datetime import datetime
+
+from flask import has_request_context, request
+from pymongo import monitoring
+
+TIMING_LOG_THRESHOLD_MS = float(os.getenv('TIMING_LOG_THRESHOLD_MS', 500))
+PROFILE_DIR = os.getenv('PROFILE_DIR', './profiles')
+PROFILE_CALLBACKS = {name.strip() for name in os.getenv('PROFILE_CALLBACKS', '').split(',') if name.strip()}
+
+# Tiempos del callback en curso (por hilo / contexto)
+_current = contextvars.ContextVar('callback_timings', default=None)
+
+# Funciones que reciben los CallbackTimings de cada ejecución (ver metrics.py)
+_observers = []
+
+
+class CallbackTimings:
+    """Tiempos acumulados de una ejecución de callback"""
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.stages = {'mongo': 0.0, 'data': 0.0, 'plotly': 0.0}
+        # Tiempo de Mongo ocurrido dentro de funciones de datos (se descuenta de pandas)
+        self.mongo_in_data = 0.0
+        self.functions = {}
+        # Etapas en curso: {etapa: función más externa que se está midiendo}
+        self.active = {}
+        # Comandos de MongoDB emitidos (sin contar getMore)
+        self.mongo_commands = 0
+        # Tamaño de la respuesta JSON enviada al navegador (None si no hubo respuesta)
+        self.response_bytes = None
+
+    def add(self, stage, seconds, function=None):
+        self.stages[stage] += seconds
+        if stage == 'mongo' and 'data' in self.active:
+            self.mongo_in_data += seconds
+        if function:
+            calls, total = self.functions.get(function, (0, 0.0))
+            self.functions[function] = (calls + 1, total + seconds)
+
+    def summary(self):
+        """Desglose en milisegundos: wall, cpu, mongo, pandas, plotly, otros"""
+        mongo, data, plotly = self.stages['mongo'], self.stages['data'], self.stages['plotly']
+        other = self.wall - data - plotly - (mongo - self.mongo_in_data)
+        ms = lambda seconds: round(max(seconds, 0) * 1000, 1)
+        return {'wall_ms': ms(self.wall), 'cpu_ms': ms(self.cpu), 'mongo_ms': ms(mongo),
+                'pandas_ms': ms(data - self.mongo_in_data), 'plotly_ms': ms(plotly), 'other_ms': ms(other)}
+
+
+def add_observer(func):
+    """Registra una función que recibe los tiempos de cada callback al terminar"""
+    _observers.append(func)
+
+
+def current_timings():
+    """Tiempos del callback en curso, o None fuera de un callback"""
+    return _current.get()
+
+
+def timed(stage):
+    """Decorador: acumula el tiempo de la función en la etapa del callback en curso"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _current.get()
+            # Fuera de un callback, o llamada anidada de la misma etapa: no se mide de nuevo
+            if timings is None or stage in timings.active:
+                return func(*args, **kwargs)
+            timings.active[stage] = func.__name__
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.active.pop(stage, None)
+                timings.add(stage, time.perf_counter() - t0, func.__name__)
+        return wrapper
+    return decorator
+
+
+def instrument_functions(module_name, stage, prefix='', names=None):
+    """
+    Reemplaza las funciones públicas de un módulo por versiones medidas con timed(stage).
+    Debe llamarse al final del módulo, antes de que otros las importen.
+    """
+    module = sys.modules[module_name]
+    for name, obj in list(vars(module).items()):
+        if (inspect.isfunction(obj) and obj.__module__ == module_name and not name.startswith('_')
+                and name.startswith(prefix) and (names is None or name in names)):
+            setattr(module, name, timed(stage)(obj))
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Cuenta los comandos de MongoDB y suma su duración al callback en curso"""
+
+    def started(self, event):
+        timings = _current.get()
+        if timings is not None and event.command_name != 'getMore':
+            timings.mongo_commands += 1
+
+    def succeeded(self, event):
+        self._add(event)
+
+    def failed(self, event):
+        self._add(event)
+
+    @staticmethod
+    def _add(event):
+        timings = _current.get()
+        if timings is not None:
+            timings.add('mongo', event.duration_micros / 1e6)
+
+
+def _profiler_for(name):
+    """Profiler pedido para este request (header X-Profile o PROFILE_CALLBACKS), o None"""
+    kind = request.headers.get('X-Profile', '').lower() if has_request_context() else ''
+    if not kind and name not in PROFILE_CALLBACKS:
+        return None
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            return Profiler()
+        except ImportError:
+            print("pyinstrument no está instalado; se usa cProfile")
+    return cProfile.Profile()
+
+
+def _dump_profile(profiler, timings):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{timings.name}-{timings.wall * 1000:.0f}ms")
+    if isinstance(profiler, cProfile.Profile):
+        path = base + '.prof'
+        profiler.dump_stats(path)
+    else:
+        path = base + '.html'
+        with open(path, 'w') as f:
+            f.write(profiler.output_html())
+    print(f"[profile] {timings.name}: {path}")
+
+
+def _log(timings):
+    summary = timings.summary()
+    if summary['wall_ms'] < TIMING_LOG_THRESHOLD_MS:
+        return
+    top = sorted(timings.functions.items(), key=lambda item: item[1][1], reverse=True)[:3]
+    functions = ', '.join(f"{name} {total * 1000:.0f}ms" for name, (calls, total) in top)
+    print(f"[timing] {timings.name}: {summary['wall_ms']:.0f} ms (cpu {summary['cpu_ms']:.0f}, "
+          f"mongo {summary['mongo_ms']:.0f}, pandas {summary['pandas_ms']:.0f}, plotly {summary['plotly_ms']:.0f}, "
+          f"otros {summary['other_ms']:.0f})" + (f" | {functions}" if functions else ''))
+
+
+def timed_callback(func):
+    """Envuelve un callback de Dash: mide sus etapas y, si se pide, lo perfila"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        timings = CallbackTimings(func.__name__)
+        token = _current.set(timings)
+        profiler = _profiler_for(timings.name)
+        if isinstance(profiler, cProfile.Profile):
+            profiler.enable()
+        elif profiler is not None:
+            profiler.start()
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        try:
+            response = func(*args, **kwargs)
+            if isinstance(response, str):
+                timings.response_bytes = len(response.encode())
+            return response
+        finally:
+            timings.wall = time.perf_counter() - wall0
+            timings.cpu = time.thread_time() - cpu0
+            _current.reset(token)
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            elif profiler is not None:
+                profiler.stop()
+            if profiler is not None:
+                _dump_profile(profiler, timings)
+            _log(timings)
+            for observer in _observers:
+                observer(timings)
+    return wrapper
+
+
+def instrument_callbacks(app):
+    """Envuelve todos los callbacks del servidor registrados en la app"""
+    for callback in app.callback_map.values():
+        callback['callback'] = timed_callback(callback['callback'])
@@ -1,15 +1,77 @@
 from dash import dcc, html
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+import os
 import pytz
-from get_data import get_daily_data
 
 timezone = pytz.timezone('America/Argentina/Buenos_Aires')
 
+# Rango de fechas inicial de los selectores
+DEFAULT_START_DATE = datetime(2025, 1, 1)
 
 
-def serve_layout():
-    # Layout
-    return html.Div([
+def default_date_range():
+    """Rango inicial de los selectores (inicio fijo hasta hoy) como 'yyyy-mm-dd'"""
+    return DEFAULT_START_DATE.strftime('%Y-%m-%d'), datetime.now(timezone).strftime('%Y-%m-%d')
+
+
+def common_date_ranges():
+    """Rangos más consultados: el inicial, los últimos 30 días y lo que va del año"""
+    today = datetime.now(timezone)
+    end = today.strftime('%Y-%m-%d')
+    ranges = [default_date_range(),
+              ((today - timedelta(days=29)).strftime('%Y-%m-%d'), end),
+              (today.strftime('%Y-01-01'), end)]
+    return list(dict.fromkeys(ranges))
+
+
+# Vistas del selector, de la más fina a la más gruesa
+VIEWS = [('Daily', 'Diario'), ('Weekly', 'Semanal'), ('Monthly', 'Mensual')]
+
+# Máximo de puntos por serie: al cambiar el rango, si la vista elegida lo supera se pasa
+# a la más fina que no lo supere. Las vistas siguen habilitadas (el usuario puede volver
+# a elegir Diario en un rango largo); MAX_CHART_POINTS=0 desactiva el cambio automático.
+MAX_CHART_POINTS = int(os.getenv('MAX_CHART_POINTS', 400))
+
+
+def view_points(view, start_date, end_date):
+    """Cantidad de fechas que tendría cada serie en la vista para el rango 'yyyy-mm-dd'"""
+    start = datetime.strptime(start_date[:10], '%Y-%m-%d')
+    end = datetime.strptime(end_date[:10], '%Y-%m-%d')
+    if view == 'Daily':
+        return (end - start).days + 1
+    if view == 'Weekly':
+        first_monday = start - timedelta(days=start.weekday())
+        last_monday = end - timedelta(days=end.weekday())
+        return (last_monday - first_monday).days // 7 + 1
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def exceeds_max_points(view, start_date, end_date):
+    """True si la vista supera MAX_CHART_POINTS en el rango (Monthly nunca)"""
+    return (MAX_CHART_POINTS > 0 and view != 'Monthly'
+            and view_points(view, start_date, end_date) > MAX_CHART_POINTS)
+
+
+def view_options(start_date, end_date):
+    """Opciones del selector de vista; las que superan MAX_CHART_POINTS muestran sus puntos"""
+    return [{'label': f'{label} ({view_points(value, start_date, end_date)} puntos)'
+             if exceeds_max_points(value, start_date, end_date) else label, 'value': value}
+            for value, label in VIEWS]
+
+
+def resolve_view(start_date, end_date, view='Daily'):
+    """La vista pedida si no supera MAX_CHART_POINTS en el rango; si no, la más fina que no lo supere"""
+    if not exceeds_max_points(view, start_date, end_date):
+        return view
+    return next(value for value, _ in VIEWS if not exceeds_max_points(value, start_date, end_date))
+
+
+# Las partes estáticas del layout se construyen una sola vez; serve_layout() se evalúa
+# en cada carga de página para que las fechas de los selectores sean las del día.
+@lru_cache(maxsize=None)
+def _header():
+    return [
         # Agregar el logo de la empresa
         html.Img(
             src='/assets/TME_LOGO_BOT_2.png',
@@ -21,6 +83,42 @@ def serve_layout():
                     style={"color": "#0AB84D", "marginBottom": "10px"}),
             html.Hr(style={"margin": "0 0 20px 0"}),
         ], style={"textAlign": "center", "paddingTop": "20px"}),
+    ]
+
+
+@lru_cache(maxsize=None)
+def _static_sections():
+    return [
+        # Dataset compartido: referencia (view, start, end) al cache de datos del servidor
+        dcc.Store(id='chart_data_store'),
+
+        # Tarjetas de métricas
+        html.Div([
+            html.Div([html.H3("Total Users"), html.H2(id='total_new_users', children='0')], className='metric-card'),
+            html.Div([html.H3("Average DAU"), html.H2(id='average_dau', children='0')], className='metric-card'),
+            html.Div([html.H3("Average MAU"), html.H2(id='average_mau', children='0')], className='metric-card'),
+            html.Div([html.H3("Total Interactions"), html.H2(id='total_interactions', children='0')], className='metric-card'),
+            html.Div([html.H3("Total Audios"), html.H2(id='total_audio', children='0')], className='metric-card'),
+            html.Div([html.H3("Total Texts"), html.H2(id='total_text', children='0')], className='metric-card'),
+        ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around', 'gap': '15px', 'margin': '20px'}),
+
+        # Pestañas para las vistas
+        html.Div([
+            dcc.Tabs(id="main-tabs", value="general", children=[
+                dcc.Tab(label="Vista General", value="general"),
+                dcc.Tab(label="Análisis por países", value="países"),
+            ], style={'marginBottom': '20px'}),
+
+            # Contenido de las pestañas
+            html.Div(id="tab-content")
+        ], style={'margin': '20px'}),
+    ]
+
+
+def serve_layout():
+    # Layout
+    return html.Div([
+        *_header(),
 
         # Selector de fechas
         html.Div([
@@ -28,7 +126,7 @@ def serve_layout():
                 html.Label("Fecha de inicio:"),
                 dcc.DatePickerSingle(
                     id='start_date_picker',
-                    date=datetime(2025, 1, 1),
+                    date=DEFAULT_START_DATE,
                     display_format='YYYY-MM-DD',
                     min_date_allowed=datetime(2023, 12, 1).date(),
                     max_date_allowed=datetime.now(timezone).date(),
@@ -52,34 +150,13 @@ def serve_layout():
                 html.Label("Vista:"),
                 dcc.RadioItems(
                     id='view_selector',
-                    options=[
-                        {'label': 'Diario', 'value': 'Daily'},
-                        {'label': 'Mensual', 'value': 'Monthly'}
-                    ],
-                    value='Daily',
+                    options=view_options(*default_date_range()),
+                    value=resolve_view(*default_date_range()),
                     style={'display': 'flex', 'gap': '10px'}
                 ),
             ], style={'margin': '10px', 'flex': '1'})
         ], style={'display': 'flex', 'justifyContent': 'space-between', 'margin': '20px'}),
 
-        # Tarjetas de métricas
-        html.Div([
-            html.Div([html.H3("Total Users"), html.H2(id='total_new_users', children='0')], className='metric-card'),
-            html.Div([html.H3("Average DAU"), html.H2(id='average_dau', children='0')], className='metric-card'),
-            html.Div([html.H3("Average MAU"), html.H2(id='average_mau', children='0')], className='metric-card'),
-            html.Div([html.H3("Total Interactions"), html.H2(id='total_interactions', children='0')], className='metric-card'),
-            html.Div([html.H3("Total Audios"), html.H2(id='total_audio', children='0')], className='metric-card'),
-            html.Div([html.H3("Total Texts"), html.H2(id='total_text', children='0')], className='metric-card'),
-        ], style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'space-around', 'gap': '15px', 'margin': '20px'}),
-
-        # Pestañas para las vistas
-        html.Div([
-            dcc.Tabs(id="main-tabs", value="general", children=[
-                dcc.Tab(label="Vista General", value="general"),
-                dcc.Tab(label="Análisis por países", value="países"),
-            ], style={'marginBottom': '20px'}),
-
-            # Contenido de las pestañas
-            html.Div(id="tab-content")
-        ], style={'margin': '20px'}),
+        *_static_sections(),
 ], style={'fontFamily': 'Arial, sans-serif', 'margin': '0 auto', 'maxWidth': '1400px', 'padding': '20px'})
+
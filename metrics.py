@@ -0,0 +1,172 @@
+"""
+Métricas en formato Prometheus, expuestas en /metrics (detrás de la misma autenticación
+que el dashboard).
+
+  - dash_callback_duration_seconds / dash_callback_stage_seconds: latencia de cada
+    callback y su desglose por etapa (ver instrumentation.py)
+  - dash_callback_response_bytes: tamaño de la respuesta JSON de cada callback
+  - dash_cache_requests_total / dash_cache_evictions_total / dash_cache_entries /
+    dash_cache_bytes: aciertos, fallos, vencimientos, entradas y memoria de los caches
+  - dash_mongo_command_duration_seconds / dash_mongo_documents_returned_total:
+    consultas a MongoDB por colección y comando
+
+Con varios workers de gunicorn cada uno tiene sus propias métricas. Definiendo
+PROMETHEUS_MULTIPROC_DIR los contadores e histogramas se agregan entre workers
+(los de caches siguen siendo del worker que responde).
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from flask import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from pymongo import monitoring
+
+from instrumentation import add_observer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 1 KB .. 16 MB
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(8))
+
+CALLBACK_DURATION = Histogram('dash_callback_duration_seconds', 'Duración de cada callback',
+                              ['callback'], buckets=LATENCY_BUCKETS)
+CALLBACK_STAGE = Histogram('dash_callback_stage_seconds', 'Tiempo de cada callback por etapa',
+                           ['callback', 'stage'], buckets=LATENCY_BUCKETS)
+RESPONSE_BYTES = Histogram('dash_callback_response_bytes', 'Tamaño de la respuesta JSON de cada callback',
+                           ['callback'], buckets=BYTES_BUCKETS)
+
+CACHE_REQUESTS = Counter('dash_cache_requests_total', 'Consultas a los caches', ['cache', 'result'])
+CACHE_EVICTIONS = Counter('dash_cache_evictions_total', 'Entradas descartadas o vencidas', ['cache'])
+
+MONGO_DURATION = Histogram('dash_mongo_command_duration_seconds', 'Duración de los comandos de MongoDB',
+                           ['collection', 'command'], buckets=LATENCY_BUCKETS)
+MONGO_DOCUMENTS = Counter('dash_mongo_documents_returned_total', 'Documentos devueltos por MongoDB', ['collection'])
+MONGO_FAILURES = Counter('dash_mongo_command_failures_total', 'Comandos de MongoDB fallidos',
+                         ['collection', 'command'])
+
+# Caches registrados con register_cache: {nombre: dict}
+_caches = {}
+
+
+def register_cache(name, cache):
+    """Publica el tamaño (entradas y bytes) de un cache en /metrics"""
+    _caches[name] = cache
+
+
+def record_cache_lookup(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def record_cache_eviction(name, count=1):
+    CACHE_EVICTIONS.labels(name).inc(count)
+
+
+def estimate_bytes(value):
+    """Memoria aproximada de un valor cacheado (DataFrames, figuras, contenedores)"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, 'to_plotly_json'):
+        return estimate_bytes(value.to_plotly_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(k) + estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class CacheCollector:
+    """
+    Entradas y bytes de los caches al momento de cada scrape.
+
+    Los valores cacheados no se modifican: cada actualización reemplaza la entrada. El
+    tamaño de cada entrada se estima una sola vez y se recuerda junto con el id() del
+    valor, así cada scrape solo recorre las entradas nuevas o reemplazadas en lugar de
+    todos los DataFrames y figuras.
+    """
+
+    def __init__(self):
+        # {cache: {clave: (id del valor, bytes)}}
+        self._sizes = {}
+
+    def collect(self):
+        entries = GaugeMetricFamily('dash_cache_entries', 'Entradas en cada cache', labels=['cache'])
+        size = GaugeMetricFamily('dash_cache_bytes', 'Memoria aproximada de cada cache', labels=['cache'])
+        for name, cache in _caches.items():
+            known = self._sizes.get(name, {})
+            sizes = {}
+            for key, value in list(cache.items()):
+                memo = known.get(key)
+                sizes[key] = memo if memo is not None and memo[0] == id(value) else (id(value), estimate_bytes(value))
+            # Las entradas descartadas del cache se olvidan con el diccionario anterior
+            self._sizes[name] = sizes
+            entries.add_metric([name], len(sizes))
+            size.add_metric([name], sum(memo[1] for memo in sizes.values()))
+        yield entries
+        yield size
+
+
+_cache_collector = CacheCollector()
+REGISTRY.register(_cache_collector)
+
+
+def observe_callback(timings):
+    """Observador de instrumentation.py: registra latencias y tamaño de respuesta"""
+    CALLBACK_DURATION.labels(timings.name).observe(timings.wall)
+    for stage, ms in timings.summary().items():
+        if stage not in ('wall_ms', 'cpu_ms'):
+            CALLBACK_STAGE.labels(timings.name, stage[:-3]).observe(ms / 1000)
+    if timings.response_bytes is not None:
+        RESPONSE_BYTES.labels(timings.name).observe(timings.response_bytes)
+
+
+add_observer(observe_callback)
+
+
+class MongoMetrics(monitoring.CommandListener):
+    """Cuenta comandos, latencia y documentos devueltos por colección"""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.command.get('collection', '')
+        self._pending[(event.connection_id, event.request_id)] = f'{event.database_name}.{collection}'
+
+    def succeeded(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), '')
+        MONGO_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        cursor = event.reply.get('cursor') if isinstance(event.reply, dict) else None
+        if cursor:
+            batch = cursor.get('firstBatch', cursor.get('nextBatch', []))
+            MONGO_DOCUMENTS.labels(collection).inc(len(batch))
+
+    def failed(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), '')
+        MONGO_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(collection, event.command_name).inc()
+
+
+def metrics_view():
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_cache_collector)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(server):
+    """
+    Agrega /metrics al servidor Flask. Debe llamarse antes de instanciar la
+    autenticación: dash_auth protege las rutas que existen en ese momento.
+    """
+    server.add_url_rule('/metrics', 'metrics', metrics_view)
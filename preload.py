@@ -0,0 +1,51 @@
+"""
+Modo preload de gunicorn: datasets precalentados compartidos entre workers.
+
+Con PRELOAD=1 (gunicorn.conf.py activa preload_app) el master importa la app y
+precalienta antes de crear los workers: métricas totales, datasets del rango inicial
+(diario y mensual), free users y errores (ver warmup.py). Los workers se crean con fork
+y comparten esas páginas copy-on-write en lugar de consultar y guardar cada uno su copia.
+
+  - before_fork() (hook when_ready, en el master): cierra el cliente de Mongo del master
+    y congela los objetos existentes con gc.freeze() para que el recolector de los
+    workers no escriba en sus páginas.
+  - after_fork() (hook post_fork, en cada worker): descarta el cliente de Mongo heredado,
+    ejecuta los hooks registrados con add_after_fork (p. ej. volver a enlazar las
+    colecciones) e inicia el refresco programado y, si una tarea crítica del
+    precalentamiento falló en el master, sus reintentos. El worker atiende apenas arranca.
+
+Los DataFrames cacheados no se copian a otro formato antes del fork: las columnas
+numéricas ya son arrays de NumPy y, medido con benchmarks/bench_preload.py, reescribirlos
+(bloques consolidados, texto como strings de Arrow) aumenta la memoria privada de cada
+worker en lugar de reducirla.
+"""
+import gc
+import time
+
+import db
+import warmup
+
+_after_fork = []
+
+
+def add_after_fork(func):
+    """Registra una función a ejecutar en cada worker después del fork (en orden de registro)"""
+    _after_fork.append(func)
+
+
+def before_fork():
+    """En el master, con el precalentamiento terminado y antes de crear los workers"""
+    t0 = time.perf_counter()
+    db.close_client()
+    gc.collect()
+    gc.freeze()
+    print(f"[preload] {gc.get_freeze_count()} objetos congelados en {time.perf_counter() - t0:.1f}s")
+
+
+def after_fork():
+    """En cada worker, apenas creado"""
+    db.reset_client()
+    for func in _after_fork:
+        func()
+    warmup.start_schedule()
+    warmup.start_retry()
@@ -0,0 +1,212 @@
+"""
+Registro de consultas lentas y presupuesto de consultas por callback.
+
+QueryLogger (CommandListener del cliente de db.py) registra cada consulta con su
+colección, la forma del filtro (valores reemplazados por '?'), duración, documentos
+devueltos (nReturned) y bytes de la respuesta, sumando los getMore del mismo cursor.
+Cada consulta queda asociada al callback y a la función de get_data.py / features.py
+que la emitió. pymongo entrega la respuesta ya decodificada, así que los bytes salen de
+volver a codificarla (bson.encode, del orden de un 40% del tiempo de decodificación);
+QUERY_LOG_BYTES=0 lo desactiva.
+
+  - Consultas de más de SLOW_QUERY_MS se imprimen con un resumen de su plan
+    (explain queryPlanner, ejecutado en un hilo aparte para no demorar el request).
+  - find sin filtro / aggregate sin $match inicial se avisan una vez por callback
+    y colección.
+  - Cada callback tiene un presupuesto de consultas y de tiempo en Mongo
+    (QUERY_BUDGET_COUNT, QUERY_BUDGET_MS); QUERY_BUDGETS ajusta callbacks puntuales,
+    por ejemplo '{"update_general_charts": {"count": 4, "ms": 500}}'.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bson
+from pymongo import monitoring
+
+from instrumentation import add_observer, current_timings
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', '1') == '1'
+QUERY_BUDGET_COUNT = int(os.getenv('QUERY_BUDGET_COUNT', 10))
+QUERY_BUDGET_MS = float(os.getenv('QUERY_BUDGET_MS', 1000))
+QUERY_BUDGETS = json.loads(os.getenv('QUERY_BUDGETS', '{}'))
+QUERY_LOG_BYTES = os.getenv('QUERY_LOG_BYTES', '1') == '1'
+
+# Comandos que inician una consulta (los getMore se suman a la consulta original)
+QUERY_COMMANDS = {'find', 'aggregate', 'count', 'distinct'}
+
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+
+
+def _reset_after_fork():
+    # El hilo del executor no sobrevive al fork (p. ej. workers de gunicorn con PRELOAD)
+    global _explain_executor
+    _explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def query_shape(value):
+    """Forma de un filtro o pipeline: conserva claves y operadores, reemplaza valores por '?'"""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(v) for v in value]
+    return '?'
+
+
+def plan_summary(explain):
+    """Resume un explain: etapas del plan ganador, p. ej. 'IXSCAN(date_1) > FETCH' o 'COLLSCAN'"""
+    stages = []
+
+    def walk_plan(plan):
+        for child in [plan.get('inputStage')] + plan.get('inputStages', []):
+            if child:
+                walk_plan(child)
+        stage = plan.get('stage', '?')
+        stages.append(f"{stage}({plan['indexName']})" if 'indexName' in plan else stage)
+
+    def find_plans(node):
+        if isinstance(node, dict):
+            if 'winningPlan' in node:
+                plan = node['winningPlan']
+                walk_plan(plan.get('queryPlan', plan))
+            else:
+                for value in node.values():
+                    find_plans(value)
+        elif isinstance(node, list):
+            for value in node:
+                find_plans(value)
+
+    find_plans(explain)
+    return ' > '.join(stages) or 'sin plan'
+
+
+def _explain(database, command, record):
+    from db import get_client
+    try:
+        explain = get_client()[database].command('explain', command, verbosity='queryPlanner')
+        plan = plan_summary(explain)
+    except Exception as e:
+        plan = f"explain falló: {e}"
+    print(f"[query] plan de {record['namespace']} ({record['callback']}): {plan}")
+
+
+def reply_bytes(reply):
+    """Tamaño en BSON de la respuesta de un comando (0 si no se puede codificar)"""
+    try:
+        return len(bson.encode(reply))
+    except Exception:
+        return 0
+
+
+def _is_unfiltered(command_name, command):
+    if command_name == 'find':
+        return not command.get('filter')
+    if command_name == 'aggregate':
+        pipeline = command.get('pipeline') or []
+        return not pipeline or '$match' not in pipeline[0] or not pipeline[0]['$match']
+    return False
+
+
+class QueryLogger(monitoring.CommandListener):
+    """Registra consultas lentas y sin filtro, atribuidas al callback que las emitió"""
+
+    def __init__(self):
+        self._pending = {}
+        self._cursors = {}
+        self._warned = set()
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        name = event.command_name
+        if name == 'killCursors':
+            for cursor_id in event.command.get('cursors', []):
+                self._cursors.pop(cursor_id, None)
+            return
+        if name not in QUERY_COMMANDS and name != 'getMore':
+            return
+        timings = current_timings()
+        if name == 'getMore':
+            record = self._cursors.get(event.command.get('getMore'))
+        else:
+            command = dict(event.command)
+            collection = command.get(name)
+            shape = command.get('filter', command.get('query')) if name != 'aggregate' else command.get('pipeline')
+            record = {
+                'namespace': f'{event.database_name}.{collection}',
+                'command': name,
+                'shape': json.dumps(query_shape(shape or {}), default=str),
+                'callback': timings.name if timings else '-',
+                'function': (timings.active.get('data') if timings else None) or '-',
+                'duration_ms': 0.0, 'documents': 0, 'bytes': 0,
+                'explain': (event.database_name, {k: v for k, v in command.items()
+                                                   if k not in ('lsid', '$db', '$clusterTime', '$readPreference')}),
+            }
+            self._warn_unfiltered(name, command, record)
+        if record is not None:
+            self._pending[(event.connection_id, event.request_id)] = record
+
+    def succeeded(self, event):
+        record = self._pending.pop((event.connection_id, event.request_id), None)
+        if record is None:
+            return
+        record['duration_ms'] += event.duration_micros / 1000
+        if QUERY_LOG_BYTES:
+            record['bytes'] += reply_bytes(event.reply)
+        cursor = event.reply.get('cursor') if isinstance(event.reply, dict) else None
+        if cursor is None:
+            self._finish(record)
+            return
+        batch = cursor.get('firstBatch', cursor.get('nextBatch', []))
+        record['documents'] += len(batch)
+        if event.command_name == 'getMore':
+            self._cursors.pop(event.command.get('getMore'), None)
+        if cursor.get('id'):
+            self._cursors[cursor['id']] = record
+        else:
+            self._finish(record)
+
+    def failed(self, event):
+        record = self._pending.pop((event.connection_id, event.request_id), None)
+        if record is not None:
+            print(f"[query] falló {record['command']} en {record['namespace']} ({record['callback']}): {event.failure}")
+
+    def _warn_unfiltered(self, name, command, record):
+        if not _is_unfiltered(name, command):
+            return
+        key = (record['callback'], record['namespace'])
+        with self._lock:
+            if key in self._warned:
+                return
+            self._warned.add(key)
+        print(f"[query] {name} sin filtro en {record['namespace']} "
+              f"({record['callback']} / {record['function']}): recorre la colección completa")
+
+    def _finish(self, record):
+        if record['duration_ms'] < SLOW_QUERY_MS:
+            return
+        print(f"[query] lenta {record['duration_ms']:.0f} ms: {record['command']} {record['namespace']} "
+              f"{record['shape']} -> {record['documents']} docs"
+              + (f", {record['bytes'] / 1024:.0f} KB" if QUERY_LOG_BYTES else '')
+              + f" ({record['callback']} / {record['function']})")
+        if SLOW_QUERY_EXPLAIN and record['command'] in ('find', 'aggregate'):
+            database, command = record['explain']
+            _explain_executor.submit(_explain, database, command, record)
+
+
+def check_budget(timings):
+    """Observador de instrumentation.py: avisa si el callback excedió su presupuesto de consultas"""
+    budget = QUERY_BUDGETS.get(timings.name, {})
+    max_count = budget.get('count', QUERY_BUDGET_COUNT)
+    max_ms = budget.get('ms', QUERY_BUDGET_MS)
+    mongo_ms = timings.stages['mongo'] * 1000
+    if timings.mongo_commands > max_count or mongo_ms > max_ms:
+        print(f"[budget] {timings.name} excedió su presupuesto de consultas: {timings.mongo_commands} consultas "
+              f"(máx. {max_count}), {mongo_ms:.0f} ms en Mongo (máx. {max_ms:.0f})")
+
+
+add_observer(check_budget)
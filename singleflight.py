@@ -0,0 +1,82 @@
+"""
+Locks por clave para los caches de módulo (single-flight).
+
+Con workers gthread varios hilos del mismo proceso atienden callbacks a la vez. Si dos
+piden la misma entrada que falta, el primero la calcula y los demás esperan su
+resultado en lugar de repetir la consulta. Cada (cache, clave) tiene su propio lock,
+así que las entradas distintas se siguen calculando en paralelo; el lock se descarta
+cuando nadie lo está usando.
+
+    value = get_or_build('charts', _charts_cache, cache_key, lambda: read_range(...))
+
+Las escrituras a los caches son asignaciones de una sola clave y las lecturas usan
+dict.get (ambas atómicas); los recorridos para descartar entradas iteran sobre una
+copia de las claves (list(cache)).
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from metrics import record_cache_lookup
+
+_MISSING = object()
+
+# {(cache, clave): [lock, hilos que lo usan o esperan]}
+_locks = {}
+_guard = threading.Lock()
+
+
+def _reset_after_fork():
+    # Los locks que tenían tomados otros hilos del padre quedarían tomados para siempre
+    global _guard
+    _guard = threading.Lock()
+    _locks.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@contextmanager
+def key_lock(name, key):
+    """Lock reentrante de una entrada de cache; se crea al pedirlo y se descarta al liberarlo"""
+    with _guard:
+        entry = _locks.get((name, key))
+        if entry is None:
+            entry = _locks[(name, key)] = [threading.RLock(), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _guard:
+            entry[1] -= 1
+            if not entry[1]:
+                _locks.pop((name, key), None)
+
+
+def get_or_build(name, cache, key, build, valid=None):
+    """
+    Devuelve cache[key]; si falta (o valid(valor) es False) lo calcula con build() una
+    sola vez aunque lo pidan varios hilos a la vez.
+
+    Cuenta un acierto si el valor ya estaba o lo calculó otro hilo mientras se esperaba
+    el lock, y un fallo por cada llamada a build().
+    """
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING and (valid is None or valid(value)):
+        record_cache_lookup(name, True)
+        return value
+    with key_lock(name, key):
+        value = cache.get(key, _MISSING)
+        hit = value is not _MISSING and (valid is None or valid(value))
+        record_cache_lookup(name, hit)
+        if not hit:
+            value = build()
+            cache[key] = value
+    return value
+
+
+def in_flight():
+    """Cantidad de locks de entradas en uso (para pruebas y depuración)"""
+    with _guard:
+        return len(_locks)
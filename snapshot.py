@@ -0,0 +1,387 @@
+"""
+Modo snapshot: exportar un rango de fechas de Mongo a archivos Arrow y servir el
+dashboard desde ellos, sin base de datos.
+
+Exportar (con MONGO_URI o --mongo-uri apuntando a la base):
+
+    python -m snapshot --start 2025-01-01 --end 2025-06-30 --out snapshots/2025-h1
+
+Servir la app desde el snapshot:
+
+    SNAPSHOT_DIR=snapshots/2025-h1 python app.py
+
+  - Las colecciones que los lectores consultan con find (dau/mau por país, nuevos
+    usuarios, errores, tipos de formato inválidos y las features de `calls`) se
+    exportan con los campos que usan los lectores, un archivo Arrow IPC sin comprimir
+    por colección. db.get_client() devuelve un SnapshotClient y los lectores de
+    get_data.py / features.py corren sin cambios: el filtro del find se aplica con
+    pyarrow.compute sobre el archivo mapeado en memoria y las filas que coinciden se
+    convierten por columnas a un DataFrame (Table.to_pandas(), con db.find_frame), sin
+    pasar por un diccionario por documento. find() sigue devolviendo documentos para
+    quien itere el cursor.
+  - Las lecturas que son agregaciones en Mongo (free users, ciclos por país, métricas
+    totales, conteos diarios de ListMe / RemindMe) se exportan como el resultado del
+    lector y se sirven con los lectores de este módulo, que callback_final usa en
+    lugar de los originales cuando SNAPSHOT_DIR está definido.
+
+Los rangos pedidos deben estar dentro del rango exportado (ver manifest.json).
+Requiere pyarrow (pip install pyarrow), solo para exportar y en modo snapshot.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from instrumentation import instrument_functions
+
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR')
+
+# Colecciones leídas con find: campo de fecha del rango (None: colección completa),
+# campos a exportar (None: todos menos _id) y filtro adicional
+COLLECTIONS = [
+    {'database': 'TranscribeMe-charts', 'collection': 'dau-by-country', 'date_field': 'date',
+     'fields': ['date', 'country', 'dau', 'subscribed', 'interactions', 'audio', 'text']},
+    {'database': 'TranscribeMe-charts', 'collection': 'daily-new-users', 'date_field': 'date',
+     'fields': ['date', 'country', 'new_users']},
+    {'database': 'TranscribeMe-charts', 'collection': 'mau-by-country', 'date_field': 'month',
+     'fields': ['month', 'country', 'mau', 'subscribed', 'interactions', 'audio', 'text']},
+    {'database': 'TranscribeMe-charts', 'collection': 'invalid-format-types', 'date_field': 'localdate',
+     'fields': None},
+    {'database': 'TranscribeMe-charts', 'collection': 'errors_by_date', 'date_field': None, 'fields': None},
+    # Solo se cuentan documentos por día: no se exportan result / extras / error
+    {'database': 'TranscribeMe', 'collection': 'calls', 'date_field': 'localdate',
+     'fields': ['localdate', 'user_id', 'type', 'event_type', 'result.type'],
+     'filter': {'$or': [{'type': {'$in': ['image', 'document', 'video']}},
+                        {'result.type': 'youtube_transcription'}]}},
+]
+
+# Resultados de lectores basados en agregaciones (ver export_snapshot)
+READERS_DIR = 'readers'
+TOTAL_METRICS_FILE = 'total_metrics.json'
+MANIFEST_FILE = 'manifest.json'
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+    except ImportError:
+        raise SystemExit("El modo snapshot requiere pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def _read_table(path):
+    """Abre un archivo Arrow IPC mapeado en memoria (sin copiar los datos)"""
+    pa = _pyarrow()
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"El snapshot no tiene {path} (ver {MANIFEST_FILE})")
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def _write_table(table, path):
+    pa = _pyarrow()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _to_table(df):
+    """DataFrame -> tabla Arrow; las columnas con tipos mezclados se guardan como texto"""
+    pa = _pyarrow()
+    columns = {}
+    for name in df.columns:
+        try:
+            columns[name] = pa.array(df[name], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columns[name] = pa.array(df[name].map(lambda v: None if v is None or v != v else str(v)))
+    return pa.table(columns)
+
+
+# ---------------------------------------------------------------------------
+# Lectura: colecciones servidas desde archivos
+# ---------------------------------------------------------------------------
+
+def _compare(column, operator, value):
+    pc = _pyarrow().compute
+    functions = {'$eq': pc.equal, '$ne': pc.not_equal, '$gt': pc.greater, '$gte': pc.greater_equal,
+                 '$lt': pc.less, '$lte': pc.less_equal}
+    if operator == '$in':
+        return pc.is_in(column, value_set=_pyarrow().array(value))
+    if operator not in functions:
+        raise NotImplementedError(f"Operador no soportado en modo snapshot: {operator}")
+    return functions[operator](column, value)
+
+
+def _match(table, query):
+    """Máscara booleana de las filas de la tabla que cumplen un filtro de find"""
+    pa = _pyarrow()
+    pc = pa.compute
+    mask = pa.scalar(True)
+    for key, condition in (query or {}).items():
+        if key == '$or':
+            any_mask = pa.scalar(False)
+            for sub_query in condition:
+                any_mask = pc.or_(any_mask, _match(table, sub_query))
+            mask = pc.and_(mask, any_mask)
+            continue
+        if key not in table.column_names:
+            # Como en Mongo: un campo inexistente no cumple ninguna condición
+            return pa.array([False] * table.num_rows)
+        conditions = condition.items() if isinstance(condition, dict) else [('$eq', condition)]
+        for operator, value in conditions:
+            try:
+                result = _compare(table[key], operator, value)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                # Tipos no comparables: ningún documento coincide
+                return pa.array([False] * table.num_rows)
+            mask = pc.and_(mask, pc.fill_null(result, False))
+    if isinstance(mask, pa.Scalar):
+        return pa.array([mask.as_py()] * table.num_rows)
+    return mask
+
+
+class SnapshotCollection:
+    """Colección de solo lectura servida desde un archivo Arrow (subconjunto de find)"""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self._table = None
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = _read_table(self.path)
+        return self._table
+
+    def _select(self, query, projection):
+        """Filas que cumplen el filtro, con las columnas de la proyección"""
+        table = self.table
+        if query:
+            table = table.filter(_match(table, query))
+        projection = {k: v for k, v in (projection or {}).items() if k != '_id'}
+        if any(projection.values()):
+            columns = [c for c in table.column_names if projection.get(c)]
+        else:
+            columns = [c for c in table.column_names if c not in projection]
+        return table.select(columns)
+
+    def find_frame(self, query=None, projection=None):
+        """find como DataFrame, convertido por columnas con Table.to_pandas() (ver db.find_frame)"""
+        table = self._select(query, projection)
+        # Como pd.DataFrame de documentos: un campo que no trae ningún documento no es columna
+        missing = [c for c in table.column_names if table.num_rows and table[c].null_count == table.num_rows]
+        return table.drop(missing).to_pandas() if missing else table.to_pandas()
+
+    def find(self, query=None, projection=None):
+        """find como lista de documentos, para quien itere el cursor (los lectores usan find_frame)"""
+        table = self._select(query, projection)
+        rows = table.to_pylist()
+        # Los documentos de Mongo no traen los campos faltantes: se quitan los nulos
+        nullable = [c for c in table.column_names if table[c].null_count]
+        if nullable:
+            rows = [{k: v for k, v in row.items() if v is not None or k not in nullable} for row in rows]
+        return rows
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        raise NotImplementedError(f"'{self.name}': las agregaciones no están disponibles en modo snapshot; "
+                                  "usar los lectores de snapshot.py")
+
+
+class SnapshotDatabase:
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = SnapshotCollection(os.path.join(self.path, f'{name}.arrow'), name)
+        return self._collections[name]
+
+
+class SnapshotClient:
+    """Reemplazo de MongoClient para db.get_client() cuando SNAPSHOT_DIR está definido"""
+
+    def __init__(self, path):
+        _pyarrow()
+        self.path = path
+        self.manifest = load_manifest(path)
+        print(f"[snapshot] sirviendo datos de {path} "
+              f"({self.manifest['start']} a {self.manifest['end']}, exportado {self.manifest['created_at']})")
+
+    def __getitem__(self, name):
+        return SnapshotDatabase(os.path.join(self.path, name), name)
+
+
+def load_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+# ---------------------------------------------------------------------------
+# Lectura: lectores basados en agregaciones (mismas firmas que los originales;
+# las colecciones se ignoran)
+# ---------------------------------------------------------------------------
+
+def _reader_frame(name):
+    return _read_table(os.path.join(SNAPSHOT_DIR, READERS_DIR, f'{name}.arrow')).to_pandas()
+
+
+def _daily_counts(name, start_date_str, end_date_str):
+    """Conteos diarios exportados; como el lector original, incluye el día siguiente a end_date"""
+    pc = _pyarrow().compute
+    table = _read_table(os.path.join(SNAPSHOT_DIR, READERS_DIR, f'{name}.arrow'))
+    end_inclusive = (datetime.fromisoformat(end_date_str) + timedelta(days=1)).strftime('%Y-%m-%d')
+    mask = pc.and_(pc.greater_equal(table['localdate'], start_date_str[:10]),
+                   pc.less_equal(table['localdate'], end_inclusive))
+    return table.filter(mask).to_pandas()
+
+
+def get_total_free_users(collection):
+    return _reader_frame('total_free_users')
+
+
+def get_heavy_free_users(collection):
+    return _reader_frame('heavy_free_users')
+
+
+def aggregate_user_cycles(collection):
+    return _reader_frame('user_cycles')
+
+
+def calculate_total_metrics(collection_dau_by_country, collection_mau_by_country, collection_new_users):
+    with open(os.path.join(SNAPSHOT_DIR, TOTAL_METRICS_FILE)) as f:
+        return json.load(f)
+
+
+def get_lists_data(collection, start_date_str, end_date_str):
+    return _daily_counts('lists', start_date_str, end_date_str)
+
+
+def get_reminders_data(collection, start_date_str, end_date_str):
+    return _daily_counts('reminders', start_date_str, end_date_str)
+
+
+# ---------------------------------------------------------------------------
+# Exportación
+# ---------------------------------------------------------------------------
+
+def _flatten(doc, fields):
+    """Documento -> fila plana con los campos pedidos ('result.type' se lee anidado)"""
+    row = {}
+    for field in fields:
+        value = doc
+        for part in field.split('.'):
+            value = value.get(part) if isinstance(value, dict) else None
+        row[field] = value
+    return row
+
+
+def export_collection(client, spec, start_date, end_date, out_dir):
+    """Exporta los documentos de una colección en el rango; devuelve la cantidad de filas"""
+    query = dict(spec.get('filter', {}))
+    if spec['date_field']:
+        # mau-by-country guarda meses: el límite inferior por mes incluye el primero
+        # tanto si el campo es 'yyyy-mm' como 'yyyy-mm-dd'
+        lower = start_date[:7] if spec['date_field'] == 'month' else start_date
+        query[spec['date_field']] = {'$gte': lower, '$lte': end_date}
+    fields = spec['fields']
+    projection = {'_id': 0, **{field: 1 for field in fields}} if fields else {'_id': 0}
+
+    docs = client[spec['database']][spec['collection']].find(query, projection)
+    df = pd.DataFrame([_flatten(doc, fields) for doc in docs], columns=fields) if fields else pd.DataFrame(list(docs))
+    _write_table(_to_table(df), os.path.join(out_dir, spec['database'], f"{spec['collection']}.arrow"))
+    return len(df)
+
+
+def export_snapshot(client, start_date, end_date, out_dir):
+    """
+    Exporta todo lo que lee el dashboard para el rango [start_date, end_date].
+
+    Returns:
+        dict: El manifest escrito en out_dir (filas por archivo y pasos que fallaron).
+    """
+    import get_data
+    import features
+
+    charts = client['TranscribeMe-charts']
+    readers = {
+        'total_free_users': lambda: get_data.get_total_free_users(charts['free-cycles-by-country']),
+        'heavy_free_users': lambda: get_data.get_heavy_free_users(charts['free-cycles-by-country']),
+        'user_cycles': lambda: get_data.aggregate_user_cycles(charts['free-cycles-by-country']),
+        'lists': lambda: features.get_lists_data(client['ListMe']['lists'], start_date, end_date),
+        'reminders': lambda: features.get_reminders_data(client['RemindMe']['reminders'], start_date, end_date),
+    }
+
+    manifest = {'start': start_date, 'end': end_date, 'created_at': datetime.now().isoformat(timespec='seconds'),
+                'tables': {}, 'failed': {}}
+
+    def step(name, func):
+        t0 = time.perf_counter()
+        try:
+            rows = func()
+        except Exception as e:
+            print(f"[snapshot] {name}: falló ({e})")
+            manifest['failed'][name] = str(e)
+            return
+        manifest['tables'][name] = rows
+        print(f"[snapshot] {name}: {rows} filas en {time.perf_counter() - t0:.1f}s")
+
+    for spec in COLLECTIONS:
+        step(f"{spec['database']}/{spec['collection']}",
+             lambda spec=spec: export_collection(client, spec, start_date, end_date, out_dir))
+
+    def export_reader(name, loader):
+        df = loader()
+        _write_table(_to_table(df), os.path.join(out_dir, READERS_DIR, f'{name}.arrow'))
+        return len(df)
+
+    for name, loader in readers.items():
+        step(f'{READERS_DIR}/{name}', lambda name=name, loader=loader: export_reader(name, loader))
+
+    def export_total_metrics():
+        metrics = get_data.calculate_total_metrics(charts['dau-by-country'], charts['mau-by-country'],
+                                                   charts['daily-new-users'])
+        with open(os.path.join(out_dir, TOTAL_METRICS_FILE), 'w') as f:
+            json.dump(metrics, f, indent=2)
+        return len(metrics)
+
+    step('total_metrics', export_total_metrics)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--start', required=True, help="Fecha inicial 'yyyy-mm-dd'")
+    parser.add_argument('--end', default=datetime.now().strftime('%Y-%m-%d'), help="Fecha final 'yyyy-mm-dd' (hoy)")
+    parser.add_argument('--out', required=True, help='Directorio del snapshot')
+    parser.add_argument('--mongo-uri', help='Base a exportar (por defecto MONGO_URI)')
+    args = parser.parse_args()
+    _pyarrow()
+
+    import pymongo
+    from db import MONGO_URI
+    client = pymongo.MongoClient(args.mongo_uri or MONGO_URI)
+
+    t0 = time.perf_counter()
+    manifest = export_snapshot(client, args.start, args.end, args.out)
+    print(f"Snapshot {args.start} a {args.end} exportado en {args.out} ({time.perf_counter() - t0:.1f}s)")
+    if manifest['failed']:
+        raise SystemExit(f"Fallaron: {', '.join(manifest['failed'])}")
+
+
+# Medir el tiempo de cada lector dentro del callback en curso (ver instrumentation.py)
+instrument_functions(__name__, 'data', names=['get_total_free_users', 'get_heavy_free_users', 'aggregate_user_cycles',
+                                              'calculate_total_metrics', 'get_lists_data', 'get_reminders_data'])
+
+if __name__ == '__main__':
+    main()
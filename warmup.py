@@ -0,0 +1,259 @@
+"""
+Arranque rápido: precalentamiento de datos en segundo plano y endpoint /ready.
+
+Los módulos registran tareas con add_task() (métricas totales, dataset del rango
+inicial, datos de la pestaña general). Con FAST_START=1 (por defecto) start() las
+ejecuta en un hilo aparte y la app atiende requests mientras tanto: lo que todavía
+no esté listo se calcula en el primer uso. Con FAST_START=0 se ejecutan antes de
+terminar de importar la app, como antes.
+
+/ready responde 503 mientras el precalentamiento está en curso y 200 cuando terminó.
+No requiere autenticación para que lo puedan consultar los health checks, así que solo
+devuelve el estado general y el de cada tarea y job por nombre; los errores (que pueden
+incluir el host de Mongo) se imprimen en el log. Las tareas registradas como críticas
+(add_task(..., critical=True), p. ej. el dataset del rango inicial) deben terminar bien:
+si una falla, /ready responde 503 con estado 'failed' y la tarea se reintenta cada
+WARM_RETRY segundos (60 por defecto) hasta que funcione. Las demás pueden fallar: lo que
+falte se calcula en el primer uso.
+
+Refresco programado: los jobs registrados con add_job() (rangos habituales, free
+users, errores, métricas totales) se ejecutan una vez por día dentro de la ventana de
+baja carga WARM_WINDOW (horas locales 'inicio-fin', por defecto 4-7), uno detrás de
+otro y separados por WARM_STAGGER segundos. Los que no entran en la ventana quedan
+para el día siguiente. WARM_JOBS limita los jobs a ejecutar (nombres separados por
+coma) y WARM_SCHEDULE=0 desactiva el refresco. Su estado también se ve en /ready
+('standby' en los workers que no los ejecutan).
+
+Con varios workers de gunicorn los jobs corren en uno solo: cada worker inicia el hilo
+del refresco, pero solo el que toma el lock de WARM_LOCK_FILE (flock, en el directorio
+temporal por defecto) ejecuta los jobs; los demás esperan el lock y toman el relevo si
+ese worker termina (p. ej. al reciclarse). Los caches de los demás workers no se
+refrescan: sus datos estáticos vencen a la hora (STATIC_CACHE_TTL) como sin refresco
+programado (ver is_scheduled). El lock coordina los procesos de un mismo host; sin
+fcntl (Windows, desarrollo local) cada proceso ejecuta sus jobs.
+
+Con PRELOAD=1 (gunicorn --preload, ver preload.py) el master precalienta antes de
+crear los workers, sin importar FAST_START, y el hilo del refresco lo inicia cada
+worker después del fork (el master no puede tener hilos al hacer fork): los workers
+arrancan con los datos listos y uno de ellos ejecuta los jobs.
+"""
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import jsonify, request
+
+from layout import timezone
+
+FAST_START = os.getenv('FAST_START', '1') == '1'
+PRELOAD = os.getenv('PRELOAD', '0') == '1'
+WARM_SCHEDULE = os.getenv('WARM_SCHEDULE', '1') == '1'
+WARM_WINDOW = tuple(int(hour) for hour in os.getenv('WARM_WINDOW', '4-7').split('-'))
+WARM_STAGGER = float(os.getenv('WARM_STAGGER', 120))
+WARM_JOBS = {name.strip() for name in os.getenv('WARM_JOBS', '').split(',') if name.strip()}
+WARM_RETRY = float(os.getenv('WARM_RETRY', 60))
+WARM_LOCK_FILE = os.getenv('WARM_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'dash-users-tme-warm.lock'))
+
+_tasks = []
+_critical = set()
+_jobs = []
+_state = {'state': 'pending', 'started_at': None, 'finished_at': None, 'tasks': {}, 'jobs': {}}
+_first_response = threading.Event()
+_warmed = threading.Event()
+# Se activa en el proceso que tomó el lock y ejecuta los jobs
+_scheduler = threading.Event()
+_lock_file = None
+
+
+def add_task(name, func, critical=False):
+    """
+    Registra una tarea de precalentamiento (se ejecutan en orden de registro). Si una
+    tarea crítica falla, la app no está lista hasta que un reintento termine bien.
+    """
+    _tasks.append((name, func))
+    _state['tasks'][name] = {'state': 'pending'}
+    if critical:
+        _critical.add(name)
+
+
+def add_job(name, func):
+    """Registra un job de refresco programado (se ejecutan en orden de registro)"""
+    if WARM_JOBS and name not in WARM_JOBS:
+        return
+    _jobs.append((name, func))
+    # 'standby' hasta que este proceso toma el lock del refresco (los ejecuta otro worker)
+    _state['jobs'][name] = {'state': 'standby'}
+
+
+def is_scheduled(name):
+    """True si el job está registrado y lo ejecuta este proceso (ver _acquire_scheduler)"""
+    return WARM_SCHEDULE and _scheduler.is_set() and any(job == name for job, _ in _jobs)
+
+
+def _run_task(name, func, states, prefix):
+    """Ejecuta una tarea o job y registra su estado; devuelve False si falló"""
+    states[name] = {'state': 'running'}
+    t0 = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        print(f"[{prefix}] '{name}' falló: {e}")
+        states[name] = {'state': 'failed', 'error': str(e), 'at': time.time()}
+        return False
+    states[name] = {'state': 'ready', 'seconds': round(time.perf_counter() - t0, 2), 'at': time.time()}
+    return True
+
+
+def _failed_critical():
+    return [name for name in _critical if _state['tasks'][name]['state'] == 'failed']
+
+
+def run():
+    """Ejecuta las tareas registradas; un error en una no detiene las siguientes"""
+    _state.update(state='running', started_at=time.time())
+    for name, func in _tasks:
+        _run_task(name, func, _state['tasks'], 'startup')
+    _state.update(state='failed' if _failed_critical() else 'ready', finished_at=time.time())
+    _warmed.set()
+    failed = [name for name, task in _state['tasks'].items() if task['state'] == 'failed']
+    print(f"[startup] warmup terminado en {_state['finished_at'] - _state['started_at']:.1f}s"
+          + (f" (fallaron: {', '.join(failed)})" if failed else ''))
+
+
+def retry_critical():
+    """Reintenta cada WARM_RETRY segundos las tareas críticas que fallaron, hasta que terminen bien"""
+    tasks = dict(_tasks)
+    while _failed_critical():
+        time.sleep(WARM_RETRY)
+        for name in _failed_critical():
+            _run_task(name, tasks[name], _state['tasks'], 'startup')
+    if _state['state'] == 'failed':
+        _state['state'] = 'ready'
+        print("[startup] tareas críticas recuperadas: la app está lista")
+
+
+def start_retry():
+    """Inicia el hilo de reintentos si alguna tarea crítica falló"""
+    if _failed_critical():
+        threading.Thread(target=retry_critical, name='warmup-retry', daemon=True).start()
+
+
+def _run_and_retry():
+    run()
+    retry_critical()
+
+
+def in_window(now):
+    """True si la hora local está dentro de la ventana de baja carga WARM_WINDOW"""
+    start, end = WARM_WINDOW
+    if start <= end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+def _next_window(now):
+    start = now.replace(hour=WARM_WINDOW[0], minute=0, second=0, microsecond=0)
+    return start if start > now else start + timedelta(days=1)
+
+
+def run_jobs():
+    """Ejecuta los jobs escalonados; si se termina la ventana, el resto queda para la próxima"""
+    for i, (name, func) in enumerate(_jobs):
+        if i:
+            time.sleep(WARM_STAGGER)
+        if not in_window(datetime.now(timezone)):
+            pending = [job for job, _ in _jobs[i:]]
+            print(f"[warm] fuera de la ventana {WARM_WINDOW[0]}-{WARM_WINDOW[1]} h; "
+                  f"quedan para mañana: {', '.join(pending)}")
+            return
+        if _run_task(name, func, _state['jobs'], 'warm'):
+            print(f"[warm] '{name}' refrescado en {_state['jobs'][name]['seconds']:.1f}s")
+
+
+def _acquire_scheduler():
+    """
+    Espera hasta ser el único proceso del host que ejecuta los jobs: flock exclusivo sobre
+    WARM_LOCK_FILE, que se mantiene abierto mientras viva el proceso (el sistema libera el
+    lock si termina).
+    """
+    global _lock_file
+    try:
+        import fcntl
+    except ImportError:
+        return
+    _lock_file = open(WARM_LOCK_FILE, 'a')
+    fcntl.flock(_lock_file, fcntl.LOCK_EX)
+
+
+def _schedule():
+    _acquire_scheduler()
+    _scheduler.set()
+    for name, _ in _jobs:
+        _state['jobs'][name] = {'state': 'scheduled'}
+    print(f"[warm] el refresco programado corre en este proceso (pid {os.getpid()})")
+    # No superponerse con el precalentamiento inicial
+    _warmed.wait()
+    while True:
+        now = datetime.now(timezone)
+        if not in_window(now):
+            time.sleep((_next_window(now) - now).total_seconds())
+        run_jobs()
+        # Una vez por día: esperar al inicio de la próxima ventana
+        now = datetime.now(timezone)
+        time.sleep((_next_window(now) - now).total_seconds())
+
+
+def start(background=FAST_START, schedule=WARM_SCHEDULE):
+    """
+    Inicia el precalentamiento en un hilo (FAST_START) o lo ejecuta en el momento, y el
+    hilo del refresco programado si hay jobs registrados.
+
+    Con PRELOAD se ejecuta en el momento y sin hilos: los hilos no sobreviven al fork
+    y el refresco y los reintentos los inicia cada worker (start_schedule, start_retry).
+    """
+    if PRELOAD:
+        run()
+        return
+    if schedule:
+        start_schedule()
+    if background:
+        threading.Thread(target=_run_and_retry, name='warmup', daemon=True).start()
+    else:
+        run()
+        start_retry()
+
+
+def start_schedule():
+    """Inicia el hilo del refresco programado si hay jobs registrados"""
+    if WARM_SCHEDULE and _jobs:
+        threading.Thread(target=_schedule, name='warm-scheduler', daemon=True).start()
+
+
+def is_ready():
+    return _state['state'] == 'ready'
+
+
+def ready_view():
+    # Solo estados por nombre: /ready es público y los errores pueden incluir hosts
+    body = {'state': _state['state'],
+            'tasks': {name: task['state'] for name, task in _state['tasks'].items()},
+            'jobs': {name: job['state'] for name, job in _state['jobs'].items()}}
+    return jsonify(body), 200 if is_ready() else 503
+
+
+def init_app(server, boot_started):
+    """
+    Agrega /ready al servidor e imprime el tiempo desde boot_started (time.perf_counter()
+    al empezar a importar la app) hasta la primera respuesta.
+    """
+    server.add_url_rule('/ready', 'ready', ready_view)
+
+    @server.after_request
+    def report_first_response(response):
+        if not _first_response.is_set():
+            _first_response.set()
+            print(f"[startup] primera respuesta ({request.path}) a los "
+                  f"{time.perf_counter() - boot_started:.2f}s del arranque")
+        return response